@@ -1,7 +1,7 @@
 import sys
 from database import engine, requests_table
 from sqlalchemy import insert
-from services.embeddings import generate_embedding
+from services.embeddings import generate_embedding, store_embedding
 
 # Mock request data for shelters
 mock_requests = [
@@ -122,14 +122,15 @@ def add_mock_requests():
                     request["quantity"]
                 )
 
-                # Insert the request
-                conn.execute(insert(requests_table).values(
+                # Insert the request and its embedding
+                request_id = conn.execute(insert(requests_table).values(
                     shelter_id=request["shelter_id"],
                     item_name=request["item_name"],
                     quantity=request["quantity"],
-                    category=request["category"],
-                    embedding=embedding
-                ))
+                    remaining_quantity=request["quantity"],
+                    category=request["category"]
+                ).returning(requests_table.c.id)).scalar()
+                store_embedding(conn, "request", request_id, embedding, request["category"])
                 print(f"Added request: {request['item_name']} for shelter {request['shelter_id']}")
 
             conn.commit()
@@ -18,8 +18,8 @@ def add_test_shelters():
             "city": "Seattle",
             "state": "WA",
             "zip_code": "98101",
-            "latitude": "47.6097",
-            "longitude": "-122.3331"
+            "latitude": 47.6097,
+            "longitude": -122.3331
         },
         {
             "id": str(uuid.uuid4()),
@@ -31,8 +31,8 @@ def add_test_shelters():
             "city": "Tacoma",
             "state": "WA",
             "zip_code": "98402",
-            "latitude": "47.2529",
-            "longitude": "-122.4443"
+            "latitude": 47.2529,
+            "longitude": -122.4443
         },
         {
             "id": str(uuid.uuid4()),
@@ -44,8 +44,8 @@ def add_test_shelters():
             "city": "Bellevue",
             "state": "WA",
             "zip_code": "98004",
-            "latitude": "47.6149",
-            "longitude": "-122.1938"
+            "latitude": 47.6149,
+            "longitude": -122.1938
         },
         {
             "id": str(uuid.uuid4()),
@@ -57,8 +57,8 @@ def add_test_shelters():
             "city": "Everett",
             "state": "WA",
             "zip_code": "98201",
-            "latitude": "47.9790",
-            "longitude": "-122.2021"
+            "latitude": 47.9790,
+            "longitude": -122.2021
         },
         {
             "id": str(uuid.uuid4()),
@@ -70,8 +70,8 @@ def add_test_shelters():
             "city": "Redmond",
             "state": "WA",
             "zip_code": "98052",
-            "latitude": "47.6740",
-            "longitude": "-122.1215"
+            "latitude": 47.6740,
+            "longitude": -122.1215
         }
     ]
 
@@ -0,0 +1,68 @@
+"""
+Benchmark the binary-quantized two-stage find_all_matches against the exact scan
+
+Needs a Postgres DATABASE_URL with pgvector >= 0.7 and migrations/008 applied.
+Runs on the donations and requests already in the database and reports, for
+each candidate multiplier, run time and recall against the exact results:
+
+- recall@top: share of each request's exact top PREFILTER_MATCHES_PER_REQUEST
+  matches that the two-stage search also returns
+- recall@all: share of every exact pair above the threshold that it returns
+
+    cd backend
+    python -m benchmarks.bench_binary_prefilter --threshold 0.7 --multipliers 2 5 10 20
+"""
+import argparse
+import time
+from collections import defaultdict
+from services.vector_match import find_all_matches, PREFILTER_MATCHES_PER_REQUEST
+
+
+def pair_set(matches) -> set:
+    return {(str(m["donation_id"]), str(m["request_id"])) for m in matches}
+
+
+def top_pairs_per_request(matches, per_request: int) -> set:
+    """
+    Keep each request's best per_request exact matches.
+    """
+    by_request = defaultdict(list)
+    for match in matches:
+        by_request[str(match["request_id"])].append(match)
+    top = set()
+    for request_matches in by_request.values():
+        request_matches.sort(key=lambda m: m["similarity_score"], reverse=True)
+        top |= pair_set(request_matches[:per_request])
+    return top
+
+
+def timed(**kwargs):
+    started = time.perf_counter()
+    matches = find_all_matches(**kwargs)
+    return matches, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare exact and binary-prefiltered all-pairs matching")
+    parser.add_argument("--threshold", type=float, default=0.7, help="Minimum similarity score")
+    parser.add_argument("--multipliers", type=int, nargs="+", default=[2, 5, 10, 20],
+                        help="Candidate multipliers to try")
+    args = parser.parse_args()
+
+    exact, exact_seconds = timed(threshold=args.threshold, use_prefilter=False)
+    exact_all = pair_set(exact)
+    exact_top = top_pairs_per_request(exact, PREFILTER_MATCHES_PER_REQUEST)
+    print(f"exact: {len(exact_all)} pairs in {exact_seconds:.3f}s")
+    print(f"{'multiplier':>10} {'pairs':>8} {'seconds':>8} {'speedup':>8} {'recall@top':>11} {'recall@all':>11}")
+
+    for multiplier in args.multipliers:
+        found, seconds = timed(threshold=args.threshold, use_prefilter=True, candidate_multiplier=multiplier)
+        found_pairs = pair_set(found)
+        recall_top = len(found_pairs & exact_top) / len(exact_top) if exact_top else 1.0
+        recall_all = len(found_pairs & exact_all) / len(exact_all) if exact_all else 1.0
+        print(f"{multiplier:>10} {len(found_pairs):>8} {seconds:>8.3f} {exact_seconds / seconds:>7.1f}x "
+              f"{recall_top:>11.3f} {recall_all:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
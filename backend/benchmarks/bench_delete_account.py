@@ -0,0 +1,104 @@
+"""
+Benchmark for deleting donor and shelter accounts with many items
+
+Needs a Postgres DATABASE_URL (the cascade uses array functions SQLite lacks).
+Creates throwaway accounts, so point it at a development database.
+
+    cd backend
+    python -m benchmarks.bench_delete_account --items 1000
+    python -m benchmarks.bench_delete_account --items 1000 --per-item   # old item-by-item path
+"""
+import argparse
+import time
+import uuid
+from sqlalchemy import insert, update
+from database import engine, donors_table, shelters_table, donations_table, requests_table, matches_table
+from services.forms import delete_donor, delete_shelter, delete_donation, delete_request
+
+
+def create_accounts(items: int):
+    """
+    Create one donor and one shelter with `items` donations/requests each,
+    and one match between each donation and the request with the same index.
+    """
+    suffix = uuid.uuid4().hex[:8]
+    donor_uid = f"BENCH_D_{suffix}"
+    shelter_uid = f"BENCH_S_{suffix}"
+    donation_ids = [uuid.uuid4() for _ in range(items)]
+    request_ids = [uuid.uuid4() for _ in range(items)]
+    match_ids = [uuid.uuid4() for _ in range(items)]
+
+    with engine.begin() as conn:
+        conn.execute(insert(donors_table).values(
+            id=uuid.uuid4(), uid=donor_uid, name="Bench Donor", username=donor_uid,
+            email=f"{donor_uid}@example.com", phone_number="000-0000",
+        ))
+        conn.execute(insert(shelters_table).values(
+            id=uuid.uuid4(), uid=shelter_uid, shelter_name=shelter_uid,
+            email=f"{shelter_uid}@example.com", phone_number="000-0000",
+        ))
+        conn.execute(insert(donations_table), [
+            {"id": donation_id, "donor_id": donor_uid, "item_name": f"Item {i}", "quantity": 1, "category": "Food"}
+            for i, donation_id in enumerate(donation_ids)
+        ])
+        conn.execute(insert(requests_table), [
+            {"id": request_id, "shelter_id": shelter_uid, "item_name": f"Item {i}", "quantity": 1, "category": "Food"}
+            for i, request_id in enumerate(request_ids)
+        ])
+        conn.execute(insert(matches_table), [
+            {
+                "id": match_id, "donor_id": donor_uid, "donation_id": str(donation_id),
+                "donor_username": donor_uid, "shelter_id": shelter_uid, "request_id": str(request_id),
+                "shelter_name": shelter_uid, "item_name": "Item", "quantity": 1, "category": "Food",
+                "status": "pending",
+            }
+            for match_id, donation_id, request_id in zip(match_ids, donation_ids, request_ids)
+        ])
+        conn.execute(update(donors_table).where(donors_table.c.uid == donor_uid).values(
+            donation_ids=[str(i) for i in donation_ids], match_ids=[str(i) for i in match_ids],
+        ))
+        conn.execute(update(shelters_table).where(shelters_table.c.uid == shelter_uid).values(
+            request_ids=[str(i) for i in request_ids], match_ids=[str(i) for i in match_ids],
+        ))
+
+    return donor_uid, shelter_uid, donation_ids, request_ids
+
+
+def delete_per_item(donor_uid: str, shelter_uid: str, donation_ids, request_ids) -> None:
+    """
+    Delete the accounts one item at a time, the way delete_donor used to.
+    """
+    for donation_id in donation_ids:
+        delete_donation(donation_id, donor_uid)
+    for request_id in request_ids:
+        delete_request(request_id, shelter_uid)
+    delete_donor(donor_uid)
+    delete_shelter(shelter_uid)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time donor/shelter account deletion")
+    parser.add_argument("--items", type=int, default=1000, help="Donations and requests per account")
+    parser.add_argument("--per-item", action="store_true", help="Time the item-by-item delete path instead")
+    args = parser.parse_args()
+
+    donor_uid, shelter_uid, donation_ids, request_ids = create_accounts(args.items)
+    print(f"Created {donor_uid} and {shelter_uid} with {args.items} items and {args.items} matches each")
+
+    if args.per_item:
+        start = time.perf_counter()
+        delete_per_item(donor_uid, shelter_uid, donation_ids, request_ids)
+        print(f"Item-by-item delete of both accounts: {time.perf_counter() - start:.2f}s")
+        return
+
+    start = time.perf_counter()
+    delete_donor(donor_uid)
+    print(f"delete_donor ({args.items} donations): {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    delete_shelter(shelter_uid)
+    print(f"delete_shelter ({args.items} requests): {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
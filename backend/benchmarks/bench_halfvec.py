@@ -0,0 +1,145 @@
+"""
+Benchmark float32 (vector) against float16 (halfvec) embedding storage
+
+Needs a Postgres DATABASE_URL with pgvector >= 0.7. Builds two scratch tables
+with the same vectors, one per storage type, and reports for each:
+table and HNSW index size, index build time, query latency and recall@k
+against exact float32 search.
+
+    cd backend
+    python -m benchmarks.bench_halfvec --rows 50000 --queries 200
+    python -m benchmarks.bench_halfvec --from-db          # use stored donation/request vectors
+"""
+import argparse
+import statistics
+import time
+import numpy as np
+from sqlalchemy import text
+from database import engine
+
+DIMENSIONS = 384
+STORAGE_TYPES = {
+    "vector": "vector_cosine_ops",
+    "halfvec": "halfvec_cosine_ops",
+}
+
+
+def synthetic_vectors(rows: int, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    """
+    Unit vectors grouped around random centers, roughly like item embeddings.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, DIMENSIONS))
+    vectors = centers[rng.integers(0, clusters, size=rows)] + rng.normal(scale=0.6, size=(rows, DIMENSIONS))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def stored_vectors() -> np.ndarray:
+    """
+    Every stored donation and request vector.
+    """
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT embedding::text FROM donation_embeddings
+            UNION ALL
+            SELECT embedding::text FROM request_embeddings
+        """)).scalars().all()
+    return np.array([np.fromstring(row.strip("[]"), sep=",") for row in rows], dtype=np.float32)
+
+
+def to_literal(vector: np.ndarray) -> str:
+    return "[" + ",".join(f"{x:.7g}" for x in vector) + "]"
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> list:
+    """
+    Ground-truth nearest neighbours by cosine similarity in float32.
+    """
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    results = []
+    for query in queries:
+        scores = normalized @ (query / np.linalg.norm(query))
+        results.append(set(np.argsort(-scores)[:k].tolist()))
+    return results
+
+
+def bench_storage(storage: str, vectors: np.ndarray, queries: np.ndarray, truth: list, k: int, ef_search: int) -> dict:
+    table = f"bench_embeddings_{storage}"
+    column_type = f"{storage}({DIMENSIONS})"
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        conn.execute(text(f"CREATE TABLE {table} (id integer PRIMARY KEY, embedding {column_type} NOT NULL)"))
+        batch = 1000
+        for start in range(0, len(vectors), batch):
+            conn.execute(
+                text(f"INSERT INTO {table} (id, embedding) VALUES (:id, CAST(:embedding AS {column_type}))"),
+                [{"id": start + i, "embedding": to_literal(v)} for i, v in enumerate(vectors[start:start + batch])]
+            )
+
+    try:
+        with engine.begin() as conn:
+            started = time.perf_counter()
+            conn.execute(text(f"CREATE INDEX {table}_hnsw ON {table} USING hnsw (embedding {STORAGE_TYPES[storage]})"))
+            build_seconds = time.perf_counter() - started
+
+        with engine.connect() as conn:
+            table_bytes = conn.execute(text(f"SELECT pg_table_size('{table}')")).scalar()
+            index_bytes = conn.execute(text(f"SELECT pg_relation_size('{table}_hnsw')")).scalar()
+
+            conn.execute(text(f"SET hnsw.ef_search = {int(ef_search)}"))
+            latencies = []
+            hits = 0
+            for query, expected in zip(queries, truth):
+                started = time.perf_counter()
+                found = conn.execute(
+                    text(f"""
+                        SELECT id FROM {table}
+                        ORDER BY embedding <=> CAST(:embedding AS {column_type})
+                        LIMIT :k
+                    """),
+                    {"embedding": to_literal(query), "k": k}
+                ).scalars().all()
+                latencies.append((time.perf_counter() - started) * 1000)
+                hits += len(expected & set(found))
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+
+    latencies.sort()
+    return {
+        "storage": storage,
+        "table_mb": table_bytes / 1024 / 1024,
+        "index_mb": index_bytes / 1024 / 1024,
+        "build_s": build_seconds,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+        "recall": hits / (len(queries) * k),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vector and halfvec embedding storage")
+    parser.add_argument("--rows", type=int, default=50000, help="Synthetic vectors to index")
+    parser.add_argument("--queries", type=int, default=200, help="Queries to time")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query for recall@k")
+    parser.add_argument("--ef-search", type=int, default=40, help="hnsw.ef_search used for queries")
+    parser.add_argument("--from-db", action="store_true", help="Use stored embeddings instead of synthetic ones")
+    args = parser.parse_args()
+
+    vectors = stored_vectors() if args.from_db else synthetic_vectors(args.rows)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)]
+    queries = queries + rng.normal(scale=0.05, size=queries.shape).astype(np.float32)
+    truth = exact_top_k(vectors, queries, args.k)
+
+    print(f"{len(vectors)} vectors, {len(queries)} queries, recall@{args.k}, ef_search={args.ef_search}")
+    print(f"{'storage':<8} {'table MB':>9} {'index MB':>9} {'build s':>8} {'p50 ms':>7} {'p95 ms':>7} {'recall':>7}")
+    for storage in STORAGE_TYPES:
+        result = bench_storage(storage, vectors, queries, truth, args.k, args.ef_search)
+        print(f"{result['storage']:<8} {result['table_mb']:>9.1f} {result['index_mb']:>9.1f} {result['build_s']:>8.2f} "
+              f"{result['p50_ms']:>7.2f} {result['p95_ms']:>7.2f} {result['recall']:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
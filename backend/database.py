@@ -1,6 +1,6 @@
-from sqlalchemy import create_engine, MetaData, Table, Column, String, Integer, TIMESTAMP, func, ForeignKey, ARRAY, JSON, Text
+from sqlalchemy import create_engine, MetaData, Table, Column, String, Integer, Float, Boolean, TIMESTAMP, func, ForeignKey, ARRAY, JSON, Text, Index, text
 from sqlalchemy.dialects.postgresql import UUID
-from pgvector.sqlalchemy import Vector
+from pgvector.sqlalchemy import Vector, HALFVEC
 from sqlalchemy.pool import NullPool
 import os
 from dotenv import load_dotenv
@@ -41,6 +41,16 @@ else:
     metadata = MetaData(schema="public")
     uuid_array_type = ARRAY(UUID(as_uuid=False))  # PostgreSQL UUID array
 
+# Embedding storage: "vector" (float32) or "halfvec" (float16, half the table and index size)
+# Switching an existing database also needs migrations/007_halfvec_embeddings.sql
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "vector").lower()
+if EMBEDDING_STORAGE not in ("vector", "halfvec"):
+    raise ValueError(f"Invalid EMBEDDING_STORAGE: {EMBEDDING_STORAGE}")
+EMBEDDING_DIMENSIONS = 384
+embedding_type = HALFVEC(EMBEDDING_DIMENSIONS) if EMBEDDING_STORAGE == "halfvec" else Vector(EMBEDDING_DIMENSIONS)
+# Type name for casts in raw SQL, e.g. CAST(:embedding AS halfvec(384))
+EMBEDDING_SQL_TYPE = f"{EMBEDDING_STORAGE}({EMBEDDING_DIMENSIONS})"
+
 donors_table = Table(
     "donors", metadata,
     Column("id", id_type, primary_key=True),
@@ -51,6 +61,9 @@ donors_table = Table(
     Column("phone_number", String),
     Column("match_ids", uuid_array_type, nullable=True),
     Column("donation_ids", uuid_array_type, nullable=True),
+    Column("latitude", Float, nullable=True),  # Optional, used for max_distance_km matching
+    Column("longitude", Float, nullable=True),
+    Index("donors_lat_lon_idx", "latitude", "longitude"),
 )
 
 shelters_table = Table(
@@ -66,8 +79,9 @@ shelters_table = Table(
     Column("city", String),
     Column("state", String),
     Column("zip_code", String),
-    Column("latitude", String),
-    Column("longitude", String),
+    Column("latitude", Float),
+    Column("longitude", Float),
+    Index("shelters_lat_lon_idx", "latitude", "longitude"),
 )
 
 # Donations table
@@ -79,7 +93,13 @@ donations_table = Table(
     Column("quantity", Integer, nullable=False),
     Column("category", String, nullable=False),
     Column("created_at", TIMESTAMP(timezone=True), server_default=func.now()),
-    Column("embedding", Vector(384))
+    # Quantity not yet promised in a match both sides confirmed (see services/match.py)
+    Column("remaining_quantity", Integer),
+    Column("status", String, nullable=False, server_default="open"),  # open, partially_matched, fulfilled, expired
+    # pending, embedded or ready; rows saved with defer_embedding move through these in services/ingestion.py
+    Column("embedding_status", String, nullable=False, server_default="ready"),
+    Column("claimed_at", TIMESTAMP(timezone=True)),  # Set while an ingestion drain holds the row
+    Index("donations_created_at_id_idx", "created_at", "id"),
 )
 
 # Requests table
@@ -91,7 +111,36 @@ requests_table = Table(
     Column("quantity", Integer, nullable=False),
     Column("category", String, nullable=False),
     Column("created_at", TIMESTAMP(timezone=True), server_default=func.now()),
-    Column("embedding", Vector(384))
+    # Quantity not yet promised in a match both sides confirmed (see services/match.py)
+    Column("remaining_quantity", Integer),
+    Column("status", String, nullable=False, server_default="open"),  # open, partially_matched, fulfilled, expired
+    # pending, embedded or ready; rows saved with defer_embedding move through these in services/ingestion.py
+    Column("embedding_status", String, nullable=False, server_default="ready"),
+    Column("claimed_at", TIMESTAMP(timezone=True)),  # Set while an ingestion drain holds the row
+    Index("requests_created_at_id_idx", "created_at", "id"),
+)
+
+# Embeddings live in their own tables so donations/requests stay narrow
+# One row per item and model version; an item with no row for the active
+# version (services.embeddings.MODEL_VERSION) is still waiting to be embedded
+donation_embeddings_table = Table(
+    "donation_embeddings", metadata,
+    Column("donation_id", UUID(as_uuid=True), ForeignKey(donations_table.c.id, ondelete="CASCADE"), primary_key=True),
+    Column("embedding", embedding_type, nullable=False),
+    Column("model_version", String, primary_key=True),
+    Column("category", String),  # Copy of the item's category for category-scoped search
+    Column("is_open", Boolean, nullable=False, server_default=text("true")),  # Copy of whether the item is still open
+    Column("created_at", TIMESTAMP(timezone=True), server_default=func.now()),
+)
+
+request_embeddings_table = Table(
+    "request_embeddings", metadata,
+    Column("request_id", UUID(as_uuid=True), ForeignKey(requests_table.c.id, ondelete="CASCADE"), primary_key=True),
+    Column("embedding", embedding_type, nullable=False),
+    Column("model_version", String, primary_key=True),
+    Column("category", String),  # Copy of the item's category for category-scoped search
+    Column("is_open", Boolean, nullable=False, server_default=text("true")),  # Copy of whether the item is still open
+    Column("created_at", TIMESTAMP(timezone=True), server_default=func.now()),
 )
 
 # Matches table
@@ -109,6 +158,65 @@ matches_table = Table(
     Column("category", String, nullable=False),
     Column("matched_at", TIMESTAMP(timezone=True), server_default=func.now()),
     Column("status", String, nullable=False),
+    Column("fulfilled_quantity", Integer),  # Quantity taken off both items when the match reached "both"
+    Column("confirmed_at", TIMESTAMP(timezone=True)),  # When the match reached "both"
+    Index("matches_donation_id_idx", "donation_id"),
+    Index("matches_request_id_idx", "request_id"),
+    Index("matches_donor_id_matched_at_idx", "donor_id", "matched_at", "id"),
+    Index("matches_shelter_id_matched_at_idx", "shelter_id", "matched_at", "id"),
+)
+
+# Expired and long-finished matches, moved out of matches by services/retention.py
+matches_archive_table = Table(
+    "matches_archive", metadata,
+    Column("id", UUID(as_uuid=True), primary_key=True),
+    Column("donor_id", String, nullable=False),
+    Column("donation_id", String, nullable=False),
+    Column("donor_username", String, nullable=False),
+    Column("shelter_id", String, nullable=False),
+    Column("request_id", String, nullable=False),
+    Column("shelter_name", String, nullable=False),
+    Column("item_name", String, nullable=False),
+    Column("quantity", Integer, nullable=False),
+    Column("category", String, nullable=False),
+    Column("matched_at", TIMESTAMP(timezone=True)),
+    Column("status", String, nullable=False),  # Status when archived
+    Column("fulfilled_quantity", Integer),
+    Column("confirmed_at", TIMESTAMP(timezone=True)),
+    Column("archive_reason", String, nullable=False),  # expired or completed
+    Column("archived_at", TIMESTAMP(timezone=True), server_default=func.now()),
+    Index("matches_archive_donor_id_matched_at_idx", "donor_id", "matched_at"),
+    Index("matches_archive_shelter_id_matched_at_idx", "shelter_id", "matched_at"),
+)
+
+# Precomputed top-k similarity pairs, kept up to date by services/candidates.py
+# A pair is stored while it is in the top-k of its donation or of its request
+match_candidates_table = Table(
+    "match_candidates", metadata,
+    Column("donation_id", UUID(as_uuid=True), primary_key=True),
+    Column("request_id", UUID(as_uuid=True), primary_key=True),
+    Column("similarity", Float, nullable=False),
+    Column("computed_at", TIMESTAMP(timezone=True), server_default=func.now()),
+    Index("match_candidates_donation_idx", "donation_id", "similarity"),
+    Index("match_candidates_request_idx", "request_id", "similarity"),
+)
+
+# Background jobs table (claimed by worker.py with SELECT ... FOR UPDATE SKIP LOCKED)
+jobs_table = Table(
+    "jobs", metadata,
+    Column("id", UUID(as_uuid=True), primary_key=True, server_default=func.gen_random_uuid()),
+    Column("job_type", String, nullable=False),
+    Column("payload", JSON, nullable=False),
+    Column("status", String, nullable=False, server_default="queued"),  # queued, running, done, failed
+    Column("attempts", Integer, nullable=False, server_default="0"),
+    Column("max_attempts", Integer, nullable=False, server_default="5"),
+    Column("run_at", TIMESTAMP(timezone=True), server_default=func.now()),
+    Column("locked_until", TIMESTAMP(timezone=True), nullable=True),
+    Column("locked_by", String, nullable=True),
+    Column("last_error", Text, nullable=True),
+    Column("created_at", TIMESTAMP(timezone=True), server_default=func.now()),
+    Column("finished_at", TIMESTAMP(timezone=True), nullable=True),
+    Index("jobs_status_run_at_idx", "status", "run_at"),
 )
 
 # Create tables if using SQLite (for testing)
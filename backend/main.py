@@ -6,6 +6,7 @@ from routers.user import router as user_router
 from routers.match import router as match_router
 from routers.vector_match import router as vector_match_router
 from routers.shelters import router as shelters_router
+from routers.jobs import router as jobs_router
 
 app = FastAPI()
 app.include_router(register_router)
@@ -14,6 +15,7 @@ app.include_router(user_router)
 app.include_router(match_router)
 app.include_router(vector_match_router)
 app.include_router(shelters_router)
+app.include_router(jobs_router)
 
 # For frontend requests
 app.add_middleware(
@@ -22,6 +24,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the browser read the next-page cursor of paginated listings
+    expose_headers=["X-Next-Cursor"],
 )
 
 @app.get("/")
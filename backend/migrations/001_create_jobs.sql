@@ -0,0 +1,19 @@
+-- Durable job queue used by worker.py
+-- Run in the Supabase SQL editor (or psql) against the project database.
+
+CREATE TABLE IF NOT EXISTS public.jobs (
+    id           uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    job_type     text NOT NULL,
+    payload      json NOT NULL,
+    status       text NOT NULL DEFAULT 'queued',
+    attempts     integer NOT NULL DEFAULT 0,
+    max_attempts integer NOT NULL DEFAULT 5,
+    run_at       timestamptz DEFAULT now(),
+    locked_until timestamptz,
+    locked_by    text,
+    last_error   text,
+    created_at   timestamptz DEFAULT now(),
+    finished_at  timestamptz
+);
+
+CREATE INDEX IF NOT EXISTS jobs_status_run_at_idx ON public.jobs (status, run_at);
@@ -0,0 +1,13 @@
+-- Precomputed top-k similarity pairs between donations and requests
+-- Run in the Supabase SQL editor, then backfill with: python -m services.candidates
+
+CREATE TABLE IF NOT EXISTS public.match_candidates (
+    donation_id uuid NOT NULL,
+    request_id  uuid NOT NULL,
+    similarity  double precision NOT NULL,
+    computed_at timestamptz DEFAULT now(),
+    PRIMARY KEY (donation_id, request_id)
+);
+
+CREATE INDEX IF NOT EXISTS match_candidates_donation_idx ON public.match_candidates (donation_id, similarity DESC);
+CREATE INDEX IF NOT EXISTS match_candidates_request_idx ON public.match_candidates (request_id, similarity DESC);
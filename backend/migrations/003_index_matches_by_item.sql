@@ -0,0 +1,4 @@
+-- Look up matches by donation or request with one indexed query
+
+CREATE INDEX IF NOT EXISTS matches_donation_id_idx ON public.matches (donation_id);
+CREATE INDEX IF NOT EXISTS matches_request_id_idx ON public.matches (request_id);
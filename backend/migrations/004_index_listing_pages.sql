@@ -0,0 +1,4 @@
+-- Keyset pagination for GET /forms/donations and GET /forms/requests
+
+CREATE INDEX IF NOT EXISTS donations_created_at_id_idx ON public.donations (created_at, id);
+CREATE INDEX IF NOT EXISTS requests_created_at_id_idx ON public.requests (created_at, id);
@@ -0,0 +1,34 @@
+-- Move embeddings out of donations/requests into their own tables
+-- Run in the Supabase SQL editor together with the deploy that reads the new tables.
+
+CREATE TABLE IF NOT EXISTS public.donation_embeddings (
+    donation_id   uuid PRIMARY KEY REFERENCES public.donations (id) ON DELETE CASCADE,
+    embedding     vector(384) NOT NULL,
+    model_version text NOT NULL,
+    created_at    timestamptz DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS public.request_embeddings (
+    request_id    uuid PRIMARY KEY REFERENCES public.requests (id) ON DELETE CASCADE,
+    embedding     vector(384) NOT NULL,
+    model_version text NOT NULL,
+    created_at    timestamptz DEFAULT now()
+);
+
+-- Every existing vector was produced by all-MiniLM-L6-v2
+INSERT INTO public.donation_embeddings (donation_id, embedding, model_version)
+SELECT id, embedding, 'all-MiniLM-L6-v2' FROM public.donations WHERE embedding IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+INSERT INTO public.request_embeddings (request_id, embedding, model_version)
+SELECT id, embedding, 'all-MiniLM-L6-v2' FROM public.requests WHERE embedding IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+CREATE INDEX IF NOT EXISTS donation_embeddings_hnsw_idx
+    ON public.donation_embeddings USING hnsw (embedding vector_cosine_ops);
+CREATE INDEX IF NOT EXISTS request_embeddings_hnsw_idx
+    ON public.request_embeddings USING hnsw (embedding vector_cosine_ops);
+
+-- The old columns (and any vector index on them) go away with the data
+ALTER TABLE public.donations DROP COLUMN IF EXISTS embedding;
+ALTER TABLE public.requests DROP COLUMN IF EXISTS embedding;
@@ -0,0 +1,8 @@
+-- Allow one vector per model version so a new model can be backfilled
+-- next to the active one (see services/reembed.py)
+
+ALTER TABLE public.donation_embeddings DROP CONSTRAINT IF EXISTS donation_embeddings_pkey;
+ALTER TABLE public.donation_embeddings ADD PRIMARY KEY (donation_id, model_version);
+
+ALTER TABLE public.request_embeddings DROP CONSTRAINT IF EXISTS request_embeddings_pkey;
+ALTER TABLE public.request_embeddings ADD PRIMARY KEY (request_id, model_version);
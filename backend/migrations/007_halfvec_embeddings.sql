@@ -0,0 +1,17 @@
+-- Optional: store embeddings as half precision (halfvec, pgvector >= 0.7)
+-- Halves table and HNSW index size. Set EMBEDDING_STORAGE=halfvec on the API and
+-- workers together with this migration. Measure first with benchmarks/bench_halfvec.py.
+
+DROP INDEX IF EXISTS public.donation_embeddings_hnsw_idx;
+DROP INDEX IF EXISTS public.request_embeddings_hnsw_idx;
+
+ALTER TABLE public.donation_embeddings ALTER COLUMN embedding TYPE halfvec(384) USING embedding::halfvec(384);
+ALTER TABLE public.request_embeddings ALTER COLUMN embedding TYPE halfvec(384) USING embedding::halfvec(384);
+
+CREATE INDEX IF NOT EXISTS donation_embeddings_hnsw_idx
+    ON public.donation_embeddings USING hnsw (embedding halfvec_cosine_ops);
+CREATE INDEX IF NOT EXISTS request_embeddings_hnsw_idx
+    ON public.request_embeddings USING hnsw (embedding halfvec_cosine_ops);
+
+-- To go back to float32, repeat the steps above with vector(384) and vector_cosine_ops
+-- and unset EMBEDDING_STORAGE.
@@ -0,0 +1,8 @@
+-- Bit index for the two-stage find_all_matches (USE_BINARY_PREFILTER=true)
+-- Indexes the sign-quantized 384-bit code of each vector for Hamming-distance search.
+-- Needs pgvector >= 0.7.
+
+CREATE INDEX IF NOT EXISTS donation_embeddings_bq_idx
+    ON public.donation_embeddings USING hnsw ((binary_quantize(embedding)::bit(384)) bit_hamming_ops);
+CREATE INDEX IF NOT EXISTS request_embeddings_bq_idx
+    ON public.request_embeddings USING hnsw ((binary_quantize(embedding)::bit(384)) bit_hamming_ops);
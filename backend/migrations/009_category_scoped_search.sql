@@ -0,0 +1,72 @@
+-- Category-scoped vector search (USE_CATEGORY_SCOPED_SEARCH=true)
+-- Copies each item's category next to its vector and builds one partial HNSW
+-- index per category, so a scoped query only walks its own category's graph.
+-- Uses vector_cosine_ops; swap in halfvec_cosine_ops if migrations/007 was applied.
+-- Add an index pair here when a category is added to the frontend forms
+-- (migrations/016 rebuilds them over open items; add the category there too).
+
+ALTER TABLE public.donation_embeddings ADD COLUMN IF NOT EXISTS category text;
+ALTER TABLE public.request_embeddings ADD COLUMN IF NOT EXISTS category text;
+
+UPDATE public.donation_embeddings de SET category = d.category
+FROM public.donations d WHERE d.id = de.donation_id AND de.category IS NULL;
+UPDATE public.request_embeddings re SET category = r.category
+FROM public.requests r WHERE r.id = re.request_id AND re.category IS NULL;
+
+CREATE INDEX IF NOT EXISTS donation_embeddings_category_idx ON public.donation_embeddings (category);
+CREATE INDEX IF NOT EXISTS request_embeddings_category_idx ON public.request_embeddings (category);
+
+CREATE INDEX IF NOT EXISTS donation_embeddings_hnsw_food_idx
+    ON public.donation_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Food';
+CREATE INDEX IF NOT EXISTS request_embeddings_hnsw_food_idx
+    ON public.request_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Food';
+
+CREATE INDEX IF NOT EXISTS donation_embeddings_hnsw_clothing_idx
+    ON public.donation_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Clothing';
+CREATE INDEX IF NOT EXISTS request_embeddings_hnsw_clothing_idx
+    ON public.request_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Clothing';
+
+CREATE INDEX IF NOT EXISTS donation_embeddings_hnsw_bedding_idx
+    ON public.donation_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Bedding';
+CREATE INDEX IF NOT EXISTS request_embeddings_hnsw_bedding_idx
+    ON public.request_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Bedding';
+
+CREATE INDEX IF NOT EXISTS donation_embeddings_hnsw_medical_supplies_idx
+    ON public.donation_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Medical Supplies';
+CREATE INDEX IF NOT EXISTS request_embeddings_hnsw_medical_supplies_idx
+    ON public.request_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Medical Supplies';
+
+CREATE INDEX IF NOT EXISTS donation_embeddings_hnsw_hygiene_idx
+    ON public.donation_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Hygiene';
+CREATE INDEX IF NOT EXISTS request_embeddings_hnsw_hygiene_idx
+    ON public.request_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Hygiene';
+
+CREATE INDEX IF NOT EXISTS donation_embeddings_hnsw_baby_care_idx
+    ON public.donation_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Baby Care';
+CREATE INDEX IF NOT EXISTS request_embeddings_hnsw_baby_care_idx
+    ON public.request_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Baby Care';
+
+CREATE INDEX IF NOT EXISTS donation_embeddings_hnsw_educational_idx
+    ON public.donation_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Educational';
+CREATE INDEX IF NOT EXISTS request_embeddings_hnsw_educational_idx
+    ON public.request_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Educational';
+
+CREATE INDEX IF NOT EXISTS donation_embeddings_hnsw_toys_idx
+    ON public.donation_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Toys';
+CREATE INDEX IF NOT EXISTS request_embeddings_hnsw_toys_idx
+    ON public.request_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Toys';
+
+CREATE INDEX IF NOT EXISTS donation_embeddings_hnsw_electronics_idx
+    ON public.donation_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Electronics';
+CREATE INDEX IF NOT EXISTS request_embeddings_hnsw_electronics_idx
+    ON public.request_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Electronics';
+
+CREATE INDEX IF NOT EXISTS donation_embeddings_hnsw_emergency_supplies_idx
+    ON public.donation_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Emergency Supplies';
+CREATE INDEX IF NOT EXISTS request_embeddings_hnsw_emergency_supplies_idx
+    ON public.request_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Emergency Supplies';
+
+CREATE INDEX IF NOT EXISTS donation_embeddings_hnsw_other_idx
+    ON public.donation_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Other';
+CREATE INDEX IF NOT EXISTS request_embeddings_hnsw_other_idx
+    ON public.request_embeddings USING hnsw (embedding vector_cosine_ops) WHERE category = 'Other';
@@ -0,0 +1,16 @@
+-- Numeric shelter/donor locations for max_distance_km matching
+-- Shelter coordinates were stored as text; blank or unparsable values become NULL.
+-- The (latitude, longitude) btree indexes serve the bounding-box step of a radius
+-- query (services/geo.py); the exact distance is only computed inside the box.
+
+ALTER TABLE public.shelters
+    ALTER COLUMN latitude TYPE double precision
+        USING CASE WHEN trim(latitude) ~ '^-?[0-9]+(\.[0-9]+)?$' THEN trim(latitude)::double precision END,
+    ALTER COLUMN longitude TYPE double precision
+        USING CASE WHEN trim(longitude) ~ '^-?[0-9]+(\.[0-9]+)?$' THEN trim(longitude)::double precision END;
+
+ALTER TABLE public.donors ADD COLUMN IF NOT EXISTS latitude double precision;
+ALTER TABLE public.donors ADD COLUMN IF NOT EXISTS longitude double precision;
+
+CREATE INDEX IF NOT EXISTS shelters_lat_lon_idx ON public.shelters (latitude, longitude);
+CREATE INDEX IF NOT EXISTS donors_lat_lon_idx ON public.donors (latitude, longitude);
@@ -0,0 +1,45 @@
+-- Cross-worker invalidation for the read cache (READ_CACHE_TTL_SECONDS > 0)
+-- Every change to a donor, shelter or request sends a NOTIFY on the
+-- cache_invalidation channel with a "namespace:key" payload; each API process
+-- listens and drops the matching entries (services/cache.py).
+-- Notifications are delivered on commit, and repeats within a transaction are merged.
+
+CREATE OR REPLACE FUNCTION public.notify_cache_invalidation() RETURNS trigger AS $$
+DECLARE
+    changed record;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+
+    IF TG_TABLE_NAME = 'donors' THEN
+        PERFORM pg_notify('cache_invalidation', 'users:' || coalesce(changed.uid, ''));
+    ELSIF TG_TABLE_NAME = 'shelters' THEN
+        PERFORM pg_notify('cache_invalidation', 'users:' || coalesce(changed.uid, ''));
+        PERFORM pg_notify('cache_invalidation', 'shelters:');
+    ELSIF TG_TABLE_NAME = 'requests' THEN
+        PERFORM pg_notify('cache_invalidation', 'shelter_requests:' || coalesce(changed.shelter_id, ''));
+        IF TG_OP = 'UPDATE' AND OLD.shelter_id IS DISTINCT FROM NEW.shelter_id THEN
+            PERFORM pg_notify('cache_invalidation', 'shelter_requests:' || OLD.shelter_id);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS donors_cache_invalidation ON public.donors;
+CREATE TRIGGER donors_cache_invalidation
+    AFTER INSERT OR UPDATE OR DELETE ON public.donors
+    FOR EACH ROW EXECUTE FUNCTION public.notify_cache_invalidation();
+
+DROP TRIGGER IF EXISTS shelters_cache_invalidation ON public.shelters;
+CREATE TRIGGER shelters_cache_invalidation
+    AFTER INSERT OR UPDATE OR DELETE ON public.shelters
+    FOR EACH ROW EXECUTE FUNCTION public.notify_cache_invalidation();
+
+DROP TRIGGER IF EXISTS requests_cache_invalidation ON public.requests;
+CREATE TRIGGER requests_cache_invalidation
+    AFTER INSERT OR UPDATE OR DELETE ON public.requests
+    FOR EACH ROW EXECUTE FUNCTION public.notify_cache_invalidation();
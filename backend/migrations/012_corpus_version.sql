@@ -0,0 +1,91 @@
+-- Corpus version for the similarity result cache (SIMILARITY_CACHE_TTL_SECONDS > 0)
+-- Any change to donations, requests, their embeddings, or the donor/shelter fields
+-- shown in match results bumps the version in the same transaction, so cached
+-- results computed against an older corpus are never served once the change commits.
+-- The triggers are deferred row triggers: the version row is only locked for the
+-- moment between the bump and the commit, once per transaction, and only by
+-- changes that can alter search results (not ingestion claims or match_ids).
+-- Safe to run again; run it again if an earlier copy of it was applied.
+
+CREATE TABLE IF NOT EXISTS public.corpus_version (
+    id boolean PRIMARY KEY DEFAULT true CHECK (id),
+    version bigint NOT NULL DEFAULT 0
+);
+ALTER TABLE public.corpus_version ADD COLUMN IF NOT EXISTS bumped_by bigint;
+INSERT INTO public.corpus_version (id, version) VALUES (true, 0) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION public.bump_corpus_version() RETURNS trigger AS $$
+BEGIN
+    -- Later rows of the same transaction match nothing and take no lock
+    UPDATE public.corpus_version
+    SET version = version + 1, bumped_by = txid_current()
+    WHERE bumped_by IS DISTINCT FROM txid_current();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement triggers from earlier copies of this file
+DROP TRIGGER IF EXISTS donations_corpus_version ON public.donations;
+DROP TRIGGER IF EXISTS requests_corpus_version ON public.requests;
+DROP TRIGGER IF EXISTS donation_embeddings_corpus_version ON public.donation_embeddings;
+DROP TRIGGER IF EXISTS request_embeddings_corpus_version ON public.request_embeddings;
+DROP TRIGGER IF EXISTS donors_corpus_version ON public.donors;
+DROP TRIGGER IF EXISTS shelters_corpus_version ON public.shelters;
+
+-- (Re)creates the triggers below over the watched columns that exist;
+-- migrations/016 calls it again once remaining_quantity and status exist
+CREATE OR REPLACE FUNCTION public.install_corpus_version_triggers() RETURNS void AS $$
+DECLARE
+    -- table, columns whose change alters search results
+    watched text[][] := ARRAY[
+        ['donations', 'item_name,category,quantity,remaining_quantity,status,donor_id'],
+        ['requests', 'item_name,category,quantity,remaining_quantity,status,shelter_id'],
+        ['donation_embeddings', 'embedding,model_version,category,is_open'],
+        ['request_embeddings', 'embedding,model_version,category,is_open'],
+        ['donors', 'uid,name,email,phone_number,latitude,longitude'],
+        ['shelters', 'uid,shelter_name,email,phone_number,latitude,longitude']
+    ];
+    tbl text;
+    cols text;
+    old_cols text;
+    new_cols text;
+BEGIN
+    FOR i IN 1 .. array_length(watched, 1) LOOP
+        tbl := watched[i][1];
+        SELECT string_agg(quote_ident(c.column_name), ', '),
+               string_agg('OLD.' || quote_ident(c.column_name), ', '),
+               string_agg('NEW.' || quote_ident(c.column_name), ', ')
+        INTO cols, old_cols, new_cols
+        FROM information_schema.columns c
+        WHERE c.table_schema = 'public'
+        AND c.table_name = tbl
+        AND c.column_name = ANY(string_to_array(watched[i][2], ','));
+
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON public.%I', tbl || '_corpus_version_write', tbl);
+        EXECUTE format(
+            'CREATE CONSTRAINT TRIGGER %I AFTER INSERT OR DELETE ON public.%I '
+            'DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION public.bump_corpus_version()',
+            tbl || '_corpus_version_write', tbl
+        );
+
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON public.%I', tbl || '_corpus_version_update', tbl);
+        EXECUTE format(
+            'CREATE CONSTRAINT TRIGGER %I AFTER UPDATE OF %s ON public.%I '
+            'DEFERRABLE INITIALLY DEFERRED FOR EACH ROW '
+            'WHEN ((%s) IS DISTINCT FROM (%s)) '
+            'EXECUTE FUNCTION public.bump_corpus_version()',
+            tbl || '_corpus_version_update', cols, tbl, old_cols, new_cols
+        );
+
+        -- Constraint triggers cannot fire on TRUNCATE
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON public.%I', tbl || '_corpus_version_truncate', tbl);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER TRUNCATE ON public.%I '
+            'FOR EACH STATEMENT EXECUTE FUNCTION public.bump_corpus_version()',
+            tbl || '_corpus_version_truncate', tbl
+        );
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT public.install_corpus_version_triggers();
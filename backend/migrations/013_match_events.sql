@@ -0,0 +1,27 @@
+-- Live match events for GET /match/stream/{user_id}
+-- NOTIFY on the match_events channel when a match is created or its status changes.
+-- The payload carries ids and the status only; clients fetch details from /match/matches.
+
+CREATE OR REPLACE FUNCTION public.notify_match_event() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('match_events', json_build_object(
+        'type', CASE WHEN TG_OP = 'INSERT' THEN 'match_created' ELSE 'status_changed' END,
+        'match_id', NEW.id,
+        'donor_id', NEW.donor_id,
+        'shelter_id', NEW.shelter_id,
+        'status', NEW.status
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS matches_created_event ON public.matches;
+CREATE TRIGGER matches_created_event
+    AFTER INSERT ON public.matches
+    FOR EACH ROW EXECUTE FUNCTION public.notify_match_event();
+
+DROP TRIGGER IF EXISTS matches_status_event ON public.matches;
+CREATE TRIGGER matches_status_event
+    AFTER UPDATE OF status ON public.matches
+    FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)
+    EXECUTE FUNCTION public.notify_match_event();
@@ -0,0 +1,5 @@
+-- Keyset pagination for GET /match/matches/{user_id}/{user_type}
+-- A user's matches are read newest first by (matched_at, id), filtered by status.
+
+CREATE INDEX IF NOT EXISTS matches_donor_id_matched_at_idx ON public.matches (donor_id, matched_at, id);
+CREATE INDEX IF NOT EXISTS matches_shelter_id_matched_at_idx ON public.matches (shelter_id, matched_at, id);
@@ -0,0 +1,34 @@
+-- Match retention (services/retention.py, MATCH_EXPIRY_DAYS / MATCH_ARCHIVE_AFTER_DAYS)
+-- Expired and long-finished matches are moved here in batches.
+
+CREATE TABLE IF NOT EXISTS public.matches_archive (
+    id uuid PRIMARY KEY,
+    donor_id text NOT NULL,
+    donation_id text NOT NULL,
+    donor_username text NOT NULL,
+    shelter_id text NOT NULL,
+    request_id text NOT NULL,
+    shelter_name text NOT NULL,
+    item_name text NOT NULL,
+    quantity integer NOT NULL,
+    category text NOT NULL,
+    matched_at timestamptz,
+    status text NOT NULL,
+    archive_reason text NOT NULL,
+    archived_at timestamptz DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS matches_archive_donor_id_matched_at_idx ON public.matches_archive (donor_id, matched_at);
+CREATE INDEX IF NOT EXISTS matches_archive_shelter_id_matched_at_idx ON public.matches_archive (shelter_id, matched_at);
+
+-- Partial indexes over live matches only. The status lists must match
+-- ACTIVE_MATCH_STATUSES in services/match.py for the planner to use them.
+-- The default (status=active) view of /match/matches
+CREATE INDEX IF NOT EXISTS matches_active_donor_idx
+    ON public.matches (donor_id, matched_at, id) WHERE status IN ('pending', 'donor', 'shelter');
+CREATE INDEX IF NOT EXISTS matches_active_shelter_idx
+    ON public.matches (shelter_id, matched_at, id) WHERE status IN ('pending', 'donor', 'shelter');
+-- The sweeper's oldest-first scans
+CREATE INDEX IF NOT EXISTS matches_active_matched_at_idx
+    ON public.matches (matched_at) WHERE status IN ('pending', 'donor', 'shelter');
+CREATE INDEX IF NOT EXISTS matches_completed_matched_at_idx
+    ON public.matches (matched_at) WHERE status = 'both';
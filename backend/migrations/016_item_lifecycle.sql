@@ -0,0 +1,141 @@
+-- Donation/request lifecycle (open, partially_matched, fulfilled, expired)
+-- remaining_quantity is taken down when a match reaches "both" (services/match.py);
+-- items that are no longer open drop out of every similarity search.
+
+ALTER TABLE public.donations ADD COLUMN IF NOT EXISTS remaining_quantity integer;
+ALTER TABLE public.donations ADD COLUMN IF NOT EXISTS status text NOT NULL DEFAULT 'open';
+ALTER TABLE public.requests ADD COLUMN IF NOT EXISTS remaining_quantity integer;
+ALTER TABLE public.requests ADD COLUMN IF NOT EXISTS status text NOT NULL DEFAULT 'open';
+UPDATE public.donations SET remaining_quantity = quantity WHERE remaining_quantity IS NULL;
+UPDATE public.requests SET remaining_quantity = quantity WHERE remaining_quantity IS NULL;
+
+-- Set once per match when its quantity is committed. Matches confirmed before
+-- this migration are marked as already counted, so they never commit later.
+ALTER TABLE public.matches ADD COLUMN IF NOT EXISTS fulfilled_quantity integer;
+ALTER TABLE IF EXISTS public.matches_archive ADD COLUMN IF NOT EXISTS fulfilled_quantity integer;
+UPDATE public.matches SET fulfilled_quantity = 0 WHERE status = 'both' AND fulfilled_quantity IS NULL;
+
+-- Copy of whether the item is open, next to its vectors, so the vector
+-- indexes can leave closed items out
+ALTER TABLE public.donation_embeddings ADD COLUMN IF NOT EXISTS is_open boolean NOT NULL DEFAULT true;
+ALTER TABLE public.request_embeddings ADD COLUMN IF NOT EXISTS is_open boolean NOT NULL DEFAULT true;
+
+CREATE OR REPLACE FUNCTION public.sync_donation_is_open() RETURNS trigger AS $$
+BEGIN
+    UPDATE public.donation_embeddings
+    SET is_open = NEW.status IN ('open', 'partially_matched')
+    WHERE donation_id = NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.sync_request_is_open() RETURNS trigger AS $$
+BEGIN
+    UPDATE public.request_embeddings
+    SET is_open = NEW.status IN ('open', 'partially_matched')
+    WHERE request_id = NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS donations_sync_is_open ON public.donations;
+CREATE TRIGGER donations_sync_is_open
+    AFTER UPDATE OF status ON public.donations
+    FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)
+    EXECUTE FUNCTION public.sync_donation_is_open();
+
+DROP TRIGGER IF EXISTS requests_sync_is_open ON public.requests;
+CREATE TRIGGER requests_sync_is_open
+    AFTER UPDATE OF status ON public.requests
+    FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)
+    EXECUTE FUNCTION public.sync_request_is_open();
+
+-- New vectors (edits, ingestion, re-embedding) start with the item's current state
+CREATE OR REPLACE FUNCTION public.set_donation_embedding_is_open() RETURNS trigger AS $$
+BEGIN
+    NEW.is_open := COALESCE(
+        (SELECT d.status IN ('open', 'partially_matched') FROM public.donations d WHERE d.id = NEW.donation_id),
+        true
+    );
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.set_request_embedding_is_open() RETURNS trigger AS $$
+BEGIN
+    NEW.is_open := COALESCE(
+        (SELECT r.status IN ('open', 'partially_matched') FROM public.requests r WHERE r.id = NEW.request_id),
+        true
+    );
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS donation_embeddings_set_is_open ON public.donation_embeddings;
+CREATE TRIGGER donation_embeddings_set_is_open
+    BEFORE INSERT ON public.donation_embeddings
+    FOR EACH ROW EXECUTE FUNCTION public.set_donation_embedding_is_open();
+
+DROP TRIGGER IF EXISTS request_embeddings_set_is_open ON public.request_embeddings;
+CREATE TRIGGER request_embeddings_set_is_open
+    BEFORE INSERT ON public.request_embeddings
+    FOR EACH ROW EXECUTE FUNCTION public.set_request_embedding_is_open();
+
+-- Vector indexes over open items only; every search filters on is_open.
+-- The operator class follows the column type, so this works with or without
+-- migrations/007 (halfvec). The per-category indexes of migrations/009 are
+-- rebuilt the same way: each new index is created before the old one is
+-- dropped, so searches always have an index. Safe to run again.
+DO $$
+DECLARE
+    item_table text;
+    ops text;
+    category text;
+    slug text;
+BEGIN
+    FOREACH item_table IN ARRAY ARRAY['donation_embeddings', 'request_embeddings'] LOOP
+        SELECT CASE WHEN format_type(a.atttypid, a.atttypmod) LIKE 'halfvec%'
+                    THEN 'halfvec_cosine_ops' ELSE 'vector_cosine_ops' END
+        INTO ops
+        FROM pg_attribute a
+        WHERE a.attrelid = ('public.' || item_table)::regclass AND a.attname = 'embedding';
+
+        EXECUTE format(
+            'CREATE INDEX IF NOT EXISTS %I ON public.%I USING hnsw (embedding %s) WHERE is_open',
+            item_table || '_open_hnsw_idx', item_table, ops
+        );
+        EXECUTE format('DROP INDEX IF EXISTS public.%I', item_table || '_hnsw_idx');
+
+        -- Same list as migrations/009; add a category to both
+        FOREACH category IN ARRAY ARRAY[
+            'Food', 'Clothing', 'Bedding', 'Medical Supplies', 'Hygiene', 'Baby Care',
+            'Educational', 'Toys', 'Electronics', 'Emergency Supplies', 'Other'
+        ] LOOP
+            slug := lower(replace(category, ' ', '_'));
+            EXECUTE format(
+                'CREATE INDEX IF NOT EXISTS %I ON public.%I USING hnsw (embedding %s) WHERE category = %L AND is_open',
+                item_table || '_open_hnsw_' || slug || '_idx', item_table, ops, category
+            );
+            EXECUTE format('DROP INDEX IF EXISTS public.%I', item_table || '_hnsw_' || slug || '_idx');
+        END LOOP;
+    END LOOP;
+END
+$$;
+
+-- The binary prefilter (migrations/008) also filters on is_open; its bit
+-- indexes can be rebuilt the same way with WHERE is_open.
+
+-- Listing the open items of a donor or shelter
+CREATE INDEX IF NOT EXISTS donations_open_donor_idx
+    ON public.donations (donor_id) WHERE status IN ('open', 'partially_matched');
+CREATE INDEX IF NOT EXISTS requests_open_shelter_idx
+    ON public.requests (shelter_id) WHERE status IN ('open', 'partially_matched');
+
+-- If migrations/012 was applied, let its corpus_version triggers watch the new columns
+DO $$
+BEGIN
+    IF to_regprocedure('public.install_corpus_version_triggers()') IS NOT NULL THEN
+        PERFORM public.install_corpus_version_triggers();
+    END IF;
+END
+$$;
@@ -0,0 +1,19 @@
+-- Claimable ingestion for donations/requests saved with defer_embedding
+-- embedding_status: pending (no vector yet) -> embedded (vector stored, not
+-- matched yet) -> ready. claimed_at is stamped by the drain that holds the
+-- row (services/ingestion.py) and cleared when it is done with it.
+
+ALTER TABLE public.donations ADD COLUMN IF NOT EXISTS embedding_status text NOT NULL DEFAULT 'ready';
+ALTER TABLE public.donations ADD COLUMN IF NOT EXISTS claimed_at timestamptz;
+ALTER TABLE public.requests ADD COLUMN IF NOT EXISTS embedding_status text NOT NULL DEFAULT 'ready';
+ALTER TABLE public.requests ADD COLUMN IF NOT EXISTS claimed_at timestamptz;
+
+-- Rows that were still waiting for a vector when this runs
+UPDATE public.donations d SET embedding_status = 'pending'
+WHERE NOT EXISTS (SELECT 1 FROM public.donation_embeddings de WHERE de.donation_id = d.id);
+UPDATE public.requests r SET embedding_status = 'pending'
+WHERE NOT EXISTS (SELECT 1 FROM public.request_embeddings re WHERE re.request_id = r.id);
+
+-- The drain only ever reads the few rows that are not ready yet
+CREATE INDEX IF NOT EXISTS donations_ingestion_idx ON public.donations (created_at) WHERE embedding_status <> 'ready';
+CREATE INDEX IF NOT EXISTS requests_ingestion_idx ON public.requests (created_at) WHERE embedding_status <> 'ready';
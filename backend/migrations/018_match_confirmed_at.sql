@@ -0,0 +1,14 @@
+-- When a match reached "both" (set by services/match.py resolve_match_db).
+-- MATCH_ARCHIVE_AFTER_DAYS ages completed matches from this time instead of
+-- matched_at, so a match confirmed today is not archived because it was made
+-- long ago. The confirmation time of existing matches is unknown; they count
+-- from when this migration runs, so none of them is archived early.
+
+ALTER TABLE public.matches ADD COLUMN IF NOT EXISTS confirmed_at timestamptz;
+ALTER TABLE IF EXISTS public.matches_archive ADD COLUMN IF NOT EXISTS confirmed_at timestamptz;
+UPDATE public.matches SET confirmed_at = now() WHERE status = 'both' AND confirmed_at IS NULL;
+
+-- The sweeper's oldest-first scan of completed matches
+CREATE INDEX IF NOT EXISTS matches_completed_confirmed_at_idx
+    ON public.matches (confirmed_at) WHERE status = 'both';
+DROP INDEX IF EXISTS public.matches_completed_matched_at_idx;
@@ -1,33 +1,92 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Response
 from fastapi.responses import JSONResponse
 from schemas.forms import DonationForm, DonorUpdate, RequestForm, ShelterUpdate
 from services.forms import save_donation, save_request, get_donations, get_requests, delete_donation as delete_donation_service, delete_request as delete_request_service, update_donation as update_donation_service, update_request as update_request_service, update_donor, update_shelter, delete_donor, delete_shelter
 from services.vector_match import find_best_match_for_donation, find_best_match_for_request, save_vector_matches
+from services.ingestion import process_pending_embeddings, get_ingestion_status
+from services.jobs import USE_JOB_QUEUE, enqueue_job
+from services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor
 from typing import List, Optional
+from datetime import datetime
 from fastapi import Query
+from fastapi.concurrency import run_in_threadpool
 from uuid import UUID
 router = APIRouter(prefix="/forms", tags=["forms"])
 
 
 @router.post("/donation")
-async def create_donation(donation: DonationForm):
+async def create_donation(
+    donation: DonationForm,
+    background_tasks: BackgroundTasks,
+    defer_embedding: bool = Query(False, description="Return 202 right away and embed in the background")
+):
     """
     Create a new donation entry for a donor.
 
     - Saves the donation to the database
+    - Runs off the event loop since embedding the item is CPU-bound
+    - With defer_embedding, returns 202 and embeds/matches in the background
     - Returns the created donation record
     """
-    return save_donation(donation)
+    if not defer_embedding:
+        return await run_in_threadpool(save_donation, donation)
+
+    result = await run_in_threadpool(save_donation, donation, defer_embedding=True)
+    if USE_JOB_QUEUE:
+        await run_in_threadpool(enqueue_job, "embed")
+    else:
+        background_tasks.add_task(process_pending_embeddings)
+    return JSONResponse(status_code=202, content=result)
 
 @router.post("/request")
-async def create_request(request: RequestForm):
+async def create_request(
+    request: RequestForm,
+    background_tasks: BackgroundTasks,
+    defer_embedding: bool = Query(False, description="Return 202 right away and embed in the background")
+):
     """
     Create a new request submitted by a shelter.
 
     - Saves the request to the database
+    - Runs off the event loop since embedding the item is CPU-bound
+    - With defer_embedding, returns 202 and embeds/matches in the background
     - Returns the created request record
     """
-    return save_request(request)
+    if not defer_embedding:
+        return await run_in_threadpool(save_request, request)
+
+    result = await run_in_threadpool(save_request, request, defer_embedding=True)
+    if USE_JOB_QUEUE:
+        await run_in_threadpool(enqueue_job, "embed")
+    else:
+        background_tasks.add_task(process_pending_embeddings)
+    return JSONResponse(status_code=202, content=result)
+
+@router.get("/donation/{donation_id}/status")
+async def donation_status(donation_id: UUID):
+    """
+    Check whether a donation saved with defer_embedding is ready.
+
+    - Returns "pending" until the embedding exists, then "ready"
+    - Raises 404 if the donation does not exist
+    """
+    result = get_ingestion_status(donation_id, "donation")
+    if not result:
+        raise HTTPException(status_code=404, detail="Donation not found")
+    return result
+
+@router.get("/request/{request_id}/status")
+async def request_status(request_id: UUID):
+    """
+    Check whether a request saved with defer_embedding is ready.
+
+    - Returns "pending" until the embedding exists, then "ready"
+    - Raises 404 if the request does not exist
+    """
+    result = get_ingestion_status(request_id, "request")
+    if not result:
+        raise HTTPException(status_code=404, detail="Request not found")
+    return result
 
 @router.put("/donation/{donation_id}")
 async def update_donation(donation_id: UUID, donation: DonationForm):
@@ -35,23 +94,40 @@ async def update_donation(donation_id: UUID, donation: DonationForm):
     Update an existing donation.
 
     - Applies updates to the donation record
+    - Skips rematching when only the quantity changed
     - Re-runs vector matching to find a new best match
     - Saves new match if generated
+    - With USE_JOB_QUEUE set, queues the matching for worker.py instead
     - Returns both the updated donation and the best match (if any)
     """
     # Update the donation
-    updated_donation = update_donation_service(donation_id, donation)
+    updated_donation = await run_in_threadpool(update_donation_service, donation_id, donation)
+
+    # Item text did not change, so the existing matches still stand
+    if not updated_donation.get("embedding_updated", True):
+        return {
+            "donation": updated_donation,
+            "best_match": None
+        }
+
+    if USE_JOB_QUEUE:
+        job_id = await run_in_threadpool(enqueue_job, "match", {"item_type": "donation", "item_id": str(donation_id)})
+        return {
+            "donation": updated_donation,
+            "best_match": None,
+            "match_job_id": job_id
+        }
 
     # Find new best match
     try:
-        best_match = find_best_match_for_donation(str(donation_id))
+        best_match = await run_in_threadpool(find_best_match_for_donation, str(donation_id))
         if not best_match:
             return {
                 "donation": updated_donation,
                 "best_match": None
             }
         # Save and get the formatted match with generated id
-        save_result = save_vector_matches([best_match])
+        save_result = await run_in_threadpool(save_vector_matches, [best_match])
         saved_matches = save_result.get("matches", [])
         return {
             "donation": updated_donation,
@@ -72,23 +148,40 @@ async def update_request(request_id: UUID, request: RequestForm):
     Update an existing shelter request.
 
     - Applies updates to the request record
+    - Skips rematching when only the quantity changed
     - Re-runs vector matching to compute a new best match
     - Saves new match if created
+    - With USE_JOB_QUEUE set, queues the matching for worker.py instead
     - Returns updated request and related match (if any)
     """
     # Update the request
-    updated_request = update_request_service(request_id, request)
+    updated_request = await run_in_threadpool(update_request_service, request_id, request)
+
+    # Item text did not change, so the existing matches still stand
+    if not updated_request.get("embedding_updated", True):
+        return {
+            "request": updated_request,
+            "best_match": None
+        }
+
+    if USE_JOB_QUEUE:
+        job_id = await run_in_threadpool(enqueue_job, "match", {"item_type": "request", "item_id": str(request_id)})
+        return {
+            "request": updated_request,
+            "best_match": None,
+            "match_job_id": job_id
+        }
 
     # Find new best match
     try:
-        best_match = find_best_match_for_request(str(request_id))
+        best_match = await run_in_threadpool(find_best_match_for_request, str(request_id))
         if not best_match:
             return {
                 "request": updated_request,
                 "best_match": None
             }
         # Save and get the formatted match with generated id
-        save_result = save_vector_matches([best_match])
+        save_result = await run_in_threadpool(save_vector_matches, [best_match])
         saved_matches = save_result.get("matches", [])
         return {
             "request": updated_request,
@@ -103,25 +196,69 @@ async def update_request(request_id: UUID, request: RequestForm):
         }
 
 @router.get("/donations", response_model=List[dict])
-async def list_donations(user_id: Optional[str] = Query(None)):
+async def list_donations(
+    response: Response,
+    user_id: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum donations per page"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    category: Optional[str] = Query(None),
+    created_after: Optional[datetime] = Query(None)
+):
     """
     Retrieve all donations.
 
     - If user_id is provided, returns donations only from that donor
-    - Otherwise returns all donations in the system
+    - Otherwise returns one page of all donations, oldest first
+    - The X-Next-Cursor response header holds the cursor for the next page
     """
-    return get_donations(user_id=user_id)
+    try:
+        donations = get_donations(
+            user_id=user_id,
+            limit=limit,
+            cursor=cursor,
+            category=category,
+            created_after=created_after
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not user_id and len(donations) == limit:
+        last = donations[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last["created_at"], last["donation_id"])
+    return donations
 
 
 @router.get("/requests", response_model=List[dict])
-async def list_requests(user_id: Optional[str] = Query(None)):
+async def list_requests(
+    response: Response,
+    user_id: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum requests per page"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    category: Optional[str] = Query(None),
+    created_after: Optional[datetime] = Query(None)
+):
     """
     Retrieve all requests.
 
     - If user_id is provided, returns requests only from that shelter
-    - Otherwise returns all requests in the system
+    - Otherwise returns one page of all requests, oldest first
+    - The X-Next-Cursor response header holds the cursor for the next page
     """
-    return get_requests(user_id=user_id)
+    try:
+        requests = get_requests(
+            user_id=user_id,
+            limit=limit,
+            cursor=cursor,
+            category=category,
+            created_after=created_after
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not user_id and len(requests) == limit:
+        last = requests[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last["created_at"], last["request_id"])
+    return requests
 
 @router.delete("/donation/{donation_id}/{donor_id}")
 async def delete_donation(donation_id: UUID, donor_id: str):
@@ -159,14 +296,16 @@ async def modify_donor(
     """
     Update donor profile information.
 
-    - Updates name, username, and phone number
+    - Updates name, username, phone number, latitude, and longitude
     - Returns updated donor record
     """
     return update_donor(
         uid=uid,
         name=donor_update.name,
         username=donor_update.username,
-        phone_number=donor_update.phone_number
+        phone_number=donor_update.phone_number,
+        latitude=donor_update.latitude,
+        longitude=donor_update.longitude
     )
 
 @router.put("/shelter/{uid}")
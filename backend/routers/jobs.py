@@ -0,0 +1,15 @@
+from fastapi import APIRouter, HTTPException, Query
+from services.jobs import get_queue_metrics
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/metrics")
+async def queue_metrics(window_seconds: int = Query(60, ge=1, le=86400, description="Throughput window in seconds")):
+    """
+    Retrieve job counts per type and status, plus recent throughput.
+    """
+    result = get_queue_metrics(window_seconds)
+    if "error" in result:
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
@@ -1,20 +1,90 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from services.match import get_matches_service, resolve_match_db
+from services.match_events import subscribe, unsubscribe, format_sse
+from services.singleflight import get_single_flight_metrics
+from services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor
 from uuid import UUID
 
+# Comment line sent on idle streams so proxies keep the connection open
+STREAM_KEEPALIVE_SECONDS = 15
+
 router = APIRouter(prefix="/match", tags=["match"])
 
 
 @router.get("/matches/{user_id}/{user_type}")
-async def get_matches(user_id: str, user_type: str):
+async def get_matches(
+    user_id: str,
+    user_type: str,
+    response: Response,
+    status: str = Query("active", description="active (pending, donor, shelter), all, or one of pending, donor, shelter, both"),
+    since: Optional[datetime] = Query(None, description="Only matches made at or after this time"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum matches per page"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page")
+):
     """
-    Retrieve matches for a given user ID and user type (donor or shelter).
+    Retrieve one page of matches for a given user ID and user type (donor or shelter).
+
+    - Newest first; only active matches unless status says otherwise
+    - The X-Next-Cursor response header holds the cursor for the next page
     """
-    result = get_matches_service(user_id, user_type)
+    try:
+        result = await run_in_threadpool(
+            get_matches_service, user_id, user_type,
+            status=status, since=since, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if "error" in result:
         raise HTTPException(status_code=404, detail=result["error"])
+
+    matches = result["matches"]
+    if len(matches) == limit:
+        last = matches[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last["matched_at"], last["id"])
     return result
 
+@router.get("/coalescing-metrics")
+async def coalescing_metrics():
+    """
+    Retrieve how often identical concurrent match lookups shared one query.
+    """
+    return get_single_flight_metrics()
+
+@router.get("/stream/{user_id}")
+async def stream_matches(user_id: str, request: Request):
+    """
+    Server-Sent Events stream of match_created and status_changed events
+    for a donor or shelter.
+
+    - Events carry the match id, both user ids and the status
+    - A resync event means events may have been missed; refetch /match/matches
+    """
+    queue = subscribe(user_id)
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.put("/resolve/{match_id}/{user_uid}")
 def resolve_match(match_id: UUID, user_uid: str):
     """
@@ -1,5 +1,5 @@
-from fastapi import APIRouter, HTTPException
-from services.shelters import get_all_shelters_service, get_shelter_requests_service
+from fastapi import APIRouter, HTTPException, Query
+from services.shelters import get_all_shelters_service, get_nearby_shelters_service, get_shelter_requests_service
 
 router = APIRouter(prefix="/shelters", tags=["shelters"])
 
@@ -14,6 +14,21 @@ async def get_all_shelters():
         raise HTTPException(status_code=500, detail=result["error"])
     return result
 
+@router.get("/nearby")
+async def get_nearby_shelters(
+    lat: float = Query(..., ge=-90, le=90, description="Latitude of the search center"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitude of the search center"),
+    radius: float = Query(10, gt=0, le=500, description="Search radius in km"),
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of shelters to return")
+):
+    """
+    Retrieve the shelters within radius km of a point, nearest first.
+    """
+    result = get_nearby_shelters_service(lat, lon, radius, limit)
+    if "error" in result:
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
+
 @router.get("/{shelter_id}/requests")
 async def get_shelter_requests(shelter_id: str):
     """
@@ -1,7 +1,8 @@
 """
 API routes for vector-based matching between donations and requests
 """
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from services.vector_match import (
     find_similar_requests,
     find_similar_donations,
@@ -12,7 +13,9 @@ from services.vector_match import (
     get_matches_for_shelter,
     save_vector_matches
 )
-from typing import Dict, Any
+from services.assignment import run_batch_assignment, ASSIGNMENT_CANDIDATES_K
+from services.fulfillment import plan_fulfillment, PLAN_CANDIDATES_K, PLAN_MAX_DONATIONS
+from typing import Dict, Any, Optional
 
 router = APIRouter(prefix="/vector-match", tags=["vector-matching"])
 
@@ -21,6 +24,7 @@ async def get_matches_for_donation(
     donation_id: str,
     limit: int = Query(10, ge=1, le=100, description="Maximum number of matches to return"),
     threshold: float = Query(0.7, ge=0.0, le=1.0, description="Minimum similarity score (0-1)"),
+    max_distance_km: Optional[float] = Query(None, gt=0, description="Only match counterparts within this many km"),
     save: bool = True
 ) -> Dict[str, Any]:
     """
@@ -29,7 +33,10 @@ async def get_matches_for_donation(
     Returns requests sorted by similarity score (highest first)
     Set save=true to automatically save matches to mock_matches.json
     """
-    matches = find_similar_requests(donation_id, limit=limit, threshold=threshold)
+    matches = await run_in_threadpool(
+        find_similar_requests,
+        donation_id, limit=limit, threshold=threshold, max_distance_km=max_distance_km
+    )
 
     result = {
         "donation_id": donation_id,
@@ -39,7 +46,7 @@ async def get_matches_for_donation(
 
     # Optionally save matches
     if save and matches:
-        save_result = save_vector_matches(matches)
+        save_result = await run_in_threadpool(save_vector_matches, matches)
         result["saved"] = save_result.get("saved", 0)
 
     return result
@@ -50,6 +57,7 @@ async def get_matches_for_request(
     request_id: str,
     limit: int = Query(10, ge=1, le=100, description="Maximum number of matches to return"),
     threshold: float = Query(0.7, ge=0.0, le=1.0, description="Minimum similarity score (0-1)"),
+    max_distance_km: Optional[float] = Query(None, gt=0, description="Only match counterparts within this many km"),
     save: bool = True
 ) -> Dict[str, Any]:
     """
@@ -58,7 +66,10 @@ async def get_matches_for_request(
     Returns donations sorted by similarity score (highest first)
     Set save=true to automatically save matches to mock_matches.json
     """
-    matches = find_similar_donations(request_id, limit=limit, threshold=threshold)
+    matches = await run_in_threadpool(
+        find_similar_donations,
+        request_id, limit=limit, threshold=threshold, max_distance_km=max_distance_km
+    )
 
     result = {
         "request_id": request_id,
@@ -68,12 +79,40 @@ async def get_matches_for_request(
 
     # Optionally save matches
     if save and matches:
-        save_result = save_vector_matches(matches)
+        save_result = await run_in_threadpool(save_vector_matches, matches)
         result["saved"] = save_result.get("saved", 0)
 
     return result
 
 
+@router.get("/request/{request_id}/fulfillment-plan")
+async def get_fulfillment_plan(
+    request_id: str,
+    k: int = Query(PLAN_CANDIDATES_K, ge=1, le=100, description="Similar donations to consider"),
+    threshold: float = Query(0.7, ge=0.0, le=1.0, description="Minimum similarity score (0-1)"),
+    max_donations: int = Query(PLAN_MAX_DONATIONS, ge=1, le=50, description="Most donations to combine"),
+    save: bool = Query(False, description="Store the plan's donations as pending matches")
+) -> Dict[str, Any]:
+    """
+    Plan a small set of similar donations whose quantities together fill a request
+
+    Uses as few donations as possible, then the most similar ones; each entry's
+    quantity is what that donation gives to the request
+    """
+    plan = await run_in_threadpool(
+        plan_fulfillment,
+        request_id, k=k, threshold=threshold, max_donations=max_donations
+    )
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Request not found")
+
+    if save and plan["donations"]:
+        save_result = await run_in_threadpool(save_vector_matches, plan["donations"])
+        plan["saved"] = save_result.get("saved", 0)
+
+    return plan
+
+
 @router.get("/donation/{donation_id}/best-match")
 async def get_best_match_for_donation(donation_id: str) -> Dict[str, Any]:
     """
@@ -81,7 +120,7 @@ async def get_best_match_for_donation(donation_id: str) -> Dict[str, Any]:
 
     Returns the highest similarity match or null if no good match found
     """
-    best_match = find_best_match_for_donation(donation_id)
+    best_match = await run_in_threadpool(find_best_match_for_donation, donation_id)
 
     if not best_match:
         return {
@@ -91,7 +130,7 @@ async def get_best_match_for_donation(donation_id: str) -> Dict[str, Any]:
         }
 
     # Save and get the formatted match with generated id
-    save_result = save_vector_matches([best_match])
+    save_result = await run_in_threadpool(save_vector_matches, [best_match])
     saved_matches = save_result.get("matches", [])
 
     # Return the saved match which includes the generated id
@@ -111,7 +150,7 @@ async def get_best_match_for_request(request_id: str) -> Dict[str, Any]:
 
     Returns the highest similarity match or null if no good match found
     """
-    best_match = find_best_match_for_request(request_id)
+    best_match = await run_in_threadpool(find_best_match_for_request, request_id)
 
     if not best_match:
         return {
@@ -121,7 +160,7 @@ async def get_best_match_for_request(request_id: str) -> Dict[str, Any]:
         }
 
     # Save and get the formatted match with generated id
-    save_result = save_vector_matches([best_match])
+    save_result = await run_in_threadpool(save_vector_matches, [best_match])
     saved_matches = save_result.get("matches", [])
 
     # Return the saved match which includes the generated id
@@ -144,7 +183,7 @@ async def get_all_matches(
 
     Useful for getting an overview of all possible matches
     """
-    matches = find_all_matches(threshold=threshold, min_quantity_match=min_quantity_match)
+    matches = await run_in_threadpool(find_all_matches, threshold=threshold, min_quantity_match=min_quantity_match)
 
     result = {
         "total_matches": len(matches),
@@ -152,24 +191,43 @@ async def get_all_matches(
     }
 
     # Save
-    save_result = save_vector_matches(matches)
+    save_result = await run_in_threadpool(save_vector_matches, matches)
     result["saved"] = save_result.get("saved", 0)
 
     return result
 
 
+@router.get("/assignments")
+async def get_batch_assignments(
+    threshold: float = Query(0.7, ge=0.0, le=1.0, description="Minimum similarity score (0-1)"),
+    k: int = Query(ASSIGNMENT_CANDIDATES_K, ge=1, le=50, description="Donations considered for each request"),
+    save: bool = Query(False, description="Store the assignments as pending matches")
+) -> Dict[str, Any]:
+    """
+    Assign open donations to open requests without promising any quantity twice
+
+    Unlike /all-matches, each donation's and request's remaining quantity is
+    split across at most as many matches as it can cover, most similar pairs first
+    """
+    result = await run_in_threadpool(run_batch_assignment, threshold=threshold, k=k, save=save)
+    if "error" in result:
+        raise HTTPException(status_code=409, detail=result["error"])
+    return result
+
+
 @router.get("/donor/{donor_id}/matches")
 async def get_donor_matches(
     donor_id: str,
     limit: int = Query(10, ge=1, le=100, description="Maximum matches per donation"),
-    threshold: float = Query(0.7, ge=0.0, le=1.0, description="Minimum similarity score (0-1)")
+    threshold: float = Query(0.7, ge=0.0, le=1.0, description="Minimum similarity score (0-1)"),
+    max_distance_km: Optional[float] = Query(None, gt=0, description="Only match counterparts within this many km")
 ) -> Dict[str, Any]:
     """
     Find all requests that match ANY donations from a specific donor
 
     Returns all matches for this donor's donations, sorted by similarity
     """
-    matches = get_matches_for_donor(donor_id, limit=limit, threshold=threshold)
+    matches = await run_in_threadpool(get_matches_for_donor, donor_id, limit=limit, threshold=threshold, max_distance_km=max_distance_km)
 
     result = {
         "donor_id": donor_id,
@@ -178,7 +236,7 @@ async def get_donor_matches(
     }
 
     # Save
-    save_result = save_vector_matches(matches)
+    save_result = await run_in_threadpool(save_vector_matches, matches)
     result["saved"] = save_result.get("saved", 0)
 
     return result
@@ -188,14 +246,15 @@ async def get_donor_matches(
 async def get_shelter_matches(
     shelter_id: str,
     limit: int = Query(10, ge=1, le=100, description="Maximum matches per request"),
-    threshold: float = Query(0.7, ge=0.0, le=1.0, description="Minimum similarity score (0-1)")
+    threshold: float = Query(0.7, ge=0.0, le=1.0, description="Minimum similarity score (0-1)"),
+    max_distance_km: Optional[float] = Query(None, gt=0, description="Only match counterparts within this many km")
 ) -> Dict[str, Any]:
     """
     Find all donations that match ANY requests from a specific shelter
 
     Returns all matches for this shelter's requests, sorted by similarity
     """
-    matches = get_matches_for_shelter(shelter_id, limit=limit, threshold=threshold)
+    matches = await run_in_threadpool(get_matches_for_shelter, shelter_id, limit=limit, threshold=threshold, max_distance_km=max_distance_km)
 
     result = {
         "shelter_id": shelter_id,
@@ -204,7 +263,7 @@ async def get_shelter_matches(
     }
 
     # Save
-    save_result = save_vector_matches(matches)
+    save_result = await run_in_threadpool(save_vector_matches, matches)
     result["saved"] = save_result.get("saved", 0)
 
     return result
@@ -1,4 +1,5 @@
 from pydantic import BaseModel, EmailStr
+from schemas.location import Coordinate
 
 # Donor data model
 class Donor(BaseModel):
@@ -6,4 +7,6 @@ class Donor(BaseModel):
     name: str
     username: str
     email: EmailStr
-    phone_number: str
\ No newline at end of file
+    phone_number: str
+    latitude: Coordinate = None
+    longitude: Coordinate = None
\ No newline at end of file
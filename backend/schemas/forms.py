@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import Optional
+from schemas.location import Coordinate
 
 # Donation Form
 class DonationForm(BaseModel):
@@ -20,6 +21,8 @@ class DonorUpdate(BaseModel):
     name: Optional[str] = None
     username: Optional[str] = None
     phone_number: Optional[str] = None
+    latitude: Coordinate = None
+    longitude: Coordinate = None
 
 # Shelter Update Model
 class ShelterUpdate(BaseModel):
@@ -29,5 +32,5 @@ class ShelterUpdate(BaseModel):
     city: Optional[str] = None
     state: Optional[str] = None
     zip_code: Optional[str] = None
-    latitude: Optional[str] = None
-    longitude: Optional[str] = None
\ No newline at end of file
+    latitude: Coordinate = None
+    longitude: Coordinate = None
\ No newline at end of file
@@ -0,0 +1,13 @@
+from pydantic import BeforeValidator
+from typing import Annotated, Optional
+
+
+def _blank_to_none(value):
+    # The profile form sends coordinates as text, and '' when there are none
+    if isinstance(value, str) and not value.strip():
+        return None
+    return value
+
+
+# Latitude/longitude accepted as a number or numeric string; blank means not set
+Coordinate = Annotated[Optional[float], BeforeValidator(_blank_to_none)]
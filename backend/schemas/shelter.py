@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from typing import Optional
+from schemas.location import Coordinate
 
 # Shelter data model
 class Shelter(BaseModel):
@@ -12,5 +13,5 @@ class Shelter(BaseModel):
     city: Optional[str] = None
     state: Optional[str] = None
     zip_code: Optional[str] = None
-    latitude: Optional[str] = None
-    longitude: Optional[str] = None
\ No newline at end of file
+    latitude: Coordinate = None
+    longitude: Coordinate = None
\ No newline at end of file
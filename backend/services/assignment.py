@@ -0,0 +1,276 @@
+"""
+Capacity-aware batch assignment of donations to requests
+
+find_all_matches lists every similar pair, so one donation can be offered to
+many shelters. Here every open request is linked to its top-k most similar
+open donations (one HNSW lookup each), and quantities are handed out along
+those edges from the most similar down. Each item is a capacity: its
+remaining quantity minus what its pending matches already promise.
+
+Taking edges greedily by similarity and filling each one as far as both
+capacities allow gives at least half of the best possible total of
+similarity x quantity over the same candidate edges. Postgres sorts the edges
+and streams them, so the pass itself is linear in the number of edges and
+only holds the capacities in memory.
+
+A run that saves holds a Postgres advisory lock from reading the capacities
+until its matches are stored, so two saving runs (the "assign" job and
+/vector-match/assignments?save=true) never promise the same quantity twice.
+Matches are inserted ASSIGNMENT_SAVE_BATCH_SIZE per transaction and the
+emails go out through "notify" jobs.
+
+    python -m services.assignment --threshold 0.7 --save
+"""
+import argparse
+from collections import defaultdict
+from datetime import datetime, timezone
+from uuid import UUID, uuid4
+from typing import Dict, Any, Iterable, List, Tuple
+from sqlalchemy import select, insert, text, func
+from database import engine, donations_table, requests_table, donors_table, shelters_table, matches_table
+from services.embeddings import MODEL_VERSION
+from services.match import available_quantities, add_match_ids
+
+# Donations linked to each request in the candidate graph
+ASSIGNMENT_CANDIDATES_K = 10
+# Edges fetched from the database per round trip
+ASSIGNMENT_FETCH_SIZE = 10000
+# Matches inserted per transaction when saving
+ASSIGNMENT_SAVE_BATCH_SIZE = 500
+# pg_try_advisory_lock key held by a saving run
+ASSIGNMENT_LOCK_KEY = 7243901
+
+_CANDIDATE_EDGES_QUERY = text("""
+    SELECT c.donation_id::text as donation_id, re.request_id::text as request_id, c.similarity
+    FROM request_embeddings re
+    CROSS JOIN LATERAL (
+        SELECT de.donation_id, 1 - (de.embedding <=> re.embedding) as similarity
+        FROM donation_embeddings de
+        WHERE de.model_version = :model_version
+        AND de.is_open
+        ORDER BY de.embedding <=> re.embedding
+        LIMIT :k
+    ) c
+    WHERE re.model_version = :model_version
+    AND re.is_open
+    AND c.similarity > :threshold
+    AND NOT EXISTS (
+        SELECT 1 FROM matches m
+        WHERE m.donation_id = c.donation_id::text
+        AND m.request_id = re.request_id::text
+    )
+    ORDER BY c.similarity DESC
+""")
+
+
+def assign_greedy(
+    edges: Iterable[Tuple[str, str, float]],
+    donation_capacity: Dict[str, int],
+    request_capacity: Dict[str, int]
+) -> List[Tuple[str, str, int, float]]:
+    """
+    Hand out quantities along edges, most similar first.
+
+    Args:
+        edges: (donation_id, request_id, similarity), sorted by similarity descending
+        donation_capacity: Quantity each donation can still give; updated in place
+        request_capacity: Quantity each request still needs; updated in place
+
+    Returns:
+        (donation_id, request_id, quantity, similarity) for every edge that got a quantity
+    """
+    assignments = []
+    for donation_id, request_id, similarity in edges:
+        quantity = min(donation_capacity.get(donation_id, 0), request_capacity.get(request_id, 0))
+        if quantity <= 0:
+            continue
+        donation_capacity[donation_id] -= quantity
+        request_capacity[request_id] -= quantity
+        assignments.append((donation_id, request_id, quantity, similarity))
+    return assignments
+
+
+def _candidate_edges(conn, threshold: float, k: int):
+    """
+    Stream the candidate graph's edges, most similar first.
+    """
+    result = conn.execution_options(stream_results=True, yield_per=ASSIGNMENT_FETCH_SIZE).execute(
+        _CANDIDATE_EDGES_QUERY,
+        {"model_version": MODEL_VERSION, "k": k, "threshold": threshold}
+    )
+    for row in result:
+        yield row.donation_id, row.request_id, float(row.similarity)
+
+
+def _describe(conn, assignments: List[Tuple[str, str, int, float]]) -> List[Dict[str, Any]]:
+    """
+    Turn assignments into match dicts accepted by save_vector_matches.
+    """
+    donation_ids = list({UUID(a[0]) for a in assignments})
+    request_ids = list({UUID(a[1]) for a in assignments})
+    donations = {
+        str(row.id): row
+        for row in conn.execute(
+            select(
+                donations_table.c.id, donations_table.c.donor_id, donations_table.c.item_name,
+                donations_table.c.category, donors_table.c.name.label("donor_name"),
+            )
+            .select_from(donations_table.outerjoin(donors_table, donors_table.c.uid == donations_table.c.donor_id))
+            .where(donations_table.c.id.in_(donation_ids))
+        )
+    }
+    requests = {
+        str(row.id): row
+        for row in conn.execute(
+            select(
+                requests_table.c.id, requests_table.c.shelter_id, requests_table.c.item_name,
+                func.coalesce(requests_table.c.remaining_quantity, requests_table.c.quantity).label("quantity"),
+                requests_table.c.category, shelters_table.c.shelter_name,
+            )
+            .select_from(requests_table.outerjoin(shelters_table, shelters_table.c.uid == requests_table.c.shelter_id))
+            .where(requests_table.c.id.in_(request_ids))
+        )
+    }
+
+    matches = []
+    for donation_id, request_id, quantity, similarity in assignments:
+        donation = donations.get(donation_id)
+        request = requests.get(request_id)
+        if donation is None or request is None:
+            continue
+        matches.append({
+            "donation_id": donation_id,
+            "donor_id": donation.donor_id,
+            "donor_name": donation.donor_name or "Unknown",
+            "donation_item": donation.item_name,
+            "request_id": request_id,
+            "shelter_id": request.shelter_id,
+            "shelter_name": request.shelter_name or "Unknown",
+            "item_name": request.item_name,
+            "category": request.category,
+            "quantity": quantity,
+            "shelter_needs": request.quantity,
+            "similarity_score": round(similarity, 4),
+            "can_fulfill": "full" if quantity >= request.quantity else "partial",
+        })
+    return matches
+
+
+def _save_assignments(matches: List[Dict[str, Any]]) -> int:
+    """
+    Store match dicts from _describe as pending matches.
+
+    - One multi-row INSERT and one match_ids update per user for each batch
+      of ASSIGNMENT_SAVE_BATCH_SIZE, each in its own short transaction
+    - Queues a "notify" job per match instead of emailing inline
+    - Returns how many matches were stored
+    """
+    # services.jobs imports this module for its "assign" job
+    from services.jobs import enqueue_job
+
+    saved = 0
+    for start in range(0, len(matches), ASSIGNMENT_SAVE_BATCH_SIZE):
+        now = datetime.now(timezone.utc)
+        rows = [
+            {
+                "id": str(uuid4()),
+                "status": "pending",
+                "matched_at": now,
+                "category": match["category"],
+                "quantity": match["quantity"],
+                "item_name": match["item_name"],
+                "shelter_name": match["shelter_name"],
+                "donor_username": match["donor_name"],
+                "donor_id": match["donor_id"],
+                "shelter_id": match["shelter_id"],
+                "donation_id": match["donation_id"],
+                "request_id": match["request_id"],
+            }
+            for match in matches[start:start + ASSIGNMENT_SAVE_BATCH_SIZE]
+        ]
+        donor_match_ids = defaultdict(list)
+        shelter_match_ids = defaultdict(list)
+        for row in rows:
+            donor_match_ids[row["donor_id"]].append(row["id"])
+            shelter_match_ids[row["shelter_id"]].append(row["id"])
+
+        with engine.begin() as conn:
+            conn.execute(insert(matches_table), rows)
+            add_match_ids(conn, donors_table, donor_match_ids)
+            add_match_ids(conn, shelters_table, shelter_match_ids)
+            for row in rows:
+                enqueue_job("notify", {"match_id": row["id"]}, conn=conn)
+        saved += len(rows)
+    return saved
+
+
+def run_batch_assignment(
+    threshold: float = 0.7,
+    k: int = ASSIGNMENT_CANDIDATES_K,
+    save: bool = False
+) -> Dict[str, Any]:
+    """
+    Assign open donations to open requests in one pass.
+
+    Args:
+        threshold: Minimum similarity score for an edge
+        k: Donations linked to each request
+        save: Store the assignments as pending matches (and notify both sides)
+
+    Returns:
+        The assignments as match dicts, with the edge count and the totals,
+        or {"error": ...} when save is set and another saving run holds the lock
+    """
+    with engine.connect() as conn:
+        if save and not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": ASSIGNMENT_LOCK_KEY}).scalar():
+            return {"error": "Another batch assignment is already saving matches"}
+
+        try:
+            donation_capacity = available_quantities(conn, "donation")
+            request_capacity = available_quantities(conn, "request")
+
+            edges = 0
+
+            def counted(stream):
+                nonlocal edges
+                for edge in stream:
+                    edges += 1
+                    yield edge
+
+            assignments = assign_greedy(counted(_candidate_edges(conn, threshold, k)), donation_capacity, request_capacity)
+            matches = _describe(conn, assignments) if assignments else []
+            # Don't keep the read transaction open while saving
+            conn.rollback()
+
+            result = {
+                "candidate_edges": edges,
+                "total_assignments": len(matches),
+                "assigned_quantity": sum(m["quantity"] for m in matches),
+                "total_score": round(sum(m["quantity"] * m["similarity_score"] for m in matches), 4),
+                "matches": matches,
+            }
+            if save and matches:
+                result["saved"] = _save_assignments(matches)
+            return result
+        finally:
+            if save:
+                # Session-level lock: released by this call, not by the rollback above
+                conn.rollback()
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ASSIGNMENT_LOCK_KEY})
+                conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assign open donations to open requests")
+    parser.add_argument("--threshold", type=float, default=0.7, help="Minimum similarity score")
+    parser.add_argument("--k", type=int, default=ASSIGNMENT_CANDIDATES_K, help="Donations linked to each request")
+    parser.add_argument("--save", action="store_true", help="Store the assignments as pending matches")
+    args = parser.parse_args()
+
+    result = run_batch_assignment(args.threshold, args.k, args.save)
+    result.pop("matches", None)
+    print(result)
+
+
+if __name__ == "__main__":
+    main()
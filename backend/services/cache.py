@@ -0,0 +1,152 @@
+"""
+In-process caches
+
+Read cache: TTL read-through cache for read-mostly lookups (shelters, shelter
+requests, user info). Entries live for READ_CACHE_TTL_SECONDS. Writes in this
+process invalidate their entries right away; writes from any other worker
+reach us through Postgres LISTEN/NOTIFY, sent by the triggers in
+migrations/011_cache_invalidation.sql. While the listener is not connected
+the cache is bypassed, so an entry is never served without invalidation.
+
+Versioned cache: results stored under a version number that the caller reads
+from the database (see services/vector_match.py). Entries of older versions
+are never served, so no invalidation messages are needed.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from dotenv import load_dotenv
+from database import is_sqlite
+from services.listener import add_channel, start_listener, is_listening
+
+load_dotenv()
+
+# 0 turns the cache off
+READ_CACHE_TTL_SECONDS = float(os.getenv("READ_CACHE_TTL_SECONDS", "0"))
+CACHE_CHANNEL = "cache_invalidation"
+
+# How long find_similar_* results are kept in the versioned cache; 0 turns it off
+SIMILARITY_CACHE_TTL_SECONDS = float(os.getenv("SIMILARITY_CACHE_TTL_SECONDS", "0"))
+SIMILARITY_CACHE_MAX_ENTRIES = 10000
+
+_entries: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+# Bumped on every invalidation so a load that raced with one is not stored
+_generations: Dict[str, int] = {}
+_lock = threading.Lock()
+
+_versioned: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+_current_version: Optional[int] = None
+
+
+def read_through(namespace: str, key: str, loader: Callable[[], Any]) -> Any:
+    """
+    Return the cached value for (namespace, key), calling loader on a miss.
+
+    Results containing an "error" key are never cached. Callers must not
+    mutate the returned value.
+    """
+    if READ_CACHE_TTL_SECONDS <= 0 or not _invalidation_ready():
+        return loader()
+
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get((namespace, key))
+        if entry and entry[0] > now:
+            return entry[1]
+        generation = _generations.get(namespace, 0)
+
+    value = loader()
+    if not (isinstance(value, dict) and "error" in value):
+        with _lock:
+            if _generations.get(namespace, 0) == generation:
+                _entries[(namespace, key)] = (time.monotonic() + READ_CACHE_TTL_SECONDS, value)
+    return value
+
+
+def invalidate(namespace: str, key: Optional[str] = None) -> None:
+    """
+    Drop one entry, or the whole namespace when key is None.
+    """
+    with _lock:
+        _generations[namespace] = _generations.get(namespace, 0) + 1
+        if key is None:
+            for cached_key in [k for k in _entries if k[0] == namespace]:
+                del _entries[cached_key]
+        else:
+            _entries.pop((namespace, str(key)), None)
+
+
+def clear() -> None:
+    """
+    Drop every entry of both caches.
+    """
+    global _current_version
+    with _lock:
+        for namespace in {k[0] for k in _entries} | set(_generations):
+            _generations[namespace] = _generations.get(namespace, 0) + 1
+        _entries.clear()
+        _versioned.clear()
+        _current_version = None
+
+
+def handle_notification(payload: str) -> None:
+    """
+    Apply a "namespace:key" (or "namespace:") invalidation sent by a trigger.
+    """
+    namespace, _, key = payload.partition(":")
+    invalidate(namespace, key or None)
+
+
+def versioned_get(key: Hashable, version: int) -> Any:
+    """
+    Return the value stored for key under version, or None.
+
+    Seeing a newer version drops every entry of the older ones.
+    """
+    global _current_version
+    with _lock:
+        if _current_version is None or version > _current_version:
+            _versioned.clear()
+            _current_version = version
+            return None
+        if version < _current_version:
+            return None
+        entry = _versioned.get(key)
+        if not entry:
+            return None
+        if entry[0] <= time.monotonic():
+            del _versioned[key]
+            return None
+        _versioned.move_to_end(key)
+        return entry[1]
+
+
+def versioned_put(key: Hashable, version: int, value: Any) -> None:
+    """
+    Store value for key unless a newer version has been seen since it was read.
+
+    The least recently used entries are dropped past SIMILARITY_CACHE_MAX_ENTRIES.
+    """
+    with _lock:
+        if version != _current_version:
+            return
+        _versioned[key] = (time.monotonic() + SIMILARITY_CACHE_TTL_SECONDS, value)
+        _versioned.move_to_end(key)
+        while len(_versioned) > SIMILARITY_CACHE_MAX_ENTRIES:
+            _versioned.popitem(last=False)
+
+
+def _invalidation_ready() -> bool:
+    """
+    SQLite is single-process; Postgres needs the listener connected.
+    """
+    if is_sqlite:
+        return True
+    start_listener()
+    return is_listening(CACHE_CHANNEL)
+
+
+# Anything cached may be stale after notifications were missed
+add_channel(CACHE_CHANNEL, handle_notification, on_reset=clear)
@@ -0,0 +1,447 @@
+"""
+Incrementally maintained match candidates
+
+The match_candidates table holds, for every donation and every request, its
+top-k most similar counterparts. A pair is kept while it ranks in the top-k of
+either side, so reading an item's candidates is an indexed lookup instead of a
+vector scan. The table is updated whenever an item is saved, edited or deleted,
+and when it is fulfilled, expired or reopened.
+"""
+import os
+from typing import List, Dict, Any, Tuple
+from sqlalchemy import text, select
+from database import engine, donations_table, requests_table, EMBEDDING_SQL_TYPE
+from services.embeddings import MODEL_VERSION
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Maintain match_candidates and serve get_matches_for_donor/shelter from it
+# (run migrations/002_create_match_candidates.sql and the backfill first)
+USE_MATCH_CANDIDATES = os.getenv("USE_MATCH_CANDIDATES", "false").lower() == "true"
+
+# Candidates kept per item
+MATCH_CANDIDATES_K = 20
+# Pairs below this similarity are never stored
+CANDIDATE_MIN_SIMILARITY = 0.5
+# How many nearest counterparts are checked when a new item may enter their
+# top-k; the next, wider scan only runs while the previous one was still
+# above CANDIDATE_MIN_SIMILARITY. 1000 is the largest hnsw.ef_search allows.
+REVERSE_SCAN_LIMITS = (200, 1000)
+
+# Embedding tables and column names for each side of a pair
+_SIDES = {
+    "donation": {
+        "embeddings": "donation_embeddings",
+        "other_embeddings": "request_embeddings",
+        "column": "donation_id",
+        "other_column": "request_id",
+        "other_type": "request",
+    },
+    "request": {
+        "embeddings": "request_embeddings",
+        "other_embeddings": "donation_embeddings",
+        "column": "request_id",
+        "other_column": "donation_id",
+        "other_type": "donation",
+    },
+}
+
+
+def _nearest_counterparts(conn, item_type: str, item_id: str, scan_limits) -> List[Tuple[str, float]]:
+    """
+    The item's nearest open counterparts above CANDIDATE_MIN_SIMILARITY, most
+    similar first.
+
+    The item's vector is read first and bound as a parameter, so the scan is
+    an HNSW index lookup rather than a join over the other embeddings table.
+    Each size in scan_limits is tried in turn until a scan ends below the
+    similarity floor.
+    """
+    side = _SIDES[item_type]
+    embedding = conn.execute(
+        text(f"""
+            SELECT embedding::text FROM {side['embeddings']}
+            WHERE {side['column']} = :item_id
+            AND model_version = :model_version
+            AND is_open
+        """),
+        {"item_id": str(item_id), "model_version": MODEL_VERSION}
+    ).scalar()
+    if embedding is None:
+        return []
+
+    query = text(f"""
+        SELECT nearest.other_id, nearest.similarity
+        FROM (
+            SELECT
+                o.{side['other_column']} as other_id,
+                1 - (o.embedding <=> CAST(:embedding AS {EMBEDDING_SQL_TYPE})) as similarity
+            FROM {side['other_embeddings']} o
+            WHERE o.model_version = :model_version
+            AND o.is_open
+            ORDER BY o.embedding <=> CAST(:embedding AS {EMBEDDING_SQL_TYPE})
+            LIMIT :scan_limit
+        ) nearest
+        WHERE nearest.similarity > :min_similarity
+        ORDER BY nearest.similarity DESC
+    """)
+
+    neighbours = []
+    for scan_limit in scan_limits:
+        # An HNSW scan returns at most ef_search rows
+        conn.execute(text(f"SET LOCAL hnsw.ef_search = {max(40, int(scan_limit))}"))
+        neighbours = conn.execute(query, {
+            "embedding": embedding,
+            "model_version": MODEL_VERSION,
+            "min_similarity": CANDIDATE_MIN_SIMILARITY,
+            "scan_limit": scan_limit,
+        }).fetchall()
+        if len(neighbours) < scan_limit:
+            break
+    return [(str(row.other_id), float(row.similarity)) for row in neighbours]
+
+
+def _insert_top_candidates(conn, item_type: str, item_id: str, include_reverse: bool) -> List[str]:
+    """
+    Insert the top-k counterparts of one item.
+
+    With include_reverse, also insert pairs outside the item's own top-k when
+    the item now ranks in the counterpart's top-k.
+    Returns the counterparts that got a new pair.
+    """
+    side = _SIDES[item_type]
+    scan_limits = REVERSE_SCAN_LIMITS if include_reverse else (MATCH_CANDIDATES_K,)
+    neighbours = _nearest_counterparts(conn, item_type, item_id, scan_limits)
+    if not neighbours:
+        return []
+
+    reverse_filter = ""
+    if include_reverse:
+        reverse_filter = f"""
+            OR (
+                SELECT count(*) FROM match_candidates mc
+                WHERE mc.{side['other_column']} = n.other_id
+                AND mc.similarity >= n.similarity
+            ) < :k
+        """
+
+    rows = conn.execute(
+        text(f"""
+            INSERT INTO match_candidates ({side['column']}, {side['other_column']}, similarity)
+            SELECT CAST(:item_id AS uuid), n.other_id, n.similarity
+            FROM unnest(CAST(:other_ids AS uuid[]), CAST(:similarities AS double precision[]))
+                WITH ORDINALITY AS n(other_id, similarity, rank)
+            WHERE n.rank <= :k
+            {reverse_filter}
+            ON CONFLICT DO NOTHING
+            RETURNING {side['other_column']}
+        """),
+        {
+            "item_id": str(item_id),
+            "other_ids": [other_id for other_id, _ in neighbours],
+            "similarities": [similarity for _, similarity in neighbours],
+            "k": MATCH_CANDIDATES_K,
+        }
+    ).fetchall()
+    return [str(row[0]) for row in rows]
+
+
+def _prune_candidates(conn, item_type: str, item_ids: List[str]) -> None:
+    """
+    Trim items back to their top-k after new pairs pushed older ones down.
+
+    A pair is deleted once it ranks in neither side's top-k.
+    """
+    if not item_ids:
+        return
+    side = _SIDES[item_type]
+    conn.execute(
+        text(f"""
+            DELETE FROM match_candidates mc
+            WHERE mc.{side['column']} = ANY(CAST(:item_ids AS uuid[]))
+            AND (
+                SELECT count(*) FROM match_candidates own
+                WHERE own.{side['column']} = mc.{side['column']}
+                AND own.similarity > mc.similarity
+            ) >= :k
+            AND (
+                SELECT count(*) FROM match_candidates other
+                WHERE other.{side['other_column']} = mc.{side['other_column']}
+                AND other.similarity > mc.similarity
+            ) >= :k
+        """),
+        {"item_ids": sorted(set(item_ids)), "k": MATCH_CANDIDATES_K}
+    )
+
+
+def _remove_candidates(conn, item_type: str, item_id: str) -> List[str]:
+    """
+    Delete every pair involving an item and return the counterparts it touched.
+    """
+    side = _SIDES[item_type]
+    rows = conn.execute(
+        text(f"""
+            DELETE FROM match_candidates
+            WHERE {side['column']} = :item_id
+            RETURNING {side['other_column']}
+        """),
+        {"item_id": str(item_id)}
+    ).fetchall()
+    return [str(row[0]) for row in rows]
+
+
+def refresh_candidates(item_type: str, item_id: str) -> bool:
+    """
+    Recompute candidates after a donation or request is saved or edited.
+
+    - Drops the item's old pairs
+    - Inserts its new top-k, plus pairs where it entered a counterpart's top-k
+    - Refills counterparts that lost a pair, since their k-th slot is now open
+
+    Returns True on success.
+    """
+    if not USE_MATCH_CANDIDATES:
+        return False
+    try:
+        with engine.begin() as conn:
+            affected = _remove_candidates(conn, item_type, item_id)
+            gained = _insert_top_candidates(conn, item_type, item_id, include_reverse=True)
+            other_type = _SIDES[item_type]["other_type"]
+            for other_id in affected:
+                _prune_candidates(conn, item_type, _insert_top_candidates(conn, other_type, other_id, include_reverse=False))
+            _prune_candidates(conn, other_type, gained)
+        return True
+    except Exception as e:
+        print(f"Error refreshing match candidates for {item_type} {item_id}: {e}")
+        return False
+
+
+def remove_candidates(item_type: str, item_id: str) -> bool:
+    """
+    Drop a deleted or no longer open donation or request from match_candidates.
+
+    Counterparts that listed it get their top-k refilled.
+    Returns True on success.
+    """
+    if not USE_MATCH_CANDIDATES:
+        return False
+    try:
+        with engine.begin() as conn:
+            affected = _remove_candidates(conn, item_type, item_id)
+            other_type = _SIDES[item_type]["other_type"]
+            for other_id in affected:
+                _prune_candidates(conn, item_type, _insert_top_candidates(conn, other_type, other_id, include_reverse=False))
+        return True
+    except Exception as e:
+        print(f"Error removing match candidates for {item_type} {item_id}: {e}")
+        return False
+
+
+def remove_candidates_for_items(item_type: str, item_ids: List[str]) -> bool:
+    """
+    Drop many deleted or expired donations or requests from match_candidates at once.
+
+    Used when a whole account is deleted and by the expiry sweep. Each counterpart that listed any of
+    the items is refilled once.
+    Returns True on success.
+    """
+    if not USE_MATCH_CANDIDATES or not item_ids:
+        return False
+    side = _SIDES[item_type]
+    try:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text(f"""
+                    DELETE FROM match_candidates
+                    WHERE {side['column']} = ANY(CAST(:item_ids AS uuid[]))
+                    RETURNING {side['other_column']}
+                """),
+                {"item_ids": [str(item_id) for item_id in item_ids]}
+            ).fetchall()
+            for other_id in {str(row[0]) for row in rows}:
+                gained = _insert_top_candidates(conn, side["other_type"], other_id, include_reverse=False)
+                _prune_candidates(conn, item_type, gained)
+        return True
+    except Exception as e:
+        print(f"Error removing match candidates for {len(item_ids)} {item_type}s: {e}")
+        return False
+
+
+def can_serve_from_candidates(limit: int, threshold: float) -> bool:
+    """
+    Whether a (limit, threshold) query is fully answered by the stored top-k.
+    """
+    return USE_MATCH_CANDIDATES and limit <= MATCH_CANDIDATES_K and threshold >= CANDIDATE_MIN_SIMILARITY
+
+
+def get_candidate_matches_for_donor(donor_id: str, limit: int = 10, threshold: float = 0.7) -> List[Dict[str, Any]]:
+    """
+    Read the stored top matches for every open donation of a donor.
+
+    Returns the same fields as get_matches_for_donor, sorted by similarity.
+    """
+    query = text("""
+        SELECT
+            c.donation_id,
+            c.similarity,
+            d.donor_id,
+            d.item_name as donation_item,
+            coalesce(d.remaining_quantity, d.quantity) as donation_quantity,
+            d.category as donation_category,
+            don.name as donor_name,
+            r.id as request_id,
+            r.shelter_id,
+            r.item_name,
+            coalesce(r.remaining_quantity, r.quantity) as quantity,
+            r.category,
+            r.created_at,
+            s.shelter_name,
+            s.email as shelter_email,
+            s.phone_number as shelter_phone
+        FROM (
+            SELECT
+                mc.donation_id,
+                mc.request_id,
+                mc.similarity,
+                row_number() OVER (PARTITION BY mc.donation_id ORDER BY mc.similarity DESC) as rank
+            FROM match_candidates mc
+            JOIN donations d ON d.id = mc.donation_id
+            JOIN requests r ON r.id = mc.request_id
+            WHERE d.donor_id = :donor_id
+            AND d.status IN ('open', 'partially_matched')
+            AND r.status IN ('open', 'partially_matched')
+            AND mc.similarity > :threshold
+        ) c
+        JOIN donations d ON d.id = c.donation_id
+        JOIN requests r ON r.id = c.request_id
+        LEFT JOIN donors don ON d.donor_id = don.uid
+        LEFT JOIN shelters s ON r.shelter_id = s.uid
+        WHERE c.rank <= :limit
+        ORDER BY c.similarity DESC
+    """)
+
+    with engine.connect() as conn:
+        results = conn.execute(query, {"donor_id": donor_id, "threshold": threshold, "limit": limit}).fetchall()
+
+    return [
+        {
+            "request_id": row.request_id,
+            "donor_id": row.donor_id,
+            "donor_name": row.donor_name or "Unknown",
+            "shelter_id": row.shelter_id,
+            "shelter_name": row.shelter_name,
+            "shelter_email": row.shelter_email,
+            "shelter_phone": row.shelter_phone,
+            "item_name": row.item_name,
+            "quantity": row.quantity,
+            "category": row.category,
+            "created_at": str(row.created_at) if row.created_at else None,
+            "similarity_score": round(float(row.similarity), 4),
+            "donation_has": row.donation_quantity,
+            "shelter_needs": row.quantity,
+            "can_fulfill": "full" if row.donation_quantity >= row.quantity else "partial",
+            "donation_id": row.donation_id,
+            "donation_item": row.donation_item,
+            "donation_quantity": row.donation_quantity,
+            "donation_category": row.donation_category,
+        }
+        for row in results
+    ]
+
+
+def get_candidate_matches_for_shelter(shelter_id: str, limit: int = 10, threshold: float = 0.7) -> List[Dict[str, Any]]:
+    """
+    Read the stored top matches for every open request of a shelter.
+
+    Returns the same fields as get_matches_for_shelter, sorted by similarity.
+    """
+    query = text("""
+        SELECT
+            c.request_id,
+            c.similarity,
+            r.shelter_id,
+            r.item_name as request_item,
+            coalesce(r.remaining_quantity, r.quantity) as request_quantity,
+            r.category as request_category,
+            s.shelter_name,
+            d.id as donation_id,
+            d.donor_id,
+            d.item_name,
+            coalesce(d.remaining_quantity, d.quantity) as quantity,
+            d.category,
+            d.created_at,
+            don.name as donor_name,
+            don.email as donor_email,
+            don.phone_number as donor_phone
+        FROM (
+            SELECT
+                mc.donation_id,
+                mc.request_id,
+                mc.similarity,
+                row_number() OVER (PARTITION BY mc.request_id ORDER BY mc.similarity DESC) as rank
+            FROM match_candidates mc
+            JOIN requests r ON r.id = mc.request_id
+            JOIN donations d ON d.id = mc.donation_id
+            WHERE r.shelter_id = :shelter_id
+            AND r.status IN ('open', 'partially_matched')
+            AND d.status IN ('open', 'partially_matched')
+            AND mc.similarity > :threshold
+        ) c
+        JOIN requests r ON r.id = c.request_id
+        JOIN donations d ON d.id = c.donation_id
+        LEFT JOIN shelters s ON r.shelter_id = s.uid
+        LEFT JOIN donors don ON d.donor_id = don.uid
+        WHERE c.rank <= :limit
+        ORDER BY c.similarity DESC
+    """)
+
+    with engine.connect() as conn:
+        results = conn.execute(query, {"shelter_id": shelter_id, "threshold": threshold, "limit": limit}).fetchall()
+
+    return [
+        {
+            "donation_id": row.donation_id,
+            "donor_id": row.donor_id,
+            "donor_name": row.donor_name,
+            "donor_email": row.donor_email,
+            "donor_phone": row.donor_phone,
+            "shelter_id": row.shelter_id,
+            "shelter_name": row.shelter_name or "Unknown",
+            "item_name": row.item_name,
+            "quantity": row.quantity,
+            "category": row.category,
+            "created_at": str(row.created_at) if row.created_at else None,
+            "similarity_score": round(float(row.similarity), 4),
+            "donor_has": row.quantity,
+            "shelter_needs": row.request_quantity,
+            "can_fulfill": "full" if row.quantity >= row.request_quantity else "partial",
+            "request_id": row.request_id,
+            "request_item": row.request_item,
+            "request_quantity": row.request_quantity,
+            "request_category": row.request_category,
+        }
+        for row in results
+    ]
+
+
+def rebuild_all_candidates() -> Dict[str, int]:
+    """
+    Backfill match_candidates for every existing donation and request.
+    """
+    with engine.connect() as conn:
+        donation_ids = conn.execute(select(donations_table.c.id)).scalars().all()
+        request_ids = conn.execute(select(requests_table.c.id)).scalars().all()
+
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM match_candidates"))
+        for donation_id in donation_ids:
+            _insert_top_candidates(conn, "donation", donation_id, include_reverse=False)
+        for request_id in request_ids:
+            _insert_top_candidates(conn, "request", request_id, include_reverse=False)
+
+    return {"donations": len(donation_ids), "requests": len(request_ids)}
+
+
+if __name__ == "__main__":
+    print(rebuild_all_candidates())
@@ -1,17 +1,171 @@
+"""
+Embedding generation for donations and requests.
+
+Inference runs on a small dedicated thread pool so the CPU-bound
+model.encode call never blocks the FastAPI event loop.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
+from sqlalchemy import delete, insert
+
+from database import donation_embeddings_table, request_embeddings_table
+
+load_dotenv()
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Every (model, text template) pair that has produced stored vectors.
+# The key is the model_version stored next to each vector. Changing either the
+# model or the template needs a new entry here and a backfill (services.reembed).
+# Vectors are stored as vector(384), so every model must output 384 dimensions.
+EMBEDDING_MODELS = {
+    "all-MiniLM-L6-v2": {"model_name": MODEL_NAME, "template": "{item_name},{category}"},
+}
+
+# The version used for new items and for every similarity query.
+# Switch it only after a backfill to the new version has finished.
+MODEL_VERSION = os.getenv("EMBEDDING_MODEL_VERSION", "all-MiniLM-L6-v2")
+if MODEL_VERSION not in EMBEDDING_MODELS:
+    raise ValueError(f"Unknown EMBEDDING_MODEL_VERSION: {MODEL_VERSION}")
+
+# Side table and key column holding the vectors for each item type
+EMBEDDING_TABLES = {
+    "donation": (donation_embeddings_table, donation_embeddings_table.c.donation_id),
+    "request": (request_embeddings_table, request_embeddings_table.c.request_id),
+}
+
+# How many encodes may run at the same time
+EMBEDDING_WORKERS = max(1, int(os.getenv("EMBEDDING_WORKERS", "1")))
+# Torch threads used inside a single encode, defaults to an even share of the cores
+EMBEDDING_INTRA_OP_THREADS = max(1, int(os.getenv(
+    "EMBEDDING_INTRA_OP_THREADS",
+    str((os.cpu_count() or 1) // EMBEDDING_WORKERS),
+)))
+
+embedding_executor = ThreadPoolExecutor(
+    max_workers=EMBEDDING_WORKERS,
+    thread_name_prefix="embedding",
+)
+
+_models: dict[str, SentenceTransformer] = {}
+_model_lock = threading.Lock()
+
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
+def get_model(model_version: str = None) -> SentenceTransformer:
+    """
+    Return the shared sentence transformer for a version, loading it on first use.
+
+    - Defaults to the active MODEL_VERSION
+    - Caps torch intra-op threads before the model is built
+    - Only one thread ever loads each model
+    """
+    model_version = model_version or MODEL_VERSION
+    model = _models.get(model_version)
+    if model is None:
+        with _model_lock:
+            model = _models.get(model_version)
+            if model is None:
+                torch.set_num_threads(EMBEDDING_INTRA_OP_THREADS)
+                model = SentenceTransformer(EMBEDDING_MODELS[model_version]["model_name"])
+                _models[model_version] = model
+    return model
+
+
+def embedding_text(category: str, item_name: str, model_version: str = None) -> str:
+    """
+    Build the model input for an item using the version's text template.
+    """
+    template = EMBEDDING_MODELS[model_version or MODEL_VERSION]["template"]
+    return template.format(item_name=item_name, category=category)
+
+
+def normalize_embedding_text(category: str, item_name: str) -> str:
+    """
+    Return the embedding input for an item in a canonical form.
 
-def generate_embedding(category: str, item_name: str, quantity: int) -> list[float]:
+    The model is uncased and ignores extra whitespace, so two items with the
+    same normalized text always get the same embedding.
+    """
+    item_name = " ".join(item_name.split()).lower()
+    category = " ".join(category.split()).lower()
+    return f"{item_name},{category}"
+
+
+def _encode(text: str, model_version: str = None) -> list[float]:
+    print("Generating embedding for: ", text)
+    embedding = get_model(model_version).encode(text)
+    print("---------------Finished Generating Embedding-----------------")
+    return embedding.tolist()
+
+
+def generate_embedding(category: str, item_name: str, quantity: int, model_version: str = None) -> list[float]:
     """
     Generate a vector embedding for an item.
 
-    - Combines item name and category into a single string
-    - Uses a sentence transformer model to create the embedding
+    - Combines item name and category using the version's text template
+    - Uses the version's sentence transformer model (default: MODEL_VERSION)
+    - Runs the model on the embedding pool and blocks until it finishes
     - Returns the embedding as a list of floats
     """
-    embedding_text = f"{item_name},{category}"
-    print("Generating embedding for: ", embedding_text)
-    embedding = model.encode(embedding_text)
-    print("---------------Finished Generating Embedding-----------------")
-    return embedding.tolist()
\ No newline at end of file
+    text = embedding_text(category, item_name, model_version)
+    return embedding_executor.submit(_encode, text, model_version).result()
+
+
+async def generate_embedding_async(category: str, item_name: str, quantity: int, model_version: str = None) -> list[float]:
+    """
+    Awaitable version of generate_embedding for use inside async code.
+
+    - Schedules the encode on the embedding pool
+    - Leaves the event loop free while the model runs
+    """
+    text = embedding_text(category, item_name, model_version)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(embedding_executor, _encode, text, model_version)
+
+
+def _encode_batch(texts: list[str], model_version: str = None) -> list[list[float]]:
+    print(f"Generating {len(texts)} embeddings")
+    embeddings = get_model(model_version).encode(texts)
+    print("---------------Finished Generating Embeddings----------------")
+    return [embedding.tolist() for embedding in embeddings]
+
+
+def generate_embeddings(items: list[tuple[str, str]], model_version: str = None) -> list[list[float]]:
+    """
+    Generate embeddings for several items in one model call.
+
+    - Takes a list of (category, item_name) pairs
+    - Runs a single batched encode on the embedding pool
+    - Returns the embeddings in the same order as the input
+    """
+    if not items:
+        return []
+    texts = [embedding_text(category, item_name, model_version) for category, item_name in items]
+    return embedding_executor.submit(_encode_batch, texts, model_version).result()
+
+
+def store_embedding(conn, item_type: str, item_id, embedding: list[float], category: str) -> None:
+    """
+    Write the active-version vector for a donation or request.
+
+    The item's category is copied next to the vector so category-scoped
+    searches can use the per-category indexes.
+
+    Vectors of every other version are dropped too, since they were built
+    from the item's previous text; a running backfill will re-create them.
+    Runs on the caller's connection so it commits with the item itself.
+    """
+    table, key = EMBEDDING_TABLES[item_type]
+    conn.execute(delete(table).where(key == item_id))
+    conn.execute(insert(table).values({
+        key.name: item_id,
+        "embedding": embedding,
+        "model_version": MODEL_VERSION,
+        "category": category,
+    }))
@@ -2,18 +2,29 @@ from schemas.forms import DonationForm, RequestForm
 from typing import List
 from uuid import UUID
 from database import engine
-from services.embeddings import generate_embedding
+from services.embeddings import generate_embedding, normalize_embedding_text, store_embedding
 from database import requests_table, donations_table, donors_table, shelters_table, matches_table
-from sqlalchemy import insert, delete, select, update, func
-from services.match import delete_match
+from sqlalchemy import insert, delete, select, update, func, tuple_
+from services.match import delete_matches_for_item, remove_match_ids, quantity_update_values, OPEN_ITEM_STATUSES
+from services.candidates import refresh_candidates, remove_candidates, remove_candidates_for_items
 from typing import Optional
+from datetime import datetime
+from services.pagination import DEFAULT_PAGE_SIZE, decode_cursor
+from services.cache import invalidate
 
-def save_donation(donation: DonationForm) -> dict:
+def save_donation(donation: DonationForm, defer_embedding: bool = False) -> dict:
     """
     Create a new donation, generate its embedding, store it,
     and attach the donation ID to the donor's donation_ids field.
+
+    With defer_embedding the row is stored with no embedding and
+    picked up later by services.ingestion.process_pending_embeddings.
     """
     try:
+        embedding = None
+        if not defer_embedding:
+            embedding = generate_embedding(donation.category, donation.item_name, donation.quantity)
+
         with engine.connect() as conn:
             result = conn.execute(
                 insert(donations_table)
@@ -21,13 +32,16 @@ def save_donation(donation: DonationForm) -> dict:
                     donor_id=donation.donor_id,
                     item_name=donation.item_name,
                     quantity=donation.quantity,
-                    category=donation.category,
-                    embedding=generate_embedding(donation.category, donation.item_name, donation.quantity)
+                    remaining_quantity=donation.quantity,
+                    embedding_status="pending" if defer_embedding else "ready",
+                    category=donation.category
                 )
                 .returning(donations_table.c.id)
             )
-            conn.commit()
             donation_id = result.scalar()
+            if embedding is not None:
+                store_embedding(conn, "donation", donation_id, embedding, donation.category)
+            conn.commit()
 
             donor_row = conn.execute(
                 select(donors_table.c.donation_ids)
@@ -44,13 +58,18 @@ def save_donation(donation: DonationForm) -> dict:
                     .values(donation_ids=updated_ids)
                 )
                 conn.commit()
+                invalidate("users", donation.donor_id)
+
+        if embedding is not None:
+            refresh_candidates("donation", donation_id)
 
         return {
             "donation_id": str(donation_id),
             "donor_id": donation.donor_id,
             "item_name": donation.item_name,
             "quantity": donation.quantity,
-            "category": donation.category
+            "category": donation.category,
+            "status": "pending" if defer_embedding else "ready"
         }
 
 
@@ -58,19 +77,24 @@ def save_donation(donation: DonationForm) -> dict:
         print(f"Error saving donation: {e}")
         raise e
 
-def save_request(request: RequestForm) -> dict:
+def save_request(request: RequestForm, defer_embedding: bool = False) -> dict:
     """
     Create a new request, generate its embedding, store it,
     and attach the request ID to the shelter's request_ids field.
+
+    With defer_embedding the row is stored with no embedding and
+    picked up later by services.ingestion.process_pending_embeddings.
     """
     try:
         with engine.connect() as conn:
 
-            embedding = generate_embedding(
-                request.category,
-                request.item_name,
-                request.quantity
-            )
+            embedding = None
+            if not defer_embedding:
+                embedding = generate_embedding(
+                    request.category,
+                    request.item_name,
+                    request.quantity
+                )
 
             result = conn.execute(
                 insert(requests_table)
@@ -78,13 +102,16 @@ def save_request(request: RequestForm) -> dict:
                     shelter_id=request.shelter_id,
                     item_name=request.item_name,
                     quantity=request.quantity,
-                    category=request.category,
-                    embedding=embedding
+                    remaining_quantity=request.quantity,
+                    embedding_status="pending" if defer_embedding else "ready",
+                    category=request.category
                 )
                 .returning(requests_table.c.id)
             )
-            conn.commit()
             request_id = result.scalar()
+            if embedding is not None:
+                store_embedding(conn, "request", request_id, embedding, request.category)
+            conn.commit()
 
             shelter_row = conn.execute(
                 select(shelters_table.c.request_ids)
@@ -101,35 +128,77 @@ def save_request(request: RequestForm) -> dict:
                     .values(request_ids=updated_ids)
                 )
                 conn.commit()
+                invalidate("users", request.shelter_id)
+                invalidate("shelters")
+            invalidate("shelter_requests", request.shelter_id)
+
+        if embedding is not None:
+            refresh_candidates("request", request_id)
 
         return {
             "request_id": str(request_id),
             "shelter_id": request.shelter_id,
             "item_name": request.item_name,
             "quantity": request.quantity,
-            "category": request.category
+            "category": request.category,
+            "status": "pending" if defer_embedding else "ready"
         }
     except Exception as e:
         print(f"Error saving request: {e}")
         raise e
 
+def _listing_query(table, columns, limit: int, cursor: Optional[str], category: Optional[str], created_after: Optional[datetime]):
+    """
+    Build one keyset-paginated page over (created_at, id), oldest first.
+    """
+    query = select(*columns).order_by(table.c.created_at, table.c.id).limit(limit)
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.where(tuple_(table.c.created_at, table.c.id) > tuple_(cursor_created_at, UUID(cursor_id)))
+    if category:
+        query = query.where(table.c.category == category)
+    if created_after:
+        query = query.where(table.c.created_at > created_after)
+    return query
+
 # Get all donations
-def get_donations(user_id: Optional[str] = None) -> List[dict]:
+def get_donations(
+    user_id: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+    created_after: Optional[datetime] = None
+) -> List[dict]:
     """
-    Retrieve all donations or only the donations
+    Retrieve a page of all donations or only the donations
     associated with a specific donor.
+
+    Without user_id, returns up to limit donations ordered by (created_at, id),
+    starting after cursor and optionally filtered by category/created_after.
+    Only the returned columns are read; embeddings never leave the database.
     """
+    columns = (
+        donations_table.c.id,
+        donations_table.c.donor_id,
+        donations_table.c.item_name,
+        donations_table.c.quantity,
+        donations_table.c.category,
+    )
+
     if not user_id:
-        # If no user_id is provided, return all donations
+        # If no user_id is provided, return one page of all donations
         with engine.connect() as conn:
-            result = conn.execute(select(donations_table)).fetchall()
+            result = conn.execute(
+                _listing_query(donations_table, columns + (donations_table.c.created_at,), limit, cursor, category, created_after)
+            ).fetchall()
         return [
             {
                 "donation_id": str(row.id),
                 "donor_id": row.donor_id,
                 "item_name": row.item_name,
                 "quantity": row.quantity,
-                "category": row.category
+                "category": row.category,
+                "created_at": row.created_at.isoformat() if row.created_at else None
             }
             for row in result
         ]
@@ -148,7 +217,7 @@ def get_donations(user_id: Optional[str] = None) -> List[dict]:
 
         # Step 2: fetch donations matching those IDs
         result = conn.execute(
-            select(donations_table)
+            select(*columns)
             .where(donations_table.c.id.in_(donation_ids))
         ).fetchall()
 
@@ -164,21 +233,42 @@ def get_donations(user_id: Optional[str] = None) -> List[dict]:
     ]
 
 
-def get_requests(user_id: Optional[str] = None) -> List[dict]:
+def get_requests(
+    user_id: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+    created_after: Optional[datetime] = None
+) -> List[dict]:
     """
-    Retrieve all requests or only the requests
+    Retrieve a page of all requests or only the requests
     associated with a specific shelter.
+
+    Without user_id, returns up to limit requests ordered by (created_at, id),
+    starting after cursor and optionally filtered by category/created_after.
+    Only the returned columns are read; embeddings never leave the database.
     """
+    columns = (
+        requests_table.c.id,
+        requests_table.c.shelter_id,
+        requests_table.c.item_name,
+        requests_table.c.quantity,
+        requests_table.c.category,
+    )
+
     if not user_id:
         with engine.connect() as conn:
-            result = conn.execute(select(requests_table)).fetchall()
+            result = conn.execute(
+                _listing_query(requests_table, columns + (requests_table.c.created_at,), limit, cursor, category, created_after)
+            ).fetchall()
         return [
             {
                 "request_id": str(row.id),
                 "shelter_id": row.shelter_id,
                 "item_name": row.item_name,
                 "quantity": row.quantity,
-                "category": row.category
+                "category": row.category,
+                "created_at": row.created_at.isoformat() if row.created_at else None
             }
             for row in result
           ]
@@ -194,7 +284,7 @@ def get_requests(user_id: Optional[str] = None) -> List[dict]:
 
         request_ids = shelter_row.request_ids
         result = conn.execute(
-            select(requests_table)
+            select(*columns)
             .where(requests_table.c.id.in_(request_ids))
         ).fetchall()
 
@@ -211,32 +301,18 @@ def get_requests(user_id: Optional[str] = None) -> List[dict]:
 
 def get_match_from_donation_id(donor_id: str, donation_id: UUID) -> Optional[str]:
     """
-    Check through the donor's list of match_ids and find a match with the given donation_id.
+    Find a match belonging to the donor with the given donation_id.
     Returns the match_id if found, None otherwise.
     """
     try:
         with engine.connect() as conn:
-            # Get the donor's match_ids array (query by uid, not id)
-            result = conn.execute(
-                select(donors_table.c.match_ids).where(donors_table.c.uid == donor_id)
-            ).fetchone()
-
-            if not result or not result[0]:
-                # No donor found or no match_ids
-                return None
-
-            match_ids = result[0]  # This is the array of match_ids
-
-            # Check each match_id to see if it has the same donation_id
-            for match_id in match_ids:
-                match_result = conn.execute(
-                    select(matches_table).where(matches_table.c.id == match_id)
-                ).fetchone()
-
-                if match_result and str(match_result.donation_id) == str(donation_id):
-                    return str(match_result.id)
-
-            return None
+            match_id = conn.execute(
+                select(matches_table.c.id)
+                .where(matches_table.c.donation_id == str(donation_id))
+                .where(matches_table.c.donor_id == donor_id)
+                .limit(1)
+            ).scalar()
+            return str(match_id) if match_id else None
     except Exception as e:
         print(f"Error getting match with donation ID: {e}")
         import traceback
@@ -245,32 +321,18 @@ def get_match_from_donation_id(donor_id: str, donation_id: UUID) -> Optional[str
 
 def get_match_from_request_id(shelter_id: str, request_id: UUID) -> Optional[str]:
     """
-    Check through the shelter's list of match_ids and find a match with the given request_id.
+    Find a match belonging to the shelter with the given request_id.
     Returns the match_id if found, None otherwise.
     """
     try:
         with engine.connect() as conn:
-            # Get the shelter's match_ids array (query by uid, not id)
-            result = conn.execute(
-                select(shelters_table.c.match_ids).where(shelters_table.c.uid == shelter_id)
-            ).fetchone()
-
-            if not result or not result[0]:
-                # No shelter found or no match_ids
-                return None
-
-            match_ids = result[0]  # This is the array of match_ids
-
-            # Check each match_id to see if it has the same request_id
-            for match_id in match_ids:
-                match_result = conn.execute(
-                    select(matches_table).where(matches_table.c.id == match_id)
-                ).fetchone()
-
-                if match_result and str(match_result.request_id) == str(request_id):
-                    return str(match_result.id)
-
-            return None
+            match_id = conn.execute(
+                select(matches_table.c.id)
+                .where(matches_table.c.request_id == str(request_id))
+                .where(matches_table.c.shelter_id == shelter_id)
+                .limit(1)
+            ).scalar()
+            return str(match_id) if match_id else None
     except Exception as e:
         print(f"Error getting match with request ID: {e}")
         import traceback
@@ -282,7 +344,8 @@ def delete_donation(donation_id: UUID, donor_id: str) -> bool:
     Delete a donation by:
     1. Deleting the donation from donations_table
     2. Deleting the donation_id from the donor's donation_ids array
-    3. Checking through the donor's match_ids and deleting any match with the same donation_id
+    3. Deleting every match with the same donation_id
+    All three steps run in one transaction.
     """
     try:
         with engine.connect() as conn:
@@ -290,17 +353,15 @@ def delete_donation(donation_id: UUID, donor_id: str) -> bool:
 
             # Step 1: Delete the donation from donations_table
             result = conn.execute(delete(donations_table).where(donations_table.c.id == donation_id))
-            conn.commit()
 
             if result.rowcount == 0:
                 print(f"Donation {donation_id} not found in database")
                 return False
 
-            # Step 2: Check through donor's match_ids and delete any match with this donation_id
-            match_id = get_match_from_donation_id(donor_id, donation_id)
-            if match_id:
-                print(f"Found match {match_id} with donation {donation_id}, deleting...")
-                delete_match(match_id)
+            # Step 2: Delete every match with this donation_id
+            match_ids = delete_matches_for_item("donation", donation_id, conn)
+            if match_ids:
+                print(f"Deleted {len(match_ids)} matches with donation {donation_id}")
             else:
                 print(f"No matches found with donation {donation_id}")
 
@@ -312,6 +373,8 @@ def delete_donation(donation_id: UUID, donor_id: str) -> bool:
             )
 
             conn.commit()
+            invalidate("users", donor_id)
+            remove_candidates("donation", donation_id)
             print(f"Successfully deleted donation {donation_id}")
             return True
     except Exception as e:
@@ -325,7 +388,8 @@ def delete_request(request_id: UUID, shelter_id: str) -> bool:
     Delete a request by:
     1. Deleting the request from requests_table
     2. Deleting the request_id from the shelter's request_ids array
-    3. Checking through the shelter's match_ids and deleting any match with the same request_id
+    3. Deleting every match with the same request_id
+    All three steps run in one transaction.
     """
     try:
         with engine.connect() as conn:
@@ -333,17 +397,15 @@ def delete_request(request_id: UUID, shelter_id: str) -> bool:
 
             # Step 1: Delete the request from requests_table
             result = conn.execute(delete(requests_table).where(requests_table.c.id == request_id))
-            conn.commit()
 
             if result.rowcount == 0:
                 print(f"Request {request_id} not found in database")
                 return False
 
-            # Step 2: Check through shelter's match_ids and delete any match with this request_id
-            match_id = get_match_from_request_id(shelter_id, request_id)
-            if match_id:
-                print(f"Found match {match_id} with request {request_id}, deleting...")
-                delete_match(match_id)
+            # Step 2: Delete every match with this request_id
+            match_ids = delete_matches_for_item("request", request_id, conn)
+            if match_ids:
+                print(f"Deleted {len(match_ids)} matches with request {request_id}")
             else:
                 print(f"No matches found with request {request_id}")
 
@@ -355,6 +417,10 @@ def delete_request(request_id: UUID, shelter_id: str) -> bool:
             )
 
             conn.commit()
+            invalidate("users", shelter_id)
+            invalidate("shelters")
+            invalidate("shelter_requests", shelter_id)
+            remove_candidates("request", request_id)
             print(f"Successfully deleted request {request_id}")
             return True
     except Exception as e:
@@ -363,44 +429,69 @@ def delete_request(request_id: UUID, shelter_id: str) -> bool:
         traceback.print_exc()
         return False
 
+def _sync_candidates(item_type: str, item_id, text_changed: bool, old_status: str, new_status: str):
+    """
+    Keep match_candidates in step with an edited donation or request.
+
+    - A new text, or a quantity edit that reopens the item, recomputes its pairs
+    - A quantity edit that closes it drops its pairs and refills its counterparts
+    """
+    was_open = old_status in OPEN_ITEM_STATUSES
+    is_open = new_status in OPEN_ITEM_STATUSES
+    if text_changed or (is_open and not was_open):
+        refresh_candidates(item_type, item_id)
+    elif was_open and not is_open:
+        remove_candidates(item_type, item_id)
+
 def update_donation(donation_id: UUID, donation: RequestForm) -> DonationForm:
     """
     Update a donation's fields and embedding,
-    then remove any existing match involving this donation.
+    then remove every existing match involving this donation.
+
+    If the item name and category are unchanged (ignoring case and spacing),
+    the stored embedding and existing matches are kept as they are.
     """
     try:
         with engine.connect() as conn:
-            # First, get the actual donation from the database to get the real donor_id
+            # First, get the stored item text to see whether it changed
             donation_result = conn.execute(
-                select(donations_table).where(donations_table.c.id == donation_id)
+                select(donations_table.c.item_name, donations_table.c.category, donations_table.c.status)
+                .where(donations_table.c.id == donation_id)
             ).fetchone()
 
             if not donation_result:
                 raise ValueError(f"Donation {donation_id} not found")
 
-            actual_donor_id = donation_result.donor_id
-
-            # Generate new embedding with updated data
-            new_embedding = generate_embedding(donation.category, donation.item_name, donation.quantity)
-
-            # Update the donation with new data and embedding
-            conn.execute(update(donations_table).where(donations_table.c.id == donation_id).values(
-                item_name=donation.item_name,
-                quantity=donation.quantity,
-                category=donation.category,
-                embedding=new_embedding
-            ))
+            text_changed = normalize_embedding_text(donation_result.category, donation_result.item_name) != \
+                normalize_embedding_text(donation.category, donation.item_name)
 
-            # Use the actual donor_id from the database, not from the request
-            match_id = get_match_from_donation_id(actual_donor_id, donation_id)
-            if match_id:
-                print(f"Found match {match_id}, deleting...")
-                delete_match(match_id)
-            else:
-                print(f"No matches found with donation {donation_id}")
+            update_values = {
+                "item_name": donation.item_name,
+                "quantity": donation.quantity,
+                "category": donation.category,
+                # A text change drops every match below, so the item starts over
+                **quantity_update_values(donations_table, donation.quantity, reopen=text_changed),
+            }
+            # Update the donation with new data
+            status = conn.execute(
+                update(donations_table).where(donations_table.c.id == donation_id).values(**update_values).returning(donations_table.c.status)
+            ).scalar()
+
+            if text_changed:
+                # Generate new embedding with updated data
+                embedding = generate_embedding(donation.category, donation.item_name, donation.quantity)
+                store_embedding(conn, "donation", donation_id, embedding, donation.category)
+
+                # Existing matches were made for the old item, drop them all
+                match_ids = delete_matches_for_item("donation", donation_id, conn)
+                if match_ids:
+                    print(f"Deleted {len(match_ids)} matches with donation {donation_id}")
+                else:
+                    print(f"No matches found with donation {donation_id}")
 
             conn.commit()
-            return {"id": donation_id, **donation.model_dump()}
+            _sync_candidates("donation", donation_id, text_changed, donation_result.status, status)
+            return {"id": donation_id, **donation.model_dump(), "embedding_updated": text_changed}
     except Exception as e:
         print(f"Error updating donation: {e}")
         raise e
@@ -408,41 +499,53 @@ def update_donation(donation_id: UUID, donation: RequestForm) -> DonationForm:
 def update_request(request_id: str, request: RequestForm) -> RequestForm:
     """
     Update a request's fields and embedding,
-    then remove any existing match involving this request.
+    then remove every existing match involving this request.
+
+    If the item name and category are unchanged (ignoring case and spacing),
+    the stored embedding and existing matches are kept as they are.
     """
     try:
         with engine.connect() as conn:
-            # First, get the actual request from the database to get the real shelter_id
+            # First, get the stored item text to see whether it changed
             request_result = conn.execute(
-                select(requests_table).where(requests_table.c.id == request_id)
+                select(requests_table.c.item_name, requests_table.c.category, requests_table.c.status, requests_table.c.shelter_id)
+                .where(requests_table.c.id == request_id)
             ).fetchone()
 
             if not request_result:
                 raise ValueError(f"Request {request_id} not found")
 
-            actual_shelter_id = request_result.shelter_id
-
-            # Generate new embedding with updated data
-            new_embedding = generate_embedding(request.category, request.item_name, request.quantity)
-
-            # Update the request with new data and embedding
-            conn.execute(update(requests_table).where(requests_table.c.id == request_id).values(
-                item_name=request.item_name,
-                quantity=request.quantity,
-                category=request.category,
-                embedding=new_embedding
-            ))
+            text_changed = normalize_embedding_text(request_result.category, request_result.item_name) != \
+                normalize_embedding_text(request.category, request.item_name)
 
-            # Use the actual shelter_id from the database, not from the request
-            match_id = get_match_from_request_id(actual_shelter_id, request_id)
-            if match_id:
-                print(f"Found match {match_id}, deleting...")
-                delete_match(match_id)
+            update_values = {
+                "item_name": request.item_name,
+                "quantity": request.quantity,
+                "category": request.category,
+                # A text change drops every match below, so the item starts over
+                **quantity_update_values(requests_table, request.quantity, reopen=text_changed),
+            }
+            # Update the request with new data
+            status = conn.execute(
+                update(requests_table).where(requests_table.c.id == request_id).values(**update_values).returning(requests_table.c.status)
+            ).scalar()
+
+            if text_changed:
+                # Generate new embedding with updated data
+                embedding = generate_embedding(request.category, request.item_name, request.quantity)
+                store_embedding(conn, "request", request_id, embedding, request.category)
+
+                # Existing matches were made for the old item, drop them all
+                match_ids = delete_matches_for_item("request", request_id, conn)
+                if match_ids:
+                    print(f"Deleted {len(match_ids)} matches with request {request_id}")
+                else:
+                    print(f"No matches found with request {request_id}")
 
-            else:
-                print(f"No matches found with request {request_id}")
             conn.commit()
-            return {"id": request_id, **request.model_dump()}
+            invalidate("shelter_requests", request_result.shelter_id)
+            _sync_candidates("request", request_id, text_changed, request_result.status, status)
+            return {"id": request_id, **request.model_dump(), "embedding_updated": text_changed}
     except Exception as e:
         print(f"Error updating request: {e}")
         raise e
@@ -452,14 +555,17 @@ def update_donor(
     uid: str,
     name: Optional[str] = None,
     username: Optional[str] = None,
-    phone_number: Optional[str] = None
+    phone_number: Optional[str] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None
 ) -> dict:
     """
-    Update donor profile fields (name, username, phone number).
+    Update donor profile fields (name, username, phone number,
+    latitude, longitude).
     Only updates fields provided by the caller.
     Returns the updated donor record as a dictionary.
     """
-    if not any([name, username, phone_number]):
+    if not any([name, username, phone_number, latitude is not None, longitude is not None]):
         raise ValueError("At least one field to update must be provided")
 
     try:
@@ -478,6 +584,8 @@ def update_donor(
                     "name": name,
                     "username": username,
                     "phone_number": phone_number,
+                    "latitude": latitude,
+                    "longitude": longitude,
                 }.items() if value is not None
             }
 
@@ -488,6 +596,7 @@ def update_donor(
                     .values(**update_values)
                 )
                 conn.commit()
+                invalidate("users", uid)
 
             # Fetch updated row
             updated = conn.execute(
@@ -499,7 +608,9 @@ def update_donor(
                 "uid": updated.uid,
                 "name": updated.name,
                 "username": updated.username,
-                "phone_number": updated.phone_number
+                "phone_number": updated.phone_number,
+                "latitude": updated.latitude,
+                "longitude": updated.longitude
             }
 
     except Exception as e:
@@ -515,8 +626,8 @@ def update_shelter(
     city: Optional[str] = None,
     state: Optional[str] = None,
     zip_code: Optional[str] = None,
-    latitude: Optional[str] = None,
-    longitude: Optional[str] = None
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None
 ) -> dict:
     """
     Update shelter profile fields (name, phone number, address, city,
@@ -524,7 +635,8 @@ def update_shelter(
     Only updates fields provided by the caller.
     Returns the updated shelter record as a dictionary.
     """
-    if not any([shelter_name, phone_number, address, city, state, zip_code, latitude, longitude]):
+    if not any([shelter_name, phone_number, address, city, state, zip_code,
+                latitude is not None, longitude is not None]):
         raise ValueError("At least one field to update must be provided")
 
     try:
@@ -556,6 +668,8 @@ def update_shelter(
                     .values(**update_values)
                 )
                 conn.commit()
+                invalidate("users", uid)
+                invalidate("shelters")
 
             updated = conn.execute(
                 select(shelters_table).where(shelters_table.c.uid == uid)
@@ -581,40 +695,48 @@ def update_shelter(
 def delete_donor(uid: str) -> bool:
     """
     Delete a donor and all donations linked to it.
-    Calls delete_donation() on each donation ID stored in donation_ids.
+
+    One transaction removes the donations, every match involving the donor,
+    the match ids held by the matched shelters, and finally the donor row.
     """
     try:
-        with engine.connect() as conn:
+        with engine.begin() as conn:
             # Fetch donor row
             donor_row = conn.execute(
-                select(donors_table).where(donors_table.c.uid == uid)
+                select(donors_table.c.uid).where(donors_table.c.uid == uid)
             ).fetchone()
 
             if not donor_row:
                 raise ValueError(f"No donor found with uid {uid}")
 
-            # Directly access the list of UUIDs
-            donation_ids = donor_row.donation_ids  # Already List[UUID]
-
-        # Delete each donation record
-        for donation_id in donation_ids:
-            try:
-                delete_donation(donation_id=donation_id, donor_id=uid)
-            except Exception as e:
-                print(f"Error deleting donation {donation_id} for donor {uid}: {e}")
-                raise
+            donation_ids = conn.execute(
+                delete(donations_table)
+                .where(donations_table.c.donor_id == uid)
+                .returning(donations_table.c.id)
+            ).scalars().all()
+
+            deleted_matches = conn.execute(
+                delete(matches_table)
+                .where(matches_table.c.donor_id == uid)
+                .returning(matches_table.c.id, matches_table.c.shelter_id)
+            ).fetchall()
+
+            remove_match_ids(
+                conn,
+                shelters_table,
+                {row.shelter_id for row in deleted_matches},
+                [str(row.id) for row in deleted_matches]
+            )
 
-        # Now delete the donor itself
-        with engine.connect() as conn:
             conn.execute(
                 delete(donors_table).where(donors_table.c.uid == uid)
             )
 
-            try:
-                conn.commit()
-            except Exception:
-                pass  # depending on connection behavior
-
+        # Matched shelters lost match ids too
+        invalidate("users")
+        invalidate("shelters")
+        remove_candidates_for_items("donation", donation_ids)
+        print(f"Deleted donor {uid} with {len(donation_ids)} donations and {len(deleted_matches)} matches")
         return True
 
     except Exception as e:
@@ -625,42 +747,51 @@ def delete_donor(uid: str) -> bool:
 def delete_shelter(uid: str) -> bool:
     """
     Delete a shelter and all requests linked to it.
-    Calls delete_request() on each request ID stored in request_ids.
+
+    One transaction removes the requests, every match involving the shelter,
+    the match ids held by the matched donors, and finally the shelter row.
     """
     try:
-        with engine.connect() as conn:
+        with engine.begin() as conn:
             # Fetch shelter row
             shelter_row = conn.execute(
-                select(shelters_table).where(shelters_table.c.uid == uid)
+                select(shelters_table.c.uid).where(shelters_table.c.uid == uid)
             ).fetchone()
 
             if not shelter_row:
                 raise ValueError(f"No shelter found with uid {uid}")
 
-            # Already a List[UUID]
-            request_ids = shelter_row.request_ids
-
-        # Delete each request linked to the shelter
-        for request_id in request_ids:
-            try:
-                delete_request(request_id=request_id, shelter_id=uid)
-            except Exception as e:
-                print(f"Error deleting request {request_id} for shelter {uid}: {e}")
-                raise
+            request_ids = conn.execute(
+                delete(requests_table)
+                .where(requests_table.c.shelter_id == uid)
+                .returning(requests_table.c.id)
+            ).scalars().all()
+
+            deleted_matches = conn.execute(
+                delete(matches_table)
+                .where(matches_table.c.shelter_id == uid)
+                .returning(matches_table.c.id, matches_table.c.donor_id)
+            ).fetchall()
+
+            remove_match_ids(
+                conn,
+                donors_table,
+                {row.donor_id for row in deleted_matches},
+                [str(row.id) for row in deleted_matches]
+            )
 
-        # Now delete the shelter itself
-        with engine.connect() as conn:
             conn.execute(
                 delete(shelters_table).where(shelters_table.c.uid == uid)
             )
 
-            try:
-                conn.commit()
-            except Exception:
-                pass
-
+        # Matched donors lost match ids too
+        invalidate("users")
+        invalidate("shelters")
+        invalidate("shelter_requests", uid)
+        remove_candidates_for_items("request", request_ids)
+        print(f"Deleted shelter {uid} with {len(request_ids)} requests and {len(deleted_matches)} matches")
         return True
 
     except Exception as e:
         print(f"Error deleting shelter {uid}: {e}")
-        raise e
\ No newline at end of file
+        raise e
@@ -0,0 +1,126 @@
+"""
+Fulfillment plans: several donations that together cover one request
+
+find_similar_donations labels each donation "full" or "partial" on its own,
+so a request for 100 blankets gets ten partial matches and no plan. Here the
+top-k similar donations are treated as a 0/1 knapsack over the quantity still
+needed: the plan uses as few donations as possible, and among those the most
+similar ones. Quantities are counted in units of at most PLAN_MAX_UNITS per
+request, so the solver costs O(k * PLAN_MAX_UNITS) however large the request is.
+"""
+import math
+from uuid import UUID
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import select
+from database import engine, requests_table
+from services.match import available_quantities
+from services.vector_match import find_similar_donations
+
+# Donations considered for one plan
+PLAN_CANDIDATES_K = 20
+# Most donations one plan may combine
+PLAN_MAX_DONATIONS = 10
+# Quantities above this are planned in coarser units
+PLAN_MAX_UNITS = 2000
+
+
+def choose_donations(
+    needed: int,
+    candidates: List[Tuple[int, float]],
+    max_donations: int = PLAN_MAX_DONATIONS
+) -> List[int]:
+    """
+    Pick the donations for a plan.
+
+    Args:
+        needed: Quantity to cover
+        candidates: (available quantity, similarity) per donation
+        max_donations: Most donations to combine
+
+    Returns:
+        Indexes into candidates. Covers needed with the fewest donations,
+        then the highest total similarity; if needed cannot be covered,
+        the largest donations are taken to cover as much as possible.
+    """
+    if needed <= 0 or not candidates:
+        return []
+
+    # Round available quantities down, so a plan found in units is a real plan
+    unit = max(1, math.ceil(needed / PLAN_MAX_UNITS))
+    target = math.ceil(needed / unit)
+
+    # covered units (capped at target) -> (donations used, -total similarity, chosen indexes)
+    best: Dict[int, Tuple[int, float, Tuple[int, ...]]] = {0: (0, 0.0, ())}
+    for index, (available, similarity) in enumerate(candidates):
+        units = available // unit
+        if units <= 0:
+            continue
+        # Highest coverage first, so each donation is used at most once
+        for covered in sorted(best, reverse=True):
+            count, negative_similarity, chosen = best[covered]
+            if count >= max_donations:
+                continue
+            reached = min(target, covered + units)
+            option = (count + 1, negative_similarity - similarity, chosen + (index,))
+            if reached not in best or option[:2] < best[reached][:2]:
+                best[reached] = option
+
+    if target in best:
+        return list(best[target][2])
+
+    by_size = sorted(range(len(candidates)), key=lambda i: candidates[i][0], reverse=True)
+    return [i for i in by_size[:max_donations] if candidates[i][0] > 0]
+
+
+def plan_fulfillment(
+    request_id: str,
+    k: int = PLAN_CANDIDATES_K,
+    threshold: float = 0.7,
+    max_donations: int = PLAN_MAX_DONATIONS
+) -> Optional[Dict[str, Any]]:
+    """
+    Plan which similar donations, and how much of each, fill a request.
+
+    - Needs and availability exclude quantity already promised in pending matches
+    - Each chosen donation gives what it has, most similar first, until the need is met
+    - Returns the plan with needed, covered and shortfall quantities, or None
+      if request_id is not the id of an existing request
+    """
+    try:
+        request_uuid = UUID(str(request_id))
+    except ValueError:
+        return None
+    with engine.connect() as conn:
+        if conn.execute(select(requests_table.c.id).where(requests_table.c.id == request_uuid)).first() is None:
+            return None
+
+    candidates = find_similar_donations(request_id, limit=k, threshold=threshold)
+
+    with engine.connect() as conn:
+        needed = available_quantities(conn, "request", [request_id]).get(str(request_id), 0)
+        available = available_quantities(conn, "donation", [c["donation_id"] for c in candidates]) if candidates else {}
+
+    usable = [c for c in candidates if available.get(str(c["donation_id"]), 0) > 0]
+    chosen = choose_donations(
+        needed,
+        [(available[str(c["donation_id"])], c["similarity_score"]) for c in usable],
+        max_donations
+    )
+
+    donations: List[Dict[str, Any]] = []
+    left = needed
+    for match in sorted((usable[i] for i in chosen), key=lambda m: m["similarity_score"], reverse=True):
+        if left <= 0:
+            break
+        allocated = min(available[str(match["donation_id"])], left)
+        left -= allocated
+        donations.append({**match, "quantity": allocated, "available": available[str(match["donation_id"])]})
+
+    return {
+        "request_id": str(request_id),
+        "needed": needed,
+        "covered": needed - left,
+        "shortfall": left,
+        "candidates_considered": len(usable),
+        "donations": donations,
+    }
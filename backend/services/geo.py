@@ -0,0 +1,117 @@
+"""
+Distance helpers for location-aware matching
+
+Locations are plain latitude/longitude columns (double precision) with a
+composite btree index. A radius query first narrows rows to a bounding box,
+which the index serves, and then applies the exact great-circle distance.
+"""
+import math
+from typing import List, Tuple
+from sqlalchemy import func
+
+EARTH_RADIUS_KM = 6371.0
+# Length of one degree of latitude
+KM_PER_DEGREE = 111.045
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """
+    Smallest lat/lon box that contains every point within radius_km.
+
+    Returns (min_lat, max_lat, min_lon, max_lon). Near the poles the box
+    covers every longitude. Near ±180° the longitudes run past the
+    antimeridian; query them through longitude_ranges().
+    """
+    lat_delta = radius_km / KM_PER_DEGREE
+    cos_lat = math.cos(math.radians(latitude))
+    if cos_lat < 1e-6 or abs(latitude) + lat_delta >= 90:
+        return latitude - lat_delta, latitude + lat_delta, -180.0, 180.0
+    lon_delta = min(180.0, radius_km / (KM_PER_DEGREE * cos_lat))
+    return latitude - lat_delta, latitude + lat_delta, longitude - lon_delta, longitude + lon_delta
+
+
+def longitude_ranges(min_lon: float, max_lon: float) -> List[Tuple[float, float]]:
+    """
+    Split a bounding box's longitudes into ranges within -180..180.
+
+    A box that crosses the antimeridian becomes two ranges, one on each side.
+    """
+    if max_lon - min_lon >= 360:
+        return [(-180.0, 180.0)]
+    if min_lon < -180:
+        return [(min_lon + 360, 180.0), (-180.0, max_lon)]
+    if max_lon > 180:
+        return [(min_lon, 180.0), (-180.0, max_lon - 360)]
+    return [(min_lon, max_lon)]
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Great-circle distance between two points in kilometres.
+    """
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def distance_sql(lat_column: str, lon_column: str) -> str:
+    """
+    SQL expression for the distance in km from (:origin_lat, :origin_lon).
+    """
+    return f"""(
+        2 * {EARTH_RADIUS_KM} * asin(least(1, sqrt(
+            power(sin(radians({lat_column} - :origin_lat) / 2), 2)
+            + cos(radians(:origin_lat)) * cos(radians({lat_column}))
+            * power(sin(radians({lon_column} - :origin_lon) / 2), 2)
+        )))
+    )"""
+
+
+def distance_expr(lat_column, lon_column, latitude: float, longitude: float):
+    """
+    SQLAlchemy expression for the distance in km from (latitude, longitude).
+
+    Postgres only; SQLite has no trigonometric functions, use haversine_km there.
+    """
+    lat_delta = func.radians(lat_column - latitude) * 0.5
+    lon_delta = func.radians(lon_column - longitude) * 0.5
+    a = (
+        func.power(func.sin(lat_delta), 2)
+        + math.cos(math.radians(latitude)) * func.cos(func.radians(lat_column)) * func.power(func.sin(lon_delta), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * func.asin(func.least(1.0, func.sqrt(a)))
+
+
+def within_radius_sql(lat_column: str, lon_column: str) -> str:
+    """
+    SQL condition for rows within :max_distance_km of the origin.
+
+    Needs the params from radius_params().
+    """
+    return f"""
+        {lat_column} BETWEEN :min_lat AND :max_lat
+        AND ({lon_column} BETWEEN :min_lon AND :max_lon OR {lon_column} BETWEEN :min_lon_2 AND :max_lon_2)
+        AND {distance_sql(lat_column, lon_column)} <= :max_distance_km
+    """
+
+
+def radius_params(latitude: float, longitude: float, radius_km: float) -> dict:
+    """
+    Bind params for within_radius_sql and distance_sql.
+
+    A box that does not cross the antimeridian repeats its one longitude range.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+    ranges = longitude_ranges(min_lon, max_lon)
+    (min_lon, max_lon), (min_lon_2, max_lon_2) = ranges[0], ranges[-1]
+    return {
+        "origin_lat": latitude,
+        "origin_lon": longitude,
+        "max_distance_km": radius_km,
+        "min_lat": min_lat,
+        "max_lat": max_lat,
+        "min_lon": min_lon,
+        "max_lon": max_lon,
+        "min_lon_2": min_lon_2,
+        "max_lon_2": max_lon_2,
+    }
@@ -0,0 +1,186 @@
+"""
+Background embedding for donations and requests saved with defer_embedding
+
+Deferred rows start with embedding_status "pending". A drain claims a batch
+with SELECT ... FOR UPDATE SKIP LOCKED and stamps claimed_at, so any number of
+drains (API background tasks, worker.py "embed" jobs) can run at once without
+taking the same rows. Each row is then finished on its own: "embedded" once its
+vector is stored, "ready" once matching ran for it. A row whose drain died
+becomes claimable again after INGESTION_CLAIM_TIMEOUT and resumes at the step
+it reached.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
+from sqlalchemy import select, update, and_, or_
+from database import engine, donations_table, requests_table
+from services.embeddings import generate_embeddings, store_embedding
+from services.candidates import refresh_candidates
+from services.vector_match import (
+    find_best_match_for_donation,
+    find_best_match_for_request,
+    save_vector_matches
+)
+
+INGESTION_BATCH_SIZE = 32
+# How long a claimed row stays hidden from other drains
+INGESTION_CLAIM_TIMEOUT = timedelta(minutes=5)
+
+INGESTION_TABLES = {"donation": donations_table, "request": requests_table}
+
+
+def _claim_rows(table, batch_size: int, skip_ids: List) -> list:
+    """
+    Claim up to batch_size rows that are not ready, oldest first.
+
+    Rows claimed by another drain are skipped until their claim times out.
+    """
+    now = datetime.now(timezone.utc)
+    claimable = and_(
+        table.c.embedding_status != "ready",
+        or_(table.c.claimed_at.is_(None), table.c.claimed_at < now - INGESTION_CLAIM_TIMEOUT),
+    )
+    if skip_ids:
+        claimable = and_(claimable, table.c.id.not_in(skip_ids))
+
+    with engine.begin() as conn:
+        row_ids = conn.execute(
+            select(table.c.id)
+            .where(claimable)
+            .order_by(table.c.created_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+
+        if not row_ids:
+            return []
+
+        return conn.execute(
+            update(table)
+            .where(table.c.id.in_(row_ids))
+            .values(claimed_at=now)
+            .returning(table.c.id, table.c.item_name, table.c.category, table.c.embedding_status)
+        ).fetchall()
+
+
+def _ingest_row(item_type: str, row, embedding: Optional[list]) -> None:
+    """
+    Finish one claimed row: store its vector (if it has none yet), match it,
+    then mark it ready and release the claim.
+    """
+    table = INGESTION_TABLES[item_type]
+
+    if embedding is not None:
+        with engine.begin() as conn:
+            store_embedding(conn, item_type, row.id, embedding, row.category)
+            conn.execute(update(table).where(table.c.id == row.id).values(embedding_status="embedded"))
+
+    refresh_candidates(item_type, row.id)
+
+    if item_type == "donation":
+        best_match = find_best_match_for_donation(str(row.id))
+    else:
+        best_match = find_best_match_for_request(str(row.id))
+    if best_match:
+        # A retry after a crash finds the same pair again; don't save it twice
+        result = save_vector_matches([best_match], skip_existing=True)
+        if "error" in result:
+            raise RuntimeError(result["error"])
+
+    with engine.begin() as conn:
+        conn.execute(
+            update(table)
+            .where(table.c.id == row.id)
+            .values(embedding_status="ready", claimed_at=None)
+        )
+
+
+def _ingest_rows(item_type: str, rows: list) -> List:
+    """
+    Embed the claimed rows in one model call, then finish them one by one.
+
+    Returns the ids that failed. Their claim is released so a later drain
+    retries them; the rest of the batch is not held back by them.
+    """
+    pending = [row for row in rows if row.embedding_status == "pending"]
+    embeddings: Dict[Any, list] = {}
+    failed = []
+
+    if pending:
+        try:
+            vectors = generate_embeddings([(row.category, row.item_name) for row in pending])
+            embeddings = {row.id: vector for row, vector in zip(pending, vectors)}
+        except Exception as e:
+            print(f"Error embedding pending {item_type}s: {e}")
+            failed = [row.id for row in pending]
+            rows = [row for row in rows if row.embedding_status != "pending"]
+
+    for row in rows:
+        try:
+            _ingest_row(item_type, row, embeddings.get(row.id))
+        except Exception as e:
+            print(f"Error ingesting {item_type} {row.id}: {e}")
+            failed.append(row.id)
+
+    if failed:
+        table = INGESTION_TABLES[item_type]
+        with engine.begin() as conn:
+            conn.execute(update(table).where(table.c.id.in_(failed)).values(claimed_at=None))
+
+    return failed
+
+
+def process_pending_embeddings(batch_size: int = INGESTION_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Embed every pending donation and request, then run matching on them.
+
+    - Claims rows in batches of batch_size with one model call per batch
+    - Looks for a best match for each newly embedded item and saves it
+    - A row that fails is released for a later drain and skipped by this one
+    - Returns how many donations and requests were processed, and how many failed
+    """
+    processed = {"donations": 0, "requests": 0, "failed": 0}
+    failed = {"donation": [], "request": []}
+
+    while True:
+        claimed = 0
+        for item_type in ("donation", "request"):
+            rows = _claim_rows(INGESTION_TABLES[item_type], batch_size, failed[item_type])
+            if not rows:
+                continue
+            claimed += len(rows)
+            failed_ids = _ingest_rows(item_type, rows)
+            failed[item_type].extend(failed_ids)
+            processed[f"{item_type}s"] += len(rows) - len(failed_ids)
+            processed["failed"] += len(failed_ids)
+        if not claimed:
+            break
+
+    return processed
+
+
+def get_ingestion_status(item_id: str, item_type: str) -> Optional[Dict[str, Any]]:
+    """
+    Report whether a donation or request has been embedded and matched yet.
+
+    Returns None if the item does not exist.
+    """
+    if item_type not in INGESTION_TABLES:
+        raise ValueError(f"Invalid item type: {item_type}")
+    table = INGESTION_TABLES[item_type]
+
+    with engine.connect() as conn:
+        row = conn.execute(
+            select(table.c.id, table.c.embedding_status).where(table.c.id == item_id)
+        ).fetchone()
+
+    if not row:
+        return None
+
+    return {
+        f"{item_type}_id": str(row.id),
+        "status": "ready" if row.embedding_status == "ready" else "pending"
+    }
+
+
+if __name__ == "__main__":
+    print(process_pending_embeddings())
@@ -0,0 +1,405 @@
+"""
+Durable Postgres-backed job queue for embedding, matching, batch assignment, notification, cleanup, re-embedding and match archival work
+
+Jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so any number of
+worker processes (see worker.py) on any number of machines can share the queue.
+A claimed job is hidden from other workers until its visibility timeout
+expires; if the worker dies first, the job becomes claimable again.
+"""
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional, Callable
+from sqlalchemy import select, update, delete, insert, func, or_, and_
+from database import engine, jobs_table, matches_table
+from services.email_utils import send_match_emails
+from services.ingestion import process_pending_embeddings
+from services.reembed import backfill_embeddings, REEMBED_MAX_ITEMS_PER_SECOND
+from services.retention import archive_stale_matches, expire_stale_items
+from services.assignment import run_batch_assignment, ASSIGNMENT_CANDIDATES_K
+from services.vector_match import (
+    find_best_match_for_donation,
+    find_best_match_for_request,
+    save_vector_matches,
+    get_donor_email,
+    get_shelter_email,
+    get_donor_phone,
+    get_shelter_phone
+)
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Send matching work to worker.py instead of running it inside HTTP handlers
+USE_JOB_QUEUE = os.getenv("USE_JOB_QUEUE", "false").lower() == "true"
+
+DEFAULT_VISIBILITY_TIMEOUT = timedelta(minutes=5)
+DEFAULT_MAX_ATTEMPTS = 5
+# Retry delay grows as RETRY_BASE_DELAY * 2^(attempts - 1)
+RETRY_BASE_DELAY = timedelta(seconds=10)
+
+
+def enqueue_job(
+    job_type: str,
+    payload: Optional[Dict[str, Any]] = None,
+    run_at: Optional[datetime] = None,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    conn=None
+) -> str:
+    """
+    Add a job to the queue.
+
+    Args:
+        job_type: One of the keys in JOB_HANDLERS
+        payload: JSON-serializable arguments for the handler
+        run_at: Earliest time the job may run (default: now)
+        max_attempts: How many times the job is tried before it is marked failed
+        conn: Optional connection so the job commits with the caller's transaction
+
+    Returns:
+        The new job id
+    """
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job type: {job_type}")
+
+    job_id = str(uuid.uuid4())
+    stmt = insert(jobs_table).values(
+        id=job_id,
+        job_type=job_type,
+        payload=payload or {},
+        status="queued",
+        attempts=0,
+        max_attempts=max_attempts,
+        run_at=run_at or datetime.now(timezone.utc),
+    )
+
+    if conn is not None:
+        conn.execute(stmt)
+    else:
+        with engine.begin() as new_conn:
+            new_conn.execute(stmt)
+
+    return job_id
+
+
+def claim_jobs(
+    worker_id: str,
+    batch_size: int = 10,
+    visibility_timeout: timedelta = DEFAULT_VISIBILITY_TIMEOUT
+) -> List[Dict[str, Any]]:
+    """
+    Claim up to batch_size runnable jobs for this worker.
+
+    A job is runnable when it is queued and due, or when it is running but
+    its previous worker let the visibility timeout expire with attempts left.
+    Expired jobs that were on their last attempt are marked failed instead.
+    """
+    with engine.begin() as conn:
+        expired = and_(jobs_table.c.status == "running", jobs_table.c.locked_until < func.now())
+        conn.execute(
+            update(jobs_table)
+            .where(expired, jobs_table.c.attempts >= jobs_table.c.max_attempts)
+            .values(
+                status="failed",
+                locked_until=None,
+                finished_at=func.now(),
+                last_error="Visibility timeout expired on the last attempt",
+            )
+        )
+
+        runnable = or_(
+            and_(jobs_table.c.status == "queued", jobs_table.c.run_at <= func.now()),
+            and_(expired, jobs_table.c.attempts < jobs_table.c.max_attempts),
+        )
+        job_ids = conn.execute(
+            select(jobs_table.c.id)
+            .where(runnable)
+            .order_by(jobs_table.c.run_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+
+        if not job_ids:
+            return []
+
+        rows = conn.execute(
+            update(jobs_table)
+            .where(jobs_table.c.id.in_(job_ids))
+            .values(
+                status="running",
+                attempts=jobs_table.c.attempts + 1,
+                locked_by=worker_id,
+                locked_until=func.now() + visibility_timeout,
+            )
+            .returning(
+                jobs_table.c.id,
+                jobs_table.c.job_type,
+                jobs_table.c.payload,
+                jobs_table.c.attempts,
+                jobs_table.c.max_attempts,
+            )
+        ).mappings().all()
+
+    return [dict(row) for row in rows]
+
+
+def extend_lease(
+    job_id: str,
+    worker_id: str,
+    visibility_timeout: timedelta = DEFAULT_VISIBILITY_TIMEOUT
+) -> bool:
+    """
+    Restart a claimed job's visibility timeout right before it runs, so jobs
+    late in a claimed batch get the full timeout too.
+
+    Returns False if the lease already lapsed and another worker took the job.
+    """
+    with engine.begin() as conn:
+        result = conn.execute(
+            update(jobs_table)
+            .where(
+                jobs_table.c.id == job_id,
+                jobs_table.c.locked_by == worker_id,
+                jobs_table.c.status == "running",
+            )
+            .values(locked_until=func.now() + visibility_timeout)
+        )
+    return result.rowcount == 1
+
+
+def complete_job(job_id: str, worker_id: str) -> None:
+    """
+    Mark a job as done. Ignored if another worker has since reclaimed it.
+    """
+    with engine.begin() as conn:
+        conn.execute(
+            update(jobs_table)
+            .where(jobs_table.c.id == job_id, jobs_table.c.locked_by == worker_id)
+            .values(status="done", locked_until=None, finished_at=func.now())
+        )
+
+
+def fail_job(job: Dict[str, Any], worker_id: str, error: str) -> str:
+    """
+    Record a failed attempt.
+
+    - Requeues the job with exponential backoff while attempts remain
+    - Marks the job failed once max_attempts is reached
+    - Returns the job's new status
+    """
+    if job["attempts"] >= job["max_attempts"]:
+        values = {"status": "failed", "finished_at": func.now()}
+    else:
+        delay = RETRY_BASE_DELAY * (2 ** (job["attempts"] - 1))
+        values = {"status": "queued", "run_at": func.now() + delay}
+
+    with engine.begin() as conn:
+        conn.execute(
+            update(jobs_table)
+            .where(jobs_table.c.id == job["id"], jobs_table.c.locked_by == worker_id)
+            .values(locked_until=None, last_error=error[:2000], **values)
+        )
+
+    return values["status"]
+
+
+def get_queue_metrics(window_seconds: int = 60) -> Dict[str, Any]:
+    """
+    Summarize the queue.
+
+    - Job counts per type and status
+    - Jobs finished in the last window_seconds and the resulting throughput
+    """
+    try:
+        with engine.connect() as conn:
+            counts = conn.execute(
+                select(jobs_table.c.job_type, jobs_table.c.status, func.count().label("count"))
+                .group_by(jobs_table.c.job_type, jobs_table.c.status)
+            ).fetchall()
+
+            since = datetime.now(timezone.utc) - timedelta(seconds=window_seconds)
+            finished = conn.execute(
+                select(func.count())
+                .select_from(jobs_table)
+                .where(jobs_table.c.status == "done", jobs_table.c.finished_at >= since)
+            ).scalar()
+
+        by_type: Dict[str, Dict[str, int]] = {}
+        for row in counts:
+            by_type.setdefault(row.job_type, {})[row.status] = row.count
+
+        return {
+            "jobs": by_type,
+            "completed_last_window": finished,
+            "window_seconds": window_seconds,
+            "jobs_per_second": round(finished / window_seconds, 3),
+        }
+    except Exception as e:
+        return {"error": f"Database error: {str(e)}"}
+
+
+# ========== Job handlers ==========
+
+def run_embed_job(payload: Dict[str, Any]) -> None:
+    """
+    Embed every donation/request saved with defer_embedding, then match them.
+
+    Raises if any item failed, so the job is retried; the failed items are
+    released and picked up by the retry.
+    """
+    result = process_pending_embeddings(batch_size=payload.get("batch_size", 32))
+    if result["failed"]:
+        raise RuntimeError(f"{result['failed']} items could not be embedded or matched")
+
+
+def run_match_job(payload: Dict[str, Any]) -> None:
+    """
+    Find and save the best match for one donation or request.
+
+    Payload: {"item_type": "donation" | "request", "item_id": "..."}
+    A retry does not save (or email) a pair that an earlier attempt already saved.
+    """
+    if payload["item_type"] == "donation":
+        best_match = find_best_match_for_donation(payload["item_id"])
+    elif payload["item_type"] == "request":
+        best_match = find_best_match_for_request(payload["item_id"])
+    else:
+        raise ValueError(f"Invalid item type: {payload['item_type']}")
+
+    if best_match:
+        result = save_vector_matches([best_match], skip_existing=True)
+        if "error" in result:
+            raise RuntimeError(result["error"])
+
+
+def run_notify_job(payload: Dict[str, Any]) -> None:
+    """
+    Email the donor and shelter of an existing match.
+
+    Payload: {"match_id": "..."}
+    """
+    with engine.connect() as conn:
+        match = conn.execute(
+            select(matches_table).where(matches_table.c.id == payload["match_id"])
+        ).mappings().first()
+        if not match:
+            # Match was deleted before we got to it, nothing to send
+            return
+
+        match = dict(match)
+        match["id"] = str(match["id"])
+        donor_email = get_donor_email(conn, match["donor_id"])
+        shelter_email = get_shelter_email(conn, match["shelter_id"])
+        donor_phone = get_donor_phone(conn, match["donor_id"])
+        shelter_phone = get_shelter_phone(conn, match["shelter_id"])
+
+    send_match_emails(donor_email, shelter_email, match, donor_phone, shelter_phone)
+
+
+def run_cleanup_job(payload: Dict[str, Any]) -> None:
+    """
+    Delete finished jobs older than the retention period.
+
+    Payload: {"older_than_days": 7}
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=payload.get("older_than_days", 7))
+    with engine.begin() as conn:
+        conn.execute(
+            delete(jobs_table)
+            .where(jobs_table.c.status.in_(["done", "failed"]), jobs_table.c.finished_at < cutoff)
+        )
+
+
+def run_reembed_job(payload: Dict[str, Any]) -> None:
+    """
+    Backfill one chunk of embeddings for a new model version.
+
+    Payload: {"model_version": "...", "chunk_size": 1000, "max_items_per_second": 20}
+    Queues the next chunk while items were still left, so a long backfill is
+    spread over many short jobs and resumes after a worker restart.
+    """
+    chunk_size = payload.get("chunk_size", 1000)
+    processed = backfill_embeddings(
+        payload["model_version"],
+        max_items_per_second=payload.get("max_items_per_second", REEMBED_MAX_ITEMS_PER_SECOND),
+        max_items=chunk_size
+    )
+    if any(count >= chunk_size for count in processed.values()):
+        enqueue_job("reembed", payload)
+
+
+def run_assign_job(payload: Dict[str, Any]) -> None:
+    """
+    Assign open donations to open requests and store the results as matches.
+
+    Payload: {"threshold": 0.7, "k": 10}
+    """
+    result = run_batch_assignment(
+        threshold=payload.get("threshold", 0.7),
+        k=payload.get("k", ASSIGNMENT_CANDIDATES_K),
+        save=True
+    )
+    if "error" in result:
+        # The run holding the lock assigns the same items; nothing to retry
+        print(f"Batch assignment skipped: {result['error']}")
+        return
+    print(f"Batch assignment: {result['total_assignments']} matches from {result['candidate_edges']} candidate edges")
+
+
+def run_archive_job(payload: Dict[str, Any]) -> None:
+    """
+    Archive matches and expire donations/requests past their retention
+    period (see services/retention.py).
+
+    Payload: {"every_seconds": 3600}
+    With every_seconds, queues the next sweep that far ahead, so one queued
+    job keeps the sweeper running on whichever worker is free.
+    """
+    print(f"Archived matches: {archive_stale_matches()}")
+    print(f"Expired items: {expire_stale_items()}")
+    if payload.get("every_seconds"):
+        enqueue_job(
+            "archive_matches",
+            payload,
+            run_at=datetime.now(timezone.utc) + timedelta(seconds=payload["every_seconds"])
+        )
+
+
+JOB_HANDLERS: Dict[str, Callable[[Dict[str, Any]], None]] = {
+    "embed": run_embed_job,
+    "match": run_match_job,
+    "notify": run_notify_job,
+    "cleanup": run_cleanup_job,
+    "reembed": run_reembed_job,
+    "archive_matches": run_archive_job,
+    "assign": run_assign_job,
+}
+
+
+def run_job(
+    job: Dict[str, Any],
+    worker_id: str,
+    visibility_timeout: timedelta = DEFAULT_VISIBILITY_TIMEOUT
+) -> Optional[bool]:
+    """
+    Run one claimed job and record the outcome.
+
+    Returns True if the job succeeded, False if it failed, and None if it
+    was skipped because another worker has taken it over.
+    """
+    if not extend_lease(job["id"], worker_id, visibility_timeout):
+        print(f"Job {job['id']} ({job['job_type']}) was taken over by another worker, skipping")
+        return None
+
+    handler = JOB_HANDLERS.get(job["job_type"])
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown job type: {job['job_type']}")
+        handler(job["payload"] or {})
+    except Exception as e:
+        print(f"Job {job['id']} ({job['job_type']}) failed: {e}")
+        fail_job(job, worker_id, str(e))
+        return False
+
+    complete_job(job["id"], worker_id)
+    return True
@@ -0,0 +1,111 @@
+"""
+Postgres LISTEN/NOTIFY for the whole process
+
+One background thread holds one connection and listens on every channel
+registered with add_channel, handing each payload to that channel's handler.
+Used by the read cache (services/cache.py) and the match event stream
+(services/match_events.py).
+"""
+import select
+import threading
+import time
+from typing import Callable, Dict, Optional
+from database import engine, is_sqlite
+
+# How often the listener wakes up to pick up new channels and check its connection
+LISTEN_POLL_SECONDS = 1.0
+
+_handlers: Dict[str, Callable[[str], None]] = {}
+_reset_handlers: Dict[str, Callable[[], None]] = {}
+_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+_connected = threading.Event()
+# Channels LISTEN has been issued for on the current connection
+_listening: set = set()
+
+
+def add_channel(channel: str, handler: Callable[[str], None], on_reset: Optional[Callable[[], None]] = None) -> None:
+    """
+    Call handler(payload) for every notification on channel.
+
+    on_reset runs whenever the connection drops or is re-established,
+    since notifications may have been missed in between.
+    """
+    with _lock:
+        _handlers[channel] = handler
+        if on_reset is not None:
+            _reset_handlers[channel] = on_reset
+
+
+def start_listener() -> None:
+    """
+    Start the listener thread once per process (no-op on SQLite).
+    """
+    global _thread
+    if _thread is not None or is_sqlite:
+        return
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_listen, name="pg-listener", daemon=True)
+            _thread.start()
+
+
+def is_listening(channel: str) -> bool:
+    """
+    True while the connection is up and LISTEN has been issued for channel.
+    """
+    return _connected.is_set() and channel in _listening
+
+
+def _reset() -> None:
+    with _lock:
+        handlers = list(_reset_handlers.values())
+    for handler in handlers:
+        handler()
+
+
+def _listen() -> None:
+    """
+    Deliver notifications for as long as the process runs, reconnecting on errors.
+    """
+    while True:
+        raw = None
+        try:
+            raw = engine.raw_connection()
+            conn = raw.driver_connection
+            conn.autocommit = True
+            _connected.set()
+
+            while True:
+                with _lock:
+                    new_channels = [channel for channel in _handlers if channel not in _listening]
+                for channel in new_channels:
+                    conn.cursor().execute(f"LISTEN {channel}")
+                    _listening.add(channel)
+                if new_channels:
+                    _reset()
+
+                if select.select([conn], [], [], LISTEN_POLL_SECONDS) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notification = conn.notifies.pop(0)
+                    handler = _handlers.get(notification.channel)
+                    if handler is None:
+                        continue
+                    try:
+                        handler(notification.payload)
+                    except Exception as e:
+                        print(f"Error handling notification on {notification.channel}: {e}")
+        except Exception as e:
+            print(f"LISTEN connection error: {e}")
+        finally:
+            _connected.clear()
+            _listening.clear()
+            _reset()
+            if raw is not None:
+                try:
+                    raw.close()
+                except Exception:
+                    pass
+        time.sleep(1)
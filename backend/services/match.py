@@ -1,66 +1,129 @@
 from schemas.match import Match
 import json
-from typing import List, Dict, Any
-from database import engine, donors_table, shelters_table, matches_table
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+from database import engine, donors_table, shelters_table, matches_table, donations_table, requests_table
 from schemas.forms import DonationForm
 from schemas.forms import RequestForm
-from sqlalchemy import text, delete, update, select, func
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import text, delete, update, select, func, case, tuple_
 from uuid import UUID
+from services.singleflight import single_flight
+from services.pagination import DEFAULT_PAGE_SIZE, decode_cursor
+from services.candidates import remove_candidates
 
-def get_matches_service(user_id: str, user_type: str):
+# Matches still waiting for a confirmation; the default view of /match/matches
+ACTIVE_MATCH_STATUSES = ("pending", "donor", "shelter")
+MATCH_STATUSES = ACTIVE_MATCH_STATUSES + ("both",)
+
+def get_matches_service(
+    user_id: str,
+    user_type: str,
+    status: str = "active",
+    since: Optional[datetime] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None
+):
+    """
+    Fetch one page of matches for a donor or shelter, newest first.
+
+    - status is "active" (pending/donor/shelter), "all", or one status
+    - since keeps matches made at or after that time
+    - Pages over the (donor_id|shelter_id, matched_at) index, starting after cursor
+    - Adds donor and shelter contact information with one query each
+    - Identical concurrent calls share one lookup
+
+    Raises ValueError for an unknown status or a malformed cursor.
     """
-    Fetch all matches for a donor or shelter.
+    statuses = _match_statuses(status)
+    cursor_key = None
+    if cursor:
+        cursor_matched_at, cursor_id = decode_cursor(cursor)
+        try:
+            cursor_key = (cursor_matched_at, UUID(cursor_id))
+        except ValueError:
+            raise ValueError("Invalid cursor")
 
-    - Looks up the user's match_id list
-    - Retrieves each match from the database
-    - Adds donor and shelter contact information
-    - Returns a list of enriched match records
+    return single_flight(
+        "get_matches",
+        (user_id, user_type, statuses, since, limit, cursor),
+        lambda: _load_matches(user_id, user_type, statuses, since, limit, cursor_key)
+    )
+
+def _match_statuses(status: str) -> Optional[Tuple[str, ...]]:
+    """
+    The statuses a status filter selects; None means every status.
     """
+    if status == "active":
+        return ACTIVE_MATCH_STATUSES
+    if status == "all":
+        return None
+    if status in MATCH_STATUSES:
+        return (status,)
+    raise ValueError(f"Invalid status: {status}")
+
+def _load_matches(user_id: str, user_type: str, statuses, since, limit: int, cursor_key):
     try:
         with engine.connect() as conn:
-            # get match_ids array from user table
             if user_type == "donor":
-                result = conn.execute(
-                    donors_table.select().where(donors_table.c.uid == user_id)
-                ).fetchone()
-                if not result:
-                    return {"error": f"Donor with uid {user_id} not found"}
-                match_ids = result.match_ids
+                user_table, user_column = donors_table, matches_table.c.donor_id
             elif user_type == "shelter":
-                result = conn.execute(
-                    shelters_table.select().where(shelters_table.c.uid == user_id)
-                ).fetchone()
-                if not result:
-                    return {"error": f"Shelter with uid {user_id} not found"}
-                match_ids = result.match_ids
+                user_table, user_column = shelters_table, matches_table.c.shelter_id
             else:
                 return {"error": "Invalid user type"}
 
-            # If no match_ids or empty array, return empty matches
-            if not match_ids:
-                return {"matches": []}
+            found = conn.execute(
+                select(user_table.c.uid).where(user_table.c.uid == user_id)
+            ).first()
+            if not found:
+                return {"error": f"{user_type.capitalize()} with uid {user_id} not found"}
 
-            # get matches from matches table with the array of match_ids
-            matches = conn.execute(matches_table.select().where(matches_table.c.id.in_(match_ids))).fetchall()
+            query = (
+                select(matches_table)
+                .where(user_column == user_id)
+                .order_by(matches_table.c.matched_at.desc(), matches_table.c.id.desc())
+                .limit(limit)
+            )
+            if statuses is not None:
+                query = query.where(matches_table.c.status.in_(statuses))
+            if since is not None:
+                query = query.where(matches_table.c.matched_at >= since)
+            if cursor_key is not None:
+                query = query.where(tuple_(matches_table.c.matched_at, matches_table.c.id) < tuple_(*cursor_key))
+            matches_list = [dict(row._mapping) for row in conn.execute(query).fetchall()]
+            if not matches_list:
+                return {"matches": []}
 
-            # Convert rows to dictionaries and enrich with contact information
-            matches_list = []
-            for row in matches:
-                match_dict = dict(row._mapping)
+            # Contact information for the users on this page only
+            donors = {
+                row.uid: row
+                for row in conn.execute(
+                    select(donors_table.c.uid, donors_table.c.email, donors_table.c.phone_number)
+                    .where(donors_table.c.uid.in_({m["donor_id"] for m in matches_list}))
+                )
+            }
+            shelters = {
+                row.uid: row
+                for row in conn.execute(
+                    select(
+                        shelters_table.c.uid,
+                        shelters_table.c.email,
+                        shelters_table.c.phone_number,
+                        shelters_table.c.address,
+                        shelters_table.c.city,
+                        shelters_table.c.state,
+                        shelters_table.c.zip_code,
+                    )
+                    .where(shelters_table.c.uid.in_({m["shelter_id"] for m in matches_list}))
+                )
+            }
 
-                # Fetch donor contact information
-                donor = conn.execute(
-                    donors_table.select().where(donors_table.c.uid == match_dict['donor_id'])
-                ).fetchone()
+            for match_dict in matches_list:
+                donor = donors.get(match_dict['donor_id'])
                 if donor:
                     match_dict['donor_email'] = donor.email
                     match_dict['donor_phone'] = donor.phone_number
 
-                # Fetch shelter contact information
-                shelter = conn.execute(
-                    shelters_table.select().where(shelters_table.c.uid == match_dict['shelter_id'])
-                ).fetchone()
+                shelter = shelters.get(match_dict['shelter_id'])
                 if shelter:
                     match_dict['shelter_email'] = shelter.email
                     match_dict['shelter_phone'] = shelter.phone_number
@@ -69,8 +132,6 @@ def get_matches_service(user_id: str, user_type: str):
                     match_dict['shelter_state'] = shelter.state
                     match_dict['shelter_zip_code'] = shelter.zip_code
 
-                matches_list.append(match_dict)
-
             return {"matches": matches_list}
     except Exception as e:
         return {"error": str(e)}
@@ -99,53 +160,270 @@ def delete_match(match_id: UUID):
         print(f"Error deleting match: {e}")
         return False
 
-SessionLocal = sessionmaker(bind=engine)
+def remove_match_ids(conn, table, uids, match_ids: List[str]):
+    """
+    Remove several match ids from the match_ids arrays of several users at once.
+    """
+    if not uids:
+        return
+    conn.execute(
+        text(f"""
+            UPDATE {table.name}
+            SET match_ids = ARRAY(
+                SELECT m FROM unnest(match_ids) AS m
+                WHERE m::text <> ALL(:match_ids)
+            )
+            WHERE uid = ANY(:uids)
+        """),
+        {"match_ids": match_ids, "uids": list(uids)}
+    )
 
-def resolve_match_db(match_id: UUID, user_uid: UUID) -> str:
+def add_match_ids(conn, table, match_ids_by_uid: Dict[str, List[str]]):
     """
-    Confirm a match on behalf of a donor or shelter.
+    Append new match ids to the match_ids arrays of several users, one
+    UPDATE per user sent in a single executemany.
+    """
+    if not match_ids_by_uid:
+        return
+    conn.execute(
+        text(f"""
+            UPDATE {table.name}
+            SET match_ids = coalesce(match_ids, '{{}}') || CAST(:match_ids AS uuid[])
+            WHERE uid = :uid
+        """),
+        [{"uid": uid, "match_ids": match_ids} for uid, match_ids in match_ids_by_uid.items()]
+    )
 
-    - Loads the match record
-    - Determines whether the confirmer is donor or shelter
-    - Updates match status (pending → donor/shelter → both)
-    - Returns the new match status
+def delete_matches_for_item(item_type: str, item_id, conn=None) -> List[str]:
     """
-    session = SessionLocal()
-    try:
-        # Get current match record
-        match = session.execute(
-            matches_table.select().where(matches_table.c.id == match_id)
+    Delete every match on a donation or request.
+
+    - Deletes all matching rows with one indexed DELETE
+    - Removes their ids from the donors' and shelters' match_ids arrays
+    - Runs in the caller's transaction when conn is given, otherwise in its own
+    - Returns the deleted match ids
+    """
+    if item_type == "donation":
+        column = matches_table.c.donation_id
+    elif item_type == "request":
+        column = matches_table.c.request_id
+    else:
+        raise ValueError(f"Invalid item type: {item_type}")
+
+    if conn is None:
+        with engine.begin() as new_conn:
+            return delete_matches_for_item(item_type, item_id, new_conn)
+
+    deleted = conn.execute(
+        delete(matches_table)
+        .where(column == str(item_id))
+        .returning(matches_table.c.id, matches_table.c.donor_id, matches_table.c.shelter_id)
+    ).fetchall()
+
+    if not deleted:
+        return []
+
+    match_ids = [str(row.id) for row in deleted]
+    remove_match_ids(conn, donors_table, {row.donor_id for row in deleted}, match_ids)
+    remove_match_ids(conn, shelters_table, {row.shelter_id for row in deleted}, match_ids)
+    return match_ids
+
+# Donation/request lifecycle; only open and partially matched items are searched
+OPEN_ITEM_STATUSES = ("open", "partially_matched")
+ITEM_STATUSES = OPEN_ITEM_STATUSES + ("fulfilled", "expired")
+
+def item_status(quantity: int, remaining_quantity: int) -> str:
+    """
+    Lifecycle status of a donation or request from its remaining quantity.
+    """
+    if remaining_quantity <= 0:
+        return "fulfilled"
+    if remaining_quantity < quantity:
+        return "partially_matched"
+    return "open"
+
+def remaining_quantity(item) -> int:
+    """
+    What a donation or request row still has to give or needs; rows saved
+    before remaining_quantity existed fall back to their quantity.
+    """
+    if item.remaining_quantity is None:
+        return item.quantity
+    return item.remaining_quantity
+
+def quantity_update_values(table, quantity: int, reopen: bool = False) -> Dict[str, Any]:
+    """
+    Values that keep remaining_quantity and status right when a donation's
+    or request's quantity is edited to quantity.
+
+    - Quantity already promised in confirmed matches stays promised
+    - With reopen (its matches were dropped), the item starts over as open
+    - Evaluated against the row being updated, so no prior read is needed
+    """
+    if reopen:
+        return {"remaining_quantity": quantity, "status": "open"}
+    promised = table.c.quantity - func.coalesce(table.c.remaining_quantity, table.c.quantity)
+    remaining = case((promised >= quantity, 0), else_=quantity - promised)
+    return {
+        "remaining_quantity": remaining,
+        "status": case(
+            (table.c.status == "expired", "expired"),
+            (remaining <= 0, "fulfilled"),
+            (remaining < quantity, "partially_matched"),
+            else_="open"
+        ),
+    }
+
+def commit_match_quantity(conn, match_id) -> Tuple[int, List[Tuple[str, str]]]:
+    """
+    Take a confirmed match's quantity off its donation and its request.
+
+    - Runs once per match: fulfilled_quantity is claimed on the locked match row
+    - Moves the match quantity, or less if either item has less left,
+      and updates both items' status
+    - Locks the donation before the request, so concurrent confirmations
+      of matches sharing an item never deadlock
+    - Returns the quantity moved, and (item type, id) of the items it closed
+    """
+    match = conn.execute(
+        update(matches_table)
+        .where(matches_table.c.id == match_id, matches_table.c.fulfilled_quantity.is_(None))
+        .values(fulfilled_quantity=0)
+        .returning(matches_table.c.donation_id, matches_table.c.request_id, matches_table.c.quantity)
+    ).first()
+    if not match:
+        return 0, []
+
+    items = []
+    for table, item_id in ((donations_table, match.donation_id), (requests_table, match.request_id)):
+        item = conn.execute(
+            select(
+                table.c.id,
+                table.c.quantity,
+                func.coalesce(table.c.remaining_quantity, table.c.quantity).label("remaining"),
+                table.c.status,
+            )
+            .where(table.c.id == UUID(str(item_id)))
+            .with_for_update()
         ).first()
+        if not item:
+            return 0, []
+        items.append((table, item))
 
-        if not match:
-            raise ValueError(f"No match found with id {match_id}")
+    moved = max(0, min([match.quantity] + [item.remaining for _, item in items]))
+    closed = []
+    for table, item in items:
+        remaining = item.remaining - moved
+        values = {"remaining_quantity": remaining}
+        if item.status != "expired":
+            values["status"] = item_status(item.quantity, remaining)
+            if item.status in OPEN_ITEM_STATUSES and values["status"] not in OPEN_ITEM_STATUSES:
+                closed.append(("donation" if table is donations_table else "request", str(item.id)))
+        conn.execute(update(table).where(table.c.id == item.id).values(**values))
+    conn.execute(update(matches_table).where(matches_table.c.id == match_id).values(fulfilled_quantity=moved))
+    return moved, closed
 
-        match_dict = match._asdict()
-        current_status = match_dict["status"]
+def available_quantities(conn, item_type: str, item_ids: Optional[List] = None) -> Dict[str, int]:
+    """
+    Quantity each open donation or request can still be matched for.
 
-        # Determine if the user who confirmed is a shelter/donor
-        if user_uid == match_dict["donor_id"]:
-            user_is_donor = True
-        elif user_uid == match_dict["shelter_id"]:
-            user_is_donor = False
-        else:
-            raise PermissionError("User is not part of this match")
+    - remaining_quantity minus what its pending (not yet both-confirmed) matches promise
+    - Only open and partially matched items; those with nothing left are omitted
+    - All open items, or only item_ids when given
+    - Returns {item id as str: quantity}
+    """
+    if item_type == "donation":
+        table, match_column = donations_table, matches_table.c.donation_id
+    elif item_type == "request":
+        table, match_column = requests_table, matches_table.c.request_id
+    else:
+        raise ValueError(f"Invalid item type: {item_type}")
 
-        new_status = resolve_match_status(current_status, user_is_donor)
+    pending = (
+        select(match_column.label("item_id"), func.sum(matches_table.c.quantity).label("quantity"))
+        .where(matches_table.c.status.in_(ACTIVE_MATCH_STATUSES), matches_table.c.fulfilled_quantity.is_(None))
+        .group_by(match_column)
+    )
+    query = select(
+        table.c.id,
+        func.coalesce(table.c.remaining_quantity, table.c.quantity).label("remaining"),
+    ).where(table.c.status.in_(OPEN_ITEM_STATUSES))
+    if item_ids is not None:
+        ids = [str(item_id) for item_id in item_ids]
+        pending = pending.where(match_column.in_(ids))
+        query = query.where(table.c.id.in_([UUID(item_id) for item_id in ids]))
 
-        # Update only if changed
-        if new_status != current_status:
-            session.execute(
-                update(matches_table)
-                .where(matches_table.c.id == match_id)
-                .values(status=new_status)
+    promised = {row.item_id: row.quantity for row in conn.execute(pending)}
+    available = {}
+    for row in conn.execute(query):
+        quantity = row.remaining - (promised.get(str(row.id)) or 0)
+        if quantity > 0:
+            available[str(row.id)] = quantity
+    return available
+
+# (current status, confirmer is donor) -> next status; anything else keeps its status
+MATCH_STATUS_TRANSITIONS = {
+    ("pending", True): "donor",
+    ("pending", False): "shelter",
+    ("donor", False): "both",  # shelter confirms after donor
+    ("shelter", True): "both",  # donor confirms after shelter
+}
+
+def resolve_match_db(match_id: UUID, user_uid: UUID) -> str:
+    """
+    Confirm a match on behalf of a donor or shelter.
+
+    - One conditional UPDATE ... RETURNING applies the transition
+      (pending → donor/shelter → both) to the row as it is when locked,
+      so two parties confirming at once both count
+    - Looks the match up again only when nothing was updated, to tell
+      a missing match from a user who is not part of it
+    - On reaching "both", records confirmed_at and takes the quantity off
+      the donation and the request in the same transaction
+    - Items that are no longer open leave match_candidates once it commits
+    - Returns the new match status
+    """
+    status = matches_table.c.status
+    is_donor = matches_table.c.donor_id == user_uid
+    is_shelter = matches_table.c.shelter_id == user_uid
+    next_status = case(
+        *[
+            ((is_donor if user_is_donor else is_shelter) & (status == current), new_status)
+            for (current, user_is_donor), new_status in MATCH_STATUS_TRANSITIONS.items()
+        ],
+        else_=status
+    )
+
+    with engine.begin() as conn:
+        row = conn.execute(
+            update(matches_table)
+            .where(matches_table.c.id == match_id, is_donor | is_shelter)
+            .values(
+                status=next_status,
+                # Stamped once, by the confirmation that completes the match
+                confirmed_at=case(
+                    ((next_status == "both") & matches_table.c.confirmed_at.is_(None), func.now()),
+                    else_=matches_table.c.confirmed_at
+                ),
             )
-            session.commit()
+            .returning(matches_table.c.status)
+        ).first()
+        closed = []
+        if row and row.status == "both":
+            _, closed = commit_match_quantity(conn, match_id)
 
-        return new_status
+        if not row:
+            found = conn.execute(
+                select(matches_table.c.id).where(matches_table.c.id == match_id)
+            ).first()
+            if not found:
+                raise ValueError(f"No match found with id {match_id}")
+            raise PermissionError("User is not part of this match")
 
-    finally:
-        session.close()
+    # After the commit, so their counterparts are refilled without them
+    for item_type, item_id in closed:
+        remove_candidates(item_type, item_id)
+    return row.status
 
 def resolve_match_status(current_status: str, user_is_donor: bool) -> str:
     """
@@ -155,13 +433,4 @@ def resolve_match_status(current_status: str, user_is_donor: bool) -> str:
     - donor/shelter → both (if the other side confirms)
     - No change once both have confirmed
     """
-    if current_status == "pending":
-        return "donor" if user_is_donor else "shelter"
-
-    if current_status == "donor" and not user_is_donor:
-        return "both"  # shelter confirms after donor
-
-    if current_status == "shelter" and user_is_donor:
-        return "both"  # donor confirms after shelter
-
-    return current_status  # No change if both or same user confirms
\ No newline at end of file
+    return MATCH_STATUS_TRANSITIONS.get((current_status, user_is_donor), current_status)
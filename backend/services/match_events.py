@@ -0,0 +1,104 @@
+"""
+Live match events for the /match/stream SSE endpoint
+
+The triggers in migrations/013_match_events.sql NOTIFY on every new match and
+every status change. The process-wide listener (services/listener.py) hands
+each event to the queues of the donor's and the shelter's open streams, so an
+idle stream is just a waiting queue and costs no database work.
+"""
+import asyncio
+import json
+import threading
+from typing import Any, Dict, Set, Tuple
+from services.listener import add_channel, start_listener
+
+MATCH_EVENTS_CHANNEL = "match_events"
+# Events held for a slow client before its backlog is replaced by a resync
+STREAM_QUEUE_SIZE = 100
+
+# user uid -> (queue, the event loop that reads it)
+_subscribers: Dict[str, Set[Tuple[asyncio.Queue, asyncio.AbstractEventLoop]]] = {}
+_lock = threading.Lock()
+
+
+def subscribe(user_id: str) -> asyncio.Queue:
+    """
+    Open a queue that receives every match event involving user_id.
+
+    Must be called from the event loop that will read the queue.
+    """
+    start_listener()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    with _lock:
+        _subscribers.setdefault(user_id, set()).add((queue, asyncio.get_running_loop()))
+    return queue
+
+
+def unsubscribe(user_id: str, queue: asyncio.Queue) -> None:
+    with _lock:
+        subscribers = _subscribers.get(user_id, set())
+        for entry in [entry for entry in subscribers if entry[0] is queue]:
+            subscribers.discard(entry)
+        if not subscribers:
+            _subscribers.pop(user_id, None)
+
+
+def subscriber_count() -> int:
+    with _lock:
+        return sum(len(subscribers) for subscribers in _subscribers.values())
+
+
+def publish(event: Dict[str, Any]) -> None:
+    """
+    Hand an event to the streams of the match's donor and shelter.
+
+    Safe to call from any thread.
+    """
+    with _lock:
+        targets = [
+            entry
+            for user_id in {event.get("donor_id"), event.get("shelter_id")}
+            for entry in _subscribers.get(user_id, ())
+        ]
+    for queue, loop in targets:
+        loop.call_soon_threadsafe(_offer, queue, event)
+
+
+def _offer(queue: asyncio.Queue, event: Dict[str, Any]) -> None:
+    """
+    Queue an event for one stream.
+
+    A client that fell STREAM_QUEUE_SIZE events behind loses its backlog
+    and gets a single resync event instead, so it refetches its matches
+    rather than silently missing a status change.
+    """
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait({"type": "resync"})
+
+
+def handle_notification(payload: str) -> None:
+    publish(json.loads(payload))
+
+
+def _resync() -> None:
+    """
+    Tell every stream that events may have been missed, so clients refetch.
+    """
+    with _lock:
+        targets = [entry for subscribers in _subscribers.values() for entry in subscribers]
+    for queue, loop in targets:
+        loop.call_soon_threadsafe(_offer, queue, {"type": "resync"})
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """
+    One Server-Sent Events message, named after the event type.
+    """
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+add_channel(MATCH_EVENTS_CHANNEL, handle_notification, on_reset=_resync)
@@ -0,0 +1,38 @@
+"""
+Opaque keyset cursors for paginated listings
+
+A cursor encodes the (timestamp, id) of the last row of a page; the next page
+starts strictly after it, so pages stay stable while new rows are inserted.
+"""
+import base64
+from datetime import datetime
+from typing import Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(timestamp, item_id) -> str:
+    """
+    Build a cursor from the last row of a page.
+
+    timestamp may be a datetime or an ISO 8601 string.
+    """
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.isoformat()
+    raw = f"{timestamp}|{item_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Read a cursor back into (timestamp, id).
+
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp, item_id = raw.split("|", 1)
+        return datetime.fromisoformat(timestamp), item_id
+    except Exception:
+        raise ValueError("Invalid cursor")
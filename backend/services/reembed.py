@@ -0,0 +1,208 @@
+"""
+Re-embed donations and requests with a new model version
+
+Vectors for the target version are written next to the active ones, so every
+query keeps using the active version (EMBEDDING_MODEL_VERSION) until it is
+switched. An item is only picked up while it has no target-version vector,
+so the backfill can be stopped and restarted at any point.
+
+    python -m services.reembed --version <target> --rate 20
+"""
+import argparse
+import time
+from typing import Dict, Any, Optional
+from sqlalchemy import select, exists, delete, func, bindparam, literal, cast
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from database import engine, donations_table, requests_table, embedding_type
+from services.embeddings import EMBEDDING_MODELS, EMBEDDING_TABLES, MODEL_VERSION, generate_embeddings
+
+REEMBED_BATCH_SIZE = 64
+# Default cap so a backfill never starves live embedding requests
+REEMBED_MAX_ITEMS_PER_SECOND = 20.0
+
+_ITEM_TABLES = {
+    "donation": donations_table,
+    "request": requests_table,
+}
+
+
+def _has_version(item_type: str, model_version: str):
+    """
+    EXISTS clause that is true when the item has a vector of model_version.
+    """
+    table = _ITEM_TABLES[item_type]
+    embedding_table, key = EMBEDDING_TABLES[item_type]
+    return exists().where(key == table.c.id, embedding_table.c.model_version == model_version)
+
+
+def _store_backfilled(conn, item_type: str, row, embedding: list[float], model_version: str) -> None:
+    """
+    Write a backfilled vector unless the item changed after it was read.
+
+    An edit in between has already dropped every old vector, and the item
+    will be picked up again on the next pass.
+    """
+    table = _ITEM_TABLES[item_type]
+    embedding_table, key = EMBEDDING_TABLES[item_type]
+    conn.execute(
+        pg_insert(embedding_table)
+        .from_select(
+            [key.name, "embedding", "model_version", "category"],
+            select(
+                table.c.id,
+                cast(bindparam("embedding", embedding, type_=embedding_type), embedding_type),
+                literal(model_version),
+                table.c.category,
+            ).where(
+                table.c.id == row.id,
+                table.c.item_name == row.item_name,
+                table.c.category == row.category,
+            )
+        )
+        .on_conflict_do_nothing()
+    )
+
+
+def _backfill_table(
+    item_type: str,
+    model_version: str,
+    batch_size: int,
+    max_items_per_second: float,
+    max_items: Optional[int]
+) -> int:
+    """
+    One keyset pass over a table, embedding items that lack model_version.
+
+    Returns how many items were embedded.
+    """
+    table = _ITEM_TABLES[item_type]
+    processed = 0
+    last_id = None
+
+    while max_items is None or processed < max_items:
+        started = time.monotonic()
+        limit = batch_size if max_items is None else min(batch_size, max_items - processed)
+
+        query = (
+            select(table.c.id, table.c.item_name, table.c.category)
+            .where(~_has_version(item_type, model_version))
+            .order_by(table.c.id)
+            .limit(limit)
+        )
+        if last_id is not None:
+            query = query.where(table.c.id > last_id)
+
+        with engine.connect() as conn:
+            rows = conn.execute(query).fetchall()
+        if not rows:
+            break
+
+        embeddings = generate_embeddings(
+            [(row.category, row.item_name) for row in rows],
+            model_version=model_version
+        )
+        with engine.begin() as conn:
+            for row, embedding in zip(rows, embeddings):
+                _store_backfilled(conn, item_type, row, embedding, model_version)
+
+        processed += len(rows)
+        last_id = rows[-1].id
+
+        # Throttle to max_items_per_second
+        if max_items_per_second:
+            remaining = len(rows) / max_items_per_second - (time.monotonic() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+
+    return processed
+
+
+def backfill_embeddings(
+    model_version: str,
+    batch_size: int = REEMBED_BATCH_SIZE,
+    max_items_per_second: float = REEMBED_MAX_ITEMS_PER_SECOND,
+    max_items: Optional[int] = None
+) -> Dict[str, int]:
+    """
+    Embed every donation and request that has no vector of model_version yet.
+
+    Args:
+        model_version: Key of EMBEDDING_MODELS to backfill
+        batch_size: Items per model call
+        max_items_per_second: Rate cap across the whole run (0 for no cap)
+        max_items: Stop after this many items per table (None for no limit)
+
+    Returns:
+        How many donations and requests were embedded
+    """
+    if model_version not in EMBEDDING_MODELS:
+        raise ValueError(f"Unknown model version: {model_version}")
+
+    return {
+        "donations": _backfill_table("donation", model_version, batch_size, max_items_per_second, max_items),
+        "requests": _backfill_table("request", model_version, batch_size, max_items_per_second, max_items),
+    }
+
+
+def get_backfill_progress(model_version: str) -> Dict[str, Any]:
+    """
+    Count how many items already have a vector of model_version.
+    """
+    progress: Dict[str, Any] = {"model_version": model_version, "active_version": MODEL_VERSION}
+    with engine.connect() as conn:
+        for item_type, table in _ITEM_TABLES.items():
+            total, done = conn.execute(
+                select(
+                    func.count(),
+                    func.count().filter(_has_version(item_type, model_version))
+                ).select_from(table)
+            ).one()
+            progress[f"{item_type}s"] = {"total": total, "embedded": done}
+    progress["complete"] = all(
+        progress[f"{item_type}s"]["total"] == progress[f"{item_type}s"]["embedded"]
+        for item_type in _ITEM_TABLES
+    )
+    return progress
+
+
+def prune_embeddings(keep_version: str = MODEL_VERSION) -> Dict[str, int]:
+    """
+    Delete vectors of every version except keep_version.
+
+    Only allowed for the active version, so nothing queries what is deleted.
+    """
+    if keep_version != MODEL_VERSION:
+        raise ValueError("Only vectors of inactive versions can be pruned; switch EMBEDDING_MODEL_VERSION first")
+
+    deleted = {}
+    with engine.begin() as conn:
+        for item_type in _ITEM_TABLES:
+            embedding_table, _ = EMBEDDING_TABLES[item_type]
+            result = conn.execute(
+                delete(embedding_table).where(embedding_table.c.model_version != keep_version)
+            )
+            deleted[f"{item_type}s"] = result.rowcount
+    return deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill embeddings for a new model version")
+    parser.add_argument("--version", default=MODEL_VERSION, help="Model version to backfill (key of EMBEDDING_MODELS)")
+    parser.add_argument("--batch-size", type=int, default=REEMBED_BATCH_SIZE, help="Items per model call")
+    parser.add_argument("--rate", type=float, default=REEMBED_MAX_ITEMS_PER_SECOND, help="Max items embedded per second (0 for no cap)")
+    parser.add_argument("--status", action="store_true", help="Only print progress")
+    parser.add_argument("--prune", action="store_true", help="Delete vectors of every version except the active one")
+    args = parser.parse_args()
+
+    if args.prune:
+        print(prune_embeddings())
+        return
+    if not args.status:
+        # Keep going until a pass finds nothing, so items edited mid-run are covered
+        while any(backfill_embeddings(args.version, args.batch_size, args.rate).values()):
+            pass
+    print(get_backfill_progress(args.version))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Match retention: archive expired and long-finished matches
+
+Matches nobody confirmed within MATCH_EXPIRY_DAYS and matches both sides
+confirmed (confirmed_at) more than MATCH_ARCHIVE_AFTER_DAYS ago are moved
+from matches to matches_archive, and their ids are removed from the users'
+match_ids arrays.
+Donations and requests still open ITEM_EXPIRY_DAYS after they were created
+are marked expired, which takes them out of every similarity search.
+Each batch is one short transaction, so sweeping never holds many locks.
+Rows are claimed with FOR UPDATE SKIP LOCKED, so several sweepers and live
+confirmations never wait on each other.
+
+    python -m services.retention
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from sqlalchemy import select, insert, update, delete, literal, func, and_
+from database import (
+    engine, donors_table, shelters_table, matches_table, matches_archive_table, donations_table, requests_table
+)
+from services.match import ACTIVE_MATCH_STATUSES, OPEN_ITEM_STATUSES, remove_match_ids
+from services.candidates import remove_candidates_for_items
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Days an unconfirmed (pending/donor/shelter) match is kept; 0 keeps them forever
+MATCH_EXPIRY_DAYS = float(os.getenv("MATCH_EXPIRY_DAYS", "0"))
+# Days a match confirmed by both sides is kept; 0 keeps them forever
+MATCH_ARCHIVE_AFTER_DAYS = float(os.getenv("MATCH_ARCHIVE_AFTER_DAYS", "0"))
+# Days a donation or request stays open; 0 keeps them open forever
+ITEM_EXPIRY_DAYS = float(os.getenv("ITEM_EXPIRY_DAYS", "0"))
+
+ARCHIVE_BATCH_SIZE = 500
+
+
+def _archive_batch(reason: str, condition, age_column, batch_size: int) -> int:
+    """
+    Move up to batch_size matches meeting condition to matches_archive,
+    oldest by age_column first.
+
+    Returns how many matches were moved.
+    """
+    with engine.begin() as conn:
+        match_ids = conn.execute(
+            select(matches_table.c.id)
+            .where(condition)
+            .order_by(age_column)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not match_ids:
+            return 0
+
+        columns = [column for column in matches_table.c]
+        conn.execute(
+            insert(matches_archive_table).from_select(
+                [column.name for column in columns] + ["archive_reason", "archived_at"],
+                select(*columns, literal(reason), func.now()).where(matches_table.c.id.in_(match_ids))
+            )
+        )
+        moved = conn.execute(
+            delete(matches_table)
+            .where(matches_table.c.id.in_(match_ids))
+            .returning(matches_table.c.id, matches_table.c.donor_id, matches_table.c.shelter_id)
+        ).fetchall()
+
+        moved_ids = [str(row.id) for row in moved]
+        remove_match_ids(conn, donors_table, {row.donor_id for row in moved}, moved_ids)
+        remove_match_ids(conn, shelters_table, {row.shelter_id for row in moved}, moved_ids)
+    return len(moved)
+
+
+def archive_stale_matches(
+    expiry_days: float = MATCH_EXPIRY_DAYS,
+    archive_after_days: float = MATCH_ARCHIVE_AFTER_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    max_batches: Optional[int] = None
+) -> Dict[str, int]:
+    """
+    Archive every match past its retention period, one batch at a time.
+
+    Args:
+        expiry_days: Age at which unconfirmed matches expire (0 to skip)
+        archive_after_days: Age at which matches confirmed by both sides are archived (0 to skip)
+        batch_size: Matches moved per transaction
+        max_batches: Stop after this many batches per kind (None for no limit)
+
+    Returns:
+        How many matches were archived as "expired" and as "completed"
+    """
+    now = datetime.now(timezone.utc)
+    policies = []
+    if expiry_days > 0:
+        policies.append(("expired", matches_table.c.matched_at, and_(
+            matches_table.c.status.in_(ACTIVE_MATCH_STATUSES),
+            matches_table.c.matched_at < now - timedelta(days=expiry_days)
+        )))
+    if archive_after_days > 0:
+        # Aged from the second confirmation, not from when the match was made
+        policies.append(("completed", matches_table.c.confirmed_at, and_(
+            matches_table.c.status == "both",
+            matches_table.c.confirmed_at < now - timedelta(days=archive_after_days)
+        )))
+
+    archived = {"expired": 0, "completed": 0}
+    for reason, age_column, condition in policies:
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            moved = _archive_batch(reason, condition, age_column, batch_size)
+            archived[reason] += moved
+            batches += 1
+            if moved < batch_size:
+                break
+    return archived
+
+
+def expire_stale_items(
+    expiry_days: float = ITEM_EXPIRY_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE
+) -> Dict[str, int]:
+    """
+    Mark donations and requests created more than expiry_days ago as expired
+    while they are still open or partially matched.
+
+    Expired items leave match_candidates after each batch commits.
+    Returns how many donations and requests were expired.
+    """
+    expired = {"donations": 0, "requests": 0}
+    if expiry_days <= 0:
+        return expired
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=expiry_days)
+    for table in (donations_table, requests_table):
+        while True:
+            with engine.begin() as conn:
+                item_ids = conn.execute(
+                    select(table.c.id)
+                    .where(table.c.status.in_(OPEN_ITEM_STATUSES), table.c.created_at < cutoff)
+                    .limit(batch_size)
+                    .with_for_update(skip_locked=True)
+                ).scalars().all()
+                if item_ids:
+                    conn.execute(update(table).where(table.c.id.in_(item_ids)).values(status="expired"))
+            if item_ids:
+                remove_candidates_for_items(table.name[:-1], item_ids)
+            expired[table.name] += len(item_ids)
+            if len(item_ids) < batch_size:
+                break
+    return expired
+
+
+if __name__ == "__main__":
+    print(archive_stale_matches())
+    print(expire_stale_items())
@@ -1,5 +1,22 @@
-from database import engine, shelters_table, requests_table
-from sqlalchemy import select
+from database import engine, shelters_table, requests_table, is_sqlite
+from sqlalchemy import select, or_
+from services.geo import bounding_box, longitude_ranges, distance_expr, haversine_km
+from services.cache import read_through
+
+# Columns shown on the map and shelter list; leaves out the match/request id arrays
+SHELTER_DISPLAY_COLUMNS = [
+    shelters_table.c.id,
+    shelters_table.c.uid,
+    shelters_table.c.shelter_name,
+    shelters_table.c.email,
+    shelters_table.c.phone_number,
+    shelters_table.c.address,
+    shelters_table.c.city,
+    shelters_table.c.state,
+    shelters_table.c.zip_code,
+    shelters_table.c.latitude,
+    shelters_table.c.longitude,
+]
 
 def get_all_shelters_service():
     """
@@ -8,7 +25,11 @@ def get_all_shelters_service():
     - Retrieves all shelter records from the database
     - Includes full location and contact details
     - Returns list of shelters and total count
+    - Served from the read cache when enabled
     """
+    return read_through("shelters", "all", _load_all_shelters)
+
+def _load_all_shelters():
     try:
         with engine.connect() as conn:
             shelters_query = shelters_table.select()
@@ -23,6 +44,53 @@ def get_all_shelters_service():
     except Exception as e:
         return {"error": f"Database error: {str(e)}"}
 
+def get_nearby_shelters_service(latitude: float, longitude: float, radius_km: float, limit: int):
+    """
+    Fetch the shelters closest to a point.
+
+    - Narrows to the bounding box of the radius (served by shelters_lat_lon_idx)
+    - Keeps shelters within radius_km, nearest first, at most limit of them
+    - Returns display columns plus distance_km, and the count
+    """
+    try:
+        min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+        in_box = [
+            shelters_table.c.latitude.between(min_lat, max_lat),
+            # Two ranges when the box crosses the antimeridian
+            or_(*[shelters_table.c.longitude.between(low, high) for low, high in longitude_ranges(min_lon, max_lon)]),
+        ]
+
+        with engine.connect() as conn:
+            if is_sqlite:
+                # No trig functions in SQLite, so rank the boxed rows here
+                rows = conn.execute(select(*SHELTER_DISPLAY_COLUMNS).where(*in_box)).mappings().all()
+                shelters_list = []
+                for row in rows:
+                    distance = haversine_km(latitude, longitude, row["latitude"], row["longitude"])
+                    if distance <= radius_km:
+                        shelters_list.append({**row, "distance_km": distance})
+                shelters_list.sort(key=lambda shelter: shelter["distance_km"])
+                shelters_list = shelters_list[:limit]
+            else:
+                distance = distance_expr(shelters_table.c.latitude, shelters_table.c.longitude, latitude, longitude)
+                query = (
+                    select(*SHELTER_DISPLAY_COLUMNS, distance.label("distance_km"))
+                    .where(*in_box, distance <= radius_km)
+                    .order_by(distance)
+                    .limit(limit)
+                )
+                shelters_list = [dict(row) for row in conn.execute(query).mappings().all()]
+
+            for shelter in shelters_list:
+                shelter["distance_km"] = round(float(shelter["distance_km"]), 2)
+
+            return {
+                "shelters": shelters_list,
+                "count": len(shelters_list)
+            }
+    except Exception as e:
+        return {"error": f"Database error: {str(e)}"}
+
 def get_shelter_requests_service(shelter_id: str):
     """
     Fetch all requests for a shelter.
@@ -30,7 +98,11 @@ def get_shelter_requests_service(shelter_id: str):
     - Retrieves all requests linked to a given shelter
     - Excludes embedding data for efficiency
     - Returns list of requests and total count
+    - Served from the read cache when enabled
     """
+    return read_through("shelter_requests", shelter_id, lambda: _load_shelter_requests(shelter_id))
+
+def _load_shelter_requests(shelter_id: str):
     try:
         with engine.connect() as conn:
             # Select specific columns, excluding the embedding field
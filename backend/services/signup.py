@@ -2,6 +2,7 @@ import uuid
 from schemas.donor import Donor
 from schemas.shelter import Shelter
 from database import engine, donors_table, shelters_table
+from services.cache import invalidate
 
 def create_donor(donor: Donor):
     """
@@ -36,10 +37,13 @@ def create_donor(donor: Donor):
                 username=donor.username,
                 email=donor.email,
                 phone_number=donor.phone_number,
+                latitude=donor.latitude,
+                longitude=donor.longitude,
             ).returning(donors_table.c.id, donors_table.c.name, donors_table.c.username, donors_table.c.email, donors_table.c.phone_number)
 
             row = conn.execute(ins).mappings().one()
             trans.commit()
+            invalidate("users", donor.userID)
             print("Donor registered successfully")
             return {"message": "Donor registered successfully", "data": dict(row)}
     except Exception as e:
@@ -88,6 +92,8 @@ def create_shelter(shelter: Shelter):
 
             row = conn.execute(ins).mappings().one()
             trans.commit()
+            invalidate("users", shelter.userID)
+            invalidate("shelters")
             print("Shelter registered successfully")
             return {"message": "Shelter registered successfully", "data": dict(row)}
     except Exception as e:
@@ -0,0 +1,95 @@
+"""
+Single-flight coalescing for identical concurrent calls
+
+While a call for a key is running, other threads asking for the same key
+wait for it and get a copy of its result instead of running the query again.
+Nothing is kept after the call finishes; repeat calls later are not affected.
+Coalescing is per process; each API worker runs its own leader.
+"""
+import copy
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+_lock = threading.Lock()
+_in_flight: Dict[Hashable, "_Call"] = {}
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        # Snapshot handed to waiters; the leader's caller may modify its own result
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+def single_flight(name: str, key: Hashable, fn: Callable[[], Any]) -> Any:
+    """
+    Run fn, or wait for the running call with the same name and key.
+
+    Args:
+        name: Operation name, used to group the metrics
+        key: Everything the result depends on
+        fn: Computes the result
+
+    Returns:
+        fn's result; waiting callers get a deep copy so they can modify it.
+        If fn raises, every waiting caller gets the same exception.
+    """
+    with _lock:
+        stats = _stats.setdefault(name, {"calls": 0, "executions": 0, "coalesced": 0})
+        stats["calls"] += 1
+        call = _in_flight.get((name, key))
+        leader = call is None
+        if leader:
+            call = _Call()
+            _in_flight[(name, key)] = call
+            stats["executions"] += 1
+        else:
+            call.waiters += 1
+            stats["coalesced"] += 1
+
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.result)
+
+    try:
+        result = fn()
+    except BaseException as e:
+        call.error = e
+        with _lock:
+            del _in_flight[(name, key)]
+        call.done.set()
+        raise
+
+    with _lock:
+        # No one can join after this, so waiters is final
+        del _in_flight[(name, key)]
+        waiters = call.waiters
+    if waiters:
+        try:
+            call.result = copy.deepcopy(result)
+        except Exception as e:
+            call.error = e
+    call.done.set()
+    return result
+
+
+def get_single_flight_metrics() -> Dict[str, Any]:
+    """
+    Calls, executions and coalesced calls per operation since the process started.
+    """
+    with _lock:
+        operations = {name: dict(stats) for name, stats in _stats.items()}
+        in_flight = len(_in_flight)
+    for stats in operations.values():
+        stats["coalesced_ratio"] = round(stats["coalesced"] / stats["calls"], 4) if stats["calls"] else 0.0
+    return {"operations": operations, "in_flight": in_flight}
+
+
+def reset_single_flight_metrics() -> None:
+    with _lock:
+        _stats.clear()
@@ -1,4 +1,5 @@
 from database import engine, donors_table, shelters_table
+from services.cache import read_through
 
 def get_user_info_service(user_id: str):
     """
@@ -7,7 +8,11 @@ def get_user_info_service(user_id: str):
     - Checks donors table first
     - Falls back to shelters table if not found
     - Returns user type and full user record
+    - Served from the read cache when enabled
     """
+    return read_through("users", user_id, lambda: _load_user_info(user_id))
+
+def _load_user_info(user_id: str):
     try:
         with engine.connect() as conn:
             # First check donors table
@@ -1,14 +1,166 @@
 """
 Vector-based matching service using pgvector for semantic similarity between donations and requests
 """
-from sqlalchemy import select, text, insert
-from database import engine, donations_table, requests_table, donors_table, shelters_table, matches_table
+from sqlalchemy import select, text, insert, Text, tuple_, func
+from database import (
+    engine, donations_table, requests_table, donors_table, shelters_table, matches_table,
+    donation_embeddings_table, request_embeddings_table, EMBEDDING_SQL_TYPE, EMBEDDING_DIMENSIONS
+)
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timezone
+import os
 import uuid
 from services.email_utils import send_match_emails
+from services.embeddings import MODEL_VERSION
+from services.geo import within_radius_sql, distance_sql, radius_params
+from services.cache import SIMILARITY_CACHE_TTL_SECONDS, versioned_get, versioned_put
+from services.singleflight import single_flight
+from services.match import OPEN_ITEM_STATUSES, remaining_quantity
+from services.candidates import can_serve_from_candidates, get_candidate_matches_for_donor, get_candidate_matches_for_shelter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Two-stage find_all_matches: a Hamming-distance scan over binary-quantized
+# vectors picks candidates, then exact cosine similarity reranks them
+# (run migrations/008_binary_quantized_index.sql first)
+USE_BINARY_PREFILTER = os.getenv("USE_BINARY_PREFILTER", "false").lower() == "true"
+# The prefilter keeps PREFILTER_MATCHES_PER_REQUEST * multiplier donations per request
+PREFILTER_CANDIDATE_MULTIPLIER = max(1, int(os.getenv("PREFILTER_CANDIDATE_MULTIPLIER", "10")))
+# Most matches the two-stage path returns for a single request
+PREFILTER_MATCHES_PER_REQUEST = 20
+
+# Search only counterparts in the item's own category, served by the
+# per-category partial indexes (run migrations/009_category_scoped_search.sql first).
+# Tops up from the other categories when too few matches clear the threshold.
+USE_CATEGORY_SCOPED_SEARCH = os.getenv("USE_CATEGORY_SCOPED_SEARCH", "false").lower() == "true"
+
+
+def _similar_requests_query(category_filter: str = "", nearby: bool = False):
+    """
+    Nearest requests to a query vector, optionally within one category.
+
+    With nearby, only requests of shelters within :max_distance_km of the
+    origin are scored: the bounding box is served by shelters_lat_lon_idx and
+    the materialized CTE keeps the planner from scanning the whole HNSW index.
+    """
+    source = "request_embeddings re"
+    nearby_cte = ""
+    distance = "NULL"
+    if nearby:
+        nearby_cte = f"""
+        WITH nearby AS MATERIALIZED (
+            SELECT re.request_id, re.embedding, re.category, re.model_version,
+                {distance_sql("ns.latitude", "ns.longitude")} as distance_km
+            FROM shelters ns
+            JOIN requests nr ON nr.shelter_id = ns.uid
+            JOIN request_embeddings re ON re.request_id = nr.id
+            WHERE re.model_version = :model_version
+            AND re.is_open
+            AND {within_radius_sql("ns.latitude", "ns.longitude")}
+        )"""
+        source = "nearby re"
+        distance = "re.distance_km"
+
+    return text(f"""
+        {nearby_cte}
+        SELECT 
+            r.id,
+            r.shelter_id,
+            r.item_name,
+            coalesce(r.remaining_quantity, r.quantity) as quantity,
+            r.category,
+            r.created_at,
+            s.shelter_name,
+            s.email as shelter_email,
+            s.phone_number as shelter_phone,
+            {distance} as distance_km,
+            1 - (re.embedding <=> CAST(:embedding AS {EMBEDDING_SQL_TYPE})) as similarity
+        FROM {source}
+        JOIN requests r ON r.id = re.request_id
+        LEFT JOIN shelters s ON r.shelter_id = s.uid
+        WHERE re.model_version = :model_version
+        AND re.is_open
+        {category_filter}
+        AND 1 - (re.embedding <=> CAST(:embedding AS {EMBEDDING_SQL_TYPE})) > :threshold
+        ORDER BY re.embedding <=> CAST(:embedding AS {EMBEDDING_SQL_TYPE})
+        LIMIT :limit
+    """)
+
+
+def _similar_donations_query(category_filter: str = "", nearby: bool = False):
+    """
+    Nearest donations to a query vector, optionally within one category.
+
+    With nearby, only donations of donors within :max_distance_km of the
+    origin are scored (see _similar_requests_query).
+    """
+    source = "donation_embeddings de"
+    nearby_cte = ""
+    distance = "NULL"
+    if nearby:
+        nearby_cte = f"""
+        WITH nearby AS MATERIALIZED (
+            SELECT de.donation_id, de.embedding, de.category, de.model_version,
+                {distance_sql("nd.latitude", "nd.longitude")} as distance_km
+            FROM donors nd
+            JOIN donations dd ON dd.donor_id = nd.uid
+            JOIN donation_embeddings de ON de.donation_id = dd.id
+            WHERE de.model_version = :model_version
+            AND de.is_open
+            AND {within_radius_sql("nd.latitude", "nd.longitude")}
+        )"""
+        source = "nearby de"
+        distance = "de.distance_km"
+
+    return text(f"""
+        {nearby_cte}
+        SELECT 
+            d.id,
+            d.donor_id,
+            d.item_name,
+            coalesce(d.remaining_quantity, d.quantity) as quantity,
+            d.category,
+            d.created_at,
+            don.name as donor_name,
+            don.email as donor_email,
+            don.phone_number as donor_phone,
+            {distance} as distance_km,
+            1 - (de.embedding <=> CAST(:embedding AS {EMBEDDING_SQL_TYPE})) as similarity
+        FROM {source}
+        JOIN donations d ON d.id = de.donation_id
+        LEFT JOIN donors don ON d.donor_id = don.uid
+        WHERE de.model_version = :model_version
+        AND de.is_open
+        {category_filter}
+        AND 1 - (de.embedding <=> CAST(:embedding AS {EMBEDDING_SQL_TYPE})) > :threshold
+        ORDER BY de.embedding <=> CAST(:embedding AS {EMBEDDING_SQL_TYPE})
+        LIMIT :limit
+    """)
+
+
+def _corpus_version(conn) -> int:
+    """
+    Current corpus version, bumped by the triggers in migrations/012_corpus_version.sql
+    whenever anything a similarity result depends on changes.
+    """
+    return conn.execute(text("SELECT version FROM corpus_version")).scalar_one()
+
+
+def _has_location(user_row) -> bool:
+    """
+    True when a donor or shelter row has both coordinates.
+    """
+    return user_row is not None and user_row.latitude is not None and user_row.longitude is not None
+
 
-def find_similar_requests(donation_id: str, limit: int = 10, threshold: float = 0.7) -> List[Dict[str, Any]]:
+def find_similar_requests(
+    donation_id: str,
+    limit: int = 10,
+    threshold: float = 0.7,
+    category_scoped: Optional[bool] = None,
+    max_distance_km: Optional[float] = None
+) -> List[Dict[str, Any]]:
     """
     Find shelter requests that are similar to a specific donation using cosine similarity
 
@@ -16,6 +168,10 @@ def find_similar_requests(donation_id: str, limit: int = 10, threshold: float =
         donation_id: UUID of the donation to match
         limit: Maximum number of matches to return (default: 10)
         threshold: Minimum similarity score 0-1, where 1 is identical (default: 0.7)
+        category_scoped: Search the donation's category first and top up from the other
+            categories if fewer than limit requests match (default: USE_CATEGORY_SCOPED_SEARCH)
+        max_distance_km: Only match requests of shelters within this distance of the donor.
+            Nothing matches when the donor has no location
 
     Returns:
         List of matching requests with similarity scores, sorted by similarity (highest first)
@@ -24,11 +180,43 @@ def find_similar_requests(donation_id: str, limit: int = 10, threshold: float =
         matches = find_similar_requests("123e4567-e89b-12d3-a456-426614174000", limit=5, threshold=0.8)
         # Returns: [{"request_id": "...", "similarity_score": 0.95, ...}, ...]
     """
+    if category_scoped is None:
+        category_scoped = USE_CATEGORY_SCOPED_SEARCH
+    cache_key = ("requests", str(donation_id), limit, threshold, category_scoped, max_distance_km)
+    # Identical concurrent calls share one query
+    return single_flight(
+        "find_similar_requests",
+        cache_key,
+        lambda: _find_similar_requests(donation_id, limit, threshold, category_scoped, max_distance_km, cache_key)
+    )
+
+
+def _find_similar_requests(donation_id, limit, threshold, category_scoped, max_distance_km, cache_key):
     try:
         with engine.connect() as conn:
+            version = None
+            if SIMILARITY_CACHE_TTL_SECONDS > 0:
+                version = _corpus_version(conn)
+                cached = versioned_get(cache_key, version)
+                if cached is not None:
+                    return [dict(match) for match in cached]
+
             # Get the donation and its embedding
             donation = conn.execute(
-                select(donations_table).where(donations_table.c.id == donation_id)
+                select(
+                    donations_table.c.id,
+                    donations_table.c.donor_id,
+                    func.coalesce(donations_table.c.remaining_quantity, donations_table.c.quantity).label("quantity"),
+                    donations_table.c.category,
+                    # pgvector text form, passed straight back as the query vector
+                    donation_embeddings_table.c.embedding.cast(Text).label("embedding")
+                )
+                .select_from(donations_table.outerjoin(
+                    donation_embeddings_table,
+                    (donation_embeddings_table.c.donation_id == donations_table.c.id)
+                    & (donation_embeddings_table.c.model_version == MODEL_VERSION)
+                ))
+                .where(donations_table.c.id == donation_id)
             ).fetchone()
 
             if not donation:
@@ -44,41 +232,39 @@ def find_similar_requests(donation_id: str, limit: int = 10, threshold: float =
             # Find similar requests using cosine similarity
             # <=> is the cosine distance operator (0 = identical, 2 = opposite)
             # 1 - cosine_distance = cosine_similarity (0 = opposite, 1 = identical)
-            # Convert embedding to proper format for pgvector
             if donation.embedding is None:
                 print(f"Donation {donation_id} has no embedding")
                 return []
-            # Format embedding as comma-separated list for pgvector
-            embedding_list = donation.embedding.tolist() if hasattr(donation.embedding, 'tolist') else list(donation.embedding)
-            embedding_str = '[' + ','.join(map(str, embedding_list)) + ']'
-
-            query = text("""
-                SELECT 
-                    r.id,
-                    r.shelter_id,
-                    r.item_name,
-                    r.quantity,
-                    r.category,
-                    r.created_at,
-                    s.shelter_name,
-                    s.email as shelter_email,
-                    s.phone_number as shelter_phone,
-                    1 - (r.embedding <=> CAST(:embedding AS vector)) as similarity
-                FROM requests r
-                LEFT JOIN shelters s ON r.shelter_id = s.uid
-                WHERE 1 - (r.embedding <=> CAST(:embedding AS vector)) > :threshold
-                ORDER BY r.embedding <=> CAST(:embedding AS vector)
-                LIMIT :limit
-            """)
-
-            results = conn.execute(
-                query,
-                {
-                    "embedding": embedding_str,
-                    "threshold": threshold,
-                    "limit": limit
-                }
-            ).fetchall()
+            embedding_str = donation.embedding
+
+            params = {
+                "embedding": embedding_str,
+                "model_version": MODEL_VERSION,
+                "threshold": threshold,
+                "limit": limit
+            }
+            nearby = max_distance_km is not None
+            if nearby and not _has_location(donor):
+                # Nothing is known to be within range of a donor without a location
+                print(f"Donor has no location, no matches within {max_distance_km} km")
+                return []
+            if nearby:
+                params.update(radius_params(donor.latitude, donor.longitude, max_distance_km))
+            results = []
+            if category_scoped:
+                results = conn.execute(
+                    _similar_requests_query("AND re.category = :category", nearby),
+                    {**params, "category": donation.category}
+                ).fetchall()
+                if len(results) < limit:
+                    # Too few matches in the same category: top up from the others only
+                    results += conn.execute(
+                        _similar_requests_query("AND re.category IS DISTINCT FROM :category", nearby),
+                        {**params, "category": donation.category, "limit": limit - len(results)}
+                    ).fetchall()
+                    results.sort(key=lambda row: row.similarity, reverse=True)
+            else:
+                results = conn.execute(_similar_requests_query(nearby=nearby), params).fetchall()
 
             matches = []
             for row in results:
@@ -102,8 +288,12 @@ def find_similar_requests(donation_id: str, limit: int = 10, threshold: float =
                     "can_fulfill": "full" if donation.quantity >= row.quantity else "partial",
                     "donation_id": donation.id,
                 }
+                if row.distance_km is not None:
+                    match["distance_km"] = round(float(row.distance_km), 2)
                 matches.append(match)
 
+            if version is not None:
+                versioned_put(cache_key, version, [dict(match) for match in matches])
             return matches
 
     except Exception as e:
@@ -111,7 +301,13 @@ def find_similar_requests(donation_id: str, limit: int = 10, threshold: float =
         return []
 
 
-def find_similar_donations(request_id: str, limit: int = 10, threshold: float = 0.7) -> List[Dict[str, Any]]:
+def find_similar_donations(
+    request_id: str,
+    limit: int = 10,
+    threshold: float = 0.7,
+    category_scoped: Optional[bool] = None,
+    max_distance_km: Optional[float] = None
+) -> List[Dict[str, Any]]:
     """
     Find donations that match a specific shelter request using cosine similarity
 
@@ -119,6 +315,10 @@ def find_similar_donations(request_id: str, limit: int = 10, threshold: float =
         request_id: UUID of the request to match
         limit: Maximum number of matches to return (default: 10)
         threshold: Minimum similarity score 0-1, where 1 is identical (default: 0.7)
+        category_scoped: Search the request's category first and top up from the other
+            categories if fewer than limit donations match (default: USE_CATEGORY_SCOPED_SEARCH)
+        max_distance_km: Only match donations of donors within this distance of the shelter.
+            Nothing matches when the shelter has no location
 
     Returns:
         List of matching donations with similarity scores, sorted by similarity (highest first)
@@ -127,11 +327,43 @@ def find_similar_donations(request_id: str, limit: int = 10, threshold: float =
         matches = find_similar_donations("123e4567-e89b-12d3-a456-426614174000", limit=5, threshold=0.8)
         # Returns: [{"donation_id": "...", "similarity_score": 0.92, ...}, ...]
     """
+    if category_scoped is None:
+        category_scoped = USE_CATEGORY_SCOPED_SEARCH
+    cache_key = ("donations", str(request_id), limit, threshold, category_scoped, max_distance_km)
+    # Identical concurrent calls share one query
+    return single_flight(
+        "find_similar_donations",
+        cache_key,
+        lambda: _find_similar_donations(request_id, limit, threshold, category_scoped, max_distance_km, cache_key)
+    )
+
+
+def _find_similar_donations(request_id, limit, threshold, category_scoped, max_distance_km, cache_key):
     try:
         with engine.connect() as conn:
+            version = None
+            if SIMILARITY_CACHE_TTL_SECONDS > 0:
+                version = _corpus_version(conn)
+                cached = versioned_get(cache_key, version)
+                if cached is not None:
+                    return [dict(match) for match in cached]
+
             # Get the request and its embedding
             request = conn.execute(
-                select(requests_table).where(requests_table.c.id == request_id)
+                select(
+                    requests_table.c.id,
+                    requests_table.c.shelter_id,
+                    func.coalesce(requests_table.c.remaining_quantity, requests_table.c.quantity).label("quantity"),
+                    requests_table.c.category,
+                    # pgvector text form, passed straight back as the query vector
+                    request_embeddings_table.c.embedding.cast(Text).label("embedding")
+                )
+                .select_from(requests_table.outerjoin(
+                    request_embeddings_table,
+                    (request_embeddings_table.c.request_id == requests_table.c.id)
+                    & (request_embeddings_table.c.model_version == MODEL_VERSION)
+                ))
+                .where(requests_table.c.id == request_id)
             ).fetchone()
 
             if not request:
@@ -145,41 +377,39 @@ def find_similar_donations(request_id: str, limit: int = 10, threshold: float =
             shelter_name = shelter.shelter_name if shelter else "Unknown"
 
             # Find similar donations using cosine similarity
-            # Convert embedding to proper format for pgvector
             if request.embedding is None:
                 print(f"Request {request_id} has no embedding")
                 return []
-            # Format embedding as comma-separated list for pgvector
-            embedding_list = request.embedding.tolist() if hasattr(request.embedding, 'tolist') else list(request.embedding)
-            embedding_str = '[' + ','.join(map(str, embedding_list)) + ']'
-
-            query = text("""
-                SELECT 
-                    d.id,
-                    d.donor_id,
-                    d.item_name,
-                    d.quantity,
-                    d.category,
-                    d.created_at,
-                    don.name as donor_name,
-                    don.email as donor_email,
-                    don.phone_number as donor_phone,
-                    1 - (d.embedding <=> CAST(:embedding AS vector)) as similarity
-                FROM donations d
-                LEFT JOIN donors don ON d.donor_id = don.uid
-                WHERE 1 - (d.embedding <=> CAST(:embedding AS vector)) > :threshold
-                ORDER BY d.embedding <=> CAST(:embedding AS vector)
-                LIMIT :limit
-            """)
-
-            results = conn.execute(
-                query,
-                {
-                    "embedding": embedding_str,
-                    "threshold": threshold,
-                    "limit": limit
-                }
-            ).fetchall()
+            embedding_str = request.embedding
+
+            params = {
+                "embedding": embedding_str,
+                "model_version": MODEL_VERSION,
+                "threshold": threshold,
+                "limit": limit
+            }
+            nearby = max_distance_km is not None
+            if nearby and not _has_location(shelter):
+                # Nothing is known to be within range of a shelter without a location
+                print(f"Shelter has no location, no matches within {max_distance_km} km")
+                return []
+            if nearby:
+                params.update(radius_params(shelter.latitude, shelter.longitude, max_distance_km))
+            results = []
+            if category_scoped:
+                results = conn.execute(
+                    _similar_donations_query("AND de.category = :category", nearby),
+                    {**params, "category": request.category}
+                ).fetchall()
+                if len(results) < limit:
+                    # Too few matches in the same category: top up from the others only
+                    results += conn.execute(
+                        _similar_donations_query("AND de.category IS DISTINCT FROM :category", nearby),
+                        {**params, "category": request.category, "limit": limit - len(results)}
+                    ).fetchall()
+                    results.sort(key=lambda row: row.similarity, reverse=True)
+            else:
+                results = conn.execute(_similar_donations_query(nearby=nearby), params).fetchall()
 
             matches = []
             for row in results:
@@ -199,10 +429,14 @@ def find_similar_donations(request_id: str, limit: int = 10, threshold: float =
                     "donor_has": row.quantity,
                     "shelter_needs": request.quantity,
                     "can_fulfill": "full" if row.quantity >= request.quantity else "partial",
-                    "request_id": row.request_id,
+                    "request_id": request.id,
                 }
+                if row.distance_km is not None:
+                    match["distance_km"] = round(float(row.distance_km), 2)
                 matches.append(match)
 
+            if version is not None:
+                versioned_put(cache_key, version, [dict(match) for match in matches])
             return matches
 
     except Exception as e:
@@ -210,13 +444,151 @@ def find_similar_donations(request_id: str, limit: int = 10, threshold: float =
         return []
 
 
-def find_all_matches(threshold: float = 0.7, min_quantity_match: bool = False) -> List[Dict[str, Any]]:
+def _exact_all_matches_query(quantity_filter: str, category_scoped: bool = False):
+    """
+    Compare every donation with every request.
+
+    With category_scoped, only same-category pairs are compared, except for
+    requests that have no same-category match, which are compared with every
+    donation.
+    """
+    if category_scoped:
+        pairs = """
+            WITH scoped AS (
+                SELECT de.donation_id, re.request_id, 1 - (de.embedding <=> re.embedding) as similarity
+                FROM request_embeddings re
+                JOIN donation_embeddings de ON de.category = re.category
+                WHERE de.model_version = :model_version
+                AND re.model_version = :model_version
+                AND de.is_open AND re.is_open
+                AND 1 - (de.embedding <=> re.embedding) > :threshold
+            ),
+            widened AS (
+                SELECT de.donation_id, re.request_id, 1 - (de.embedding <=> re.embedding) as similarity
+                FROM request_embeddings re
+                CROSS JOIN donation_embeddings de
+                WHERE de.model_version = :model_version
+                AND re.model_version = :model_version
+                AND de.is_open AND re.is_open
+                AND de.category IS DISTINCT FROM re.category
+                AND NOT EXISTS (SELECT 1 FROM scoped WHERE scoped.request_id = re.request_id)
+                AND 1 - (de.embedding <=> re.embedding) > :threshold
+            ),
+            pairs AS (
+                SELECT * FROM scoped
+                UNION ALL
+                SELECT * FROM widened
+            )
+        """
+    else:
+        pairs = """
+            WITH pairs AS (
+                SELECT de.donation_id, re.request_id, 1 - (de.embedding <=> re.embedding) as similarity
+                FROM donation_embeddings de
+                CROSS JOIN request_embeddings re
+                WHERE de.model_version = :model_version
+                AND re.model_version = :model_version
+                AND de.is_open AND re.is_open
+                AND 1 - (de.embedding <=> re.embedding) > :threshold
+            )
+        """
+
+    return text(f"""
+        {pairs}
+        SELECT 
+            d.id as donation_id,
+            d.donor_id,
+            don.name as donor_name,
+            d.item_name as donation_item,
+            coalesce(d.remaining_quantity, d.quantity) as donation_quantity,
+            d.category as donation_category,
+            r.id as request_id,
+            r.shelter_id,
+            s.shelter_name,
+            r.item_name as request_item,
+            coalesce(r.remaining_quantity, r.quantity) as request_quantity,
+            r.category as request_category,
+            p.similarity
+        FROM pairs p
+        JOIN donations d ON d.id = p.donation_id
+        JOIN requests r ON r.id = p.request_id
+        LEFT JOIN donors don ON d.donor_id = don.uid
+        LEFT JOIN shelters s ON r.shelter_id = s.uid
+        WHERE 1 = 1
+        {quantity_filter}
+        ORDER BY similarity DESC
+    """)
+
+
+def _prefiltered_all_matches_query(quantity_filter: str):
+    """
+    For each request, take the nearest donations by Hamming distance between
+    binary-quantized vectors (served by the bit index), then rerank only those
+    candidates by exact cosine similarity.
+    """
+    bits = f"bit({EMBEDDING_DIMENSIONS})"
+    return text(f"""
+        SELECT 
+            d.id as donation_id,
+            d.donor_id,
+            don.name as donor_name,
+            d.item_name as donation_item,
+            coalesce(d.remaining_quantity, d.quantity) as donation_quantity,
+            d.category as donation_category,
+            r.id as request_id,
+            r.shelter_id,
+            s.shelter_name,
+            r.item_name as request_item,
+            coalesce(r.remaining_quantity, r.quantity) as request_quantity,
+            r.category as request_category,
+            c.similarity
+        FROM request_embeddings re
+        JOIN requests r ON r.id = re.request_id
+        CROSS JOIN LATERAL (
+            SELECT cand.donation_id, 1 - (cand.embedding <=> re.embedding) as similarity
+            FROM (
+                SELECT de.donation_id, de.embedding
+                FROM donation_embeddings de
+                WHERE de.model_version = :model_version
+                AND de.is_open
+                ORDER BY binary_quantize(de.embedding)::{bits} <~> binary_quantize(re.embedding)::{bits}
+                LIMIT :candidates
+            ) cand
+            WHERE 1 - (cand.embedding <=> re.embedding) > :threshold
+            ORDER BY cand.embedding <=> re.embedding
+            LIMIT :per_request
+        ) c
+        JOIN donations d ON d.id = c.donation_id
+        LEFT JOIN donors don ON d.donor_id = don.uid
+        LEFT JOIN shelters s ON r.shelter_id = s.uid
+        WHERE re.model_version = :model_version
+        AND re.is_open
+        {quantity_filter}
+        ORDER BY similarity DESC
+    """)
+
+
+def find_all_matches(
+    threshold: float = 0.7,
+    min_quantity_match: bool = False,
+    use_prefilter: Optional[bool] = None,
+    candidate_multiplier: Optional[int] = None,
+    category_scoped: Optional[bool] = None
+) -> List[Dict[str, Any]]:
     """
     Find all potential matches between donations and requests in the system
 
     Args:
         threshold: Minimum similarity score 0-1 (default: 0.7)
-        min_quantity_match: If True, only return matches where donation quantity >= request quantity
+        min_quantity_match: If True, only return matches where the donation's remaining quantity
+            covers the request's
+        use_prefilter: Use the binary-quantized two-stage search (default: USE_BINARY_PREFILTER).
+            It returns at most PREFILTER_MATCHES_PER_REQUEST matches per request and may miss
+            pairs the exact search finds; see benchmarks/bench_binary_prefilter.py for recall
+        candidate_multiplier: Prefilter candidates per kept match (default: PREFILTER_CANDIDATE_MULTIPLIER)
+        category_scoped: Only pair items of the same category, widening to every category for
+            requests with no same-category match (default: USE_CATEGORY_SCOPED_SEARCH).
+            Ignored by the prefilter, which already avoids the full cross join
 
     Returns:
         List of all matches with both donation and request details
@@ -224,37 +596,27 @@ def find_all_matches(threshold: float = 0.7, min_quantity_match: bool = False) -
     Example:
         all_matches = find_all_matches(threshold=0.8, min_quantity_match=True)
     """
+    if use_prefilter is None:
+        use_prefilter = USE_BINARY_PREFILTER
+    multiplier = candidate_multiplier or PREFILTER_CANDIDATE_MULTIPLIER
+    if category_scoped is None:
+        category_scoped = USE_CATEGORY_SCOPED_SEARCH
+
     try:
         with engine.connect() as conn:
             quantity_filter = ""
             if min_quantity_match:
-                quantity_filter = "AND d.quantity >= r.quantity"
-
-            query = text(f"""
-                SELECT 
-                    d.id as donation_id,
-                    d.donor_id,
-                    don.name as donor_name,
-                    d.item_name as donation_item,
-                    d.quantity as donation_quantity,
-                    d.category as donation_category,
-                    r.id as request_id,
-                    r.shelter_id,
-                    s.shelter_name,
-                    r.item_name as request_item,
-                    r.quantity as request_quantity,
-                    r.category as request_category,
-                    1 - (d.embedding <=> r.embedding) as similarity
-                FROM donations d
-                CROSS JOIN requests r
-                LEFT JOIN donors don ON d.donor_id = don.uid
-                LEFT JOIN shelters s ON r.shelter_id = s.uid
-                WHERE 1 - (d.embedding <=> r.embedding) > :threshold
-                {quantity_filter}
-                ORDER BY similarity DESC
-            """)
-
-            results = conn.execute(query, {"threshold": threshold}).fetchall()
+                quantity_filter = "AND coalesce(d.remaining_quantity, d.quantity) >= coalesce(r.remaining_quantity, r.quantity)"
+
+            params = {"threshold": threshold, "model_version": MODEL_VERSION}
+            if use_prefilter:
+                query = _prefiltered_all_matches_query(quantity_filter)
+                params["per_request"] = PREFILTER_MATCHES_PER_REQUEST
+                params["candidates"] = PREFILTER_MATCHES_PER_REQUEST * multiplier
+            else:
+                query = _exact_all_matches_query(quantity_filter, category_scoped)
+
+            results = conn.execute(query, params).fetchall()
 
             matches = []
             for row in results:
@@ -311,7 +673,12 @@ def find_best_match_for_request(request_id: str) -> Optional[Dict[str, Any]]:
     return matches[0] if matches else None
 
 
-def get_matches_for_donor(donor_id: str, limit: int = 10, threshold: float = 0.7) -> List[Dict[str, Any]]:
+def get_matches_for_donor(
+    donor_id: str,
+    limit: int = 10,
+    threshold: float = 0.7,
+    max_distance_km: Optional[float] = None
+) -> List[Dict[str, Any]]:
     """
     Find all requests that match any donations from a specific donor
 
@@ -319,23 +686,33 @@ def get_matches_for_donor(donor_id: str, limit: int = 10, threshold: float = 0.7
         donor_id: Firebase UID of the donor
         limit: Maximum matches per donation
         threshold: Minimum similarity score
+        max_distance_km: Only match shelters within this distance of the donor
 
     Returns:
         List of all matches for this donor's donations
     """
     try:
+        # Stored candidates are not distance-aware
+        if max_distance_km is None and can_serve_from_candidates(limit, threshold):
+            return get_candidate_matches_for_donor(donor_id, limit=limit, threshold=threshold)
+
         with engine.connect() as conn:
-            # Get all donations from this donor
+            # Get the donor's donations that are still open
             donations = conn.execute(
-                select(donations_table).where(donations_table.c.donor_id == donor_id)
+                select(donations_table).where(
+                    donations_table.c.donor_id == donor_id,
+                    donations_table.c.status.in_(OPEN_ITEM_STATUSES)
+                )
             ).fetchall()
 
             all_matches = []
             for donation in donations:
-                matches = find_similar_requests(str(donation.id), limit=limit, threshold=threshold)
+                matches = find_similar_requests(
+                    str(donation.id), limit=limit, threshold=threshold, max_distance_km=max_distance_km
+                )
                 for match in matches:
                     match["donation_item"] = donation.item_name
-                    match["donation_quantity"] = donation.quantity
+                    match["donation_quantity"] = remaining_quantity(donation)
                     match["donation_category"] = donation.category
                 all_matches.extend(matches)
 
@@ -348,7 +725,12 @@ def get_matches_for_donor(donor_id: str, limit: int = 10, threshold: float = 0.7
         return []
 
 
-def get_matches_for_shelter(shelter_id: str, limit: int = 10, threshold: float = 0.7) -> List[Dict[str, Any]]:
+def get_matches_for_shelter(
+    shelter_id: str,
+    limit: int = 10,
+    threshold: float = 0.7,
+    max_distance_km: Optional[float] = None
+) -> List[Dict[str, Any]]:
     """
     Find all donations that match any requests from a specific shelter
 
@@ -356,23 +738,33 @@ def get_matches_for_shelter(shelter_id: str, limit: int = 10, threshold: float =
         shelter_id: Firebase UID of the shelter
         limit: Maximum matches per request
         threshold: Minimum similarity score
+        max_distance_km: Only match donors within this distance of the shelter
 
     Returns:
         List of all matches for this shelter's requests
     """
     try:
+        # Stored candidates are not distance-aware
+        if max_distance_km is None and can_serve_from_candidates(limit, threshold):
+            return get_candidate_matches_for_shelter(shelter_id, limit=limit, threshold=threshold)
+
         with engine.connect() as conn:
-            # Get all requests from this shelter
+            # Get the shelter's requests that are still open
             requests = conn.execute(
-                select(requests_table).where(requests_table.c.shelter_id == shelter_id)
+                select(requests_table).where(
+                    requests_table.c.shelter_id == shelter_id,
+                    requests_table.c.status.in_(OPEN_ITEM_STATUSES)
+                )
             ).fetchall()
 
             all_matches = []
             for request in requests:
-                matches = find_similar_donations(str(request.id), limit=limit, threshold=threshold)
+                matches = find_similar_donations(
+                    str(request.id), limit=limit, threshold=threshold, max_distance_km=max_distance_km
+                )
                 for match in matches:
                     match["request_item"] = request.item_name
-                    match["request_quantity"] = request.quantity
+                    match["request_quantity"] = remaining_quantity(request)
                     match["request_category"] = request.category
                 all_matches.extend(matches)
 
@@ -517,6 +909,7 @@ def save_vector_matches(
     matches: List[Dict[str, Any]],
     save_to_file: bool = True,
     save_to_db: bool = True,
+    skip_existing: bool = False,
 ) -> Dict[str, Any]:
     """
     Save vector-based matches:
@@ -527,6 +920,8 @@ def save_vector_matches(
         matches: List of matches from find_similar_requests/donations/find_all_matches
         save_to_file: Whether to save to mock_matches.json via save_matches
         save_to_db: Whether to insert into the real `matches` SQL table
+        skip_existing: Leave out (and don't email) pairs that already have a match,
+            so a retried job saves each pair once
 
     Returns:
         Summary of saved matches
@@ -540,7 +935,18 @@ def save_vector_matches(
         # We'll open a transaction just once if we are saving to DB
         # Use begin() instead of connect() to auto-commit the transaction
         with engine.begin() as conn:
+            existing = set()
+            if skip_existing:
+                pairs = {(str(m.get("donation_id", "")), str(m.get("request_id", ""))) for m in matches}
+                existing = set(conn.execute(
+                    select(matches_table.c.donation_id, matches_table.c.request_id)
+                    .where(tuple_(matches_table.c.donation_id, matches_table.c.request_id).in_(list(pairs)))
+                ).tuples().all())
+
             for raw_match in matches:
+                if (str(raw_match.get("donation_id", "")), str(raw_match.get("request_id", ""))) in existing:
+                    continue
+
                 # Generate an ID and timestamp once so JSON + DB stay in sync
                 match_id = str(uuid.uuid4())
                 now = datetime.now(timezone.utc)
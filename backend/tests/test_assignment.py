@@ -0,0 +1,129 @@
+import itertools
+import random
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from main import app
+from services.assignment import assign_greedy, run_batch_assignment
+
+client = TestClient(app)
+
+
+def test_assign_greedy_respects_capacities():
+    donations = {"D1": 10, "D2": 5}
+    requests = {"R1": 8, "R2": 6}
+    edges = [("D1", "R1", 0.95), ("D1", "R2", 0.9), ("D2", "R2", 0.85), ("D2", "R1", 0.8)]
+
+    assignments = assign_greedy(edges, donations, requests)
+
+    assert assignments == [("D1", "R1", 8, 0.95), ("D1", "R2", 2, 0.9), ("D2", "R2", 4, 0.85)]
+    assert donations == {"D1": 0, "D2": 1}
+    assert requests == {"R1": 0, "R2": 0}
+
+
+def test_assign_greedy_skips_unknown_and_exhausted_items():
+    assert assign_greedy([("D1", "R9", 0.9), ("D9", "R1", 0.9)], {"D1": 3}, {"R1": 3}) == []
+
+
+def _best_score(edges, donations, requests):
+    """Exhaustive optimum of sum(similarity * quantity) for tiny instances."""
+    best = 0.0
+    ranges = [range(min(donations[d], requests[r]) + 1) for d, r, _ in edges]
+    for quantities in itertools.product(*ranges):
+        given, taken = dict.fromkeys(donations, 0), dict.fromkeys(requests, 0)
+        for (d, r, _), q in zip(edges, quantities):
+            given[d] += q
+            taken[r] += q
+        if all(given[d] <= donations[d] for d in donations) and all(taken[r] <= requests[r] for r in requests):
+            best = max(best, sum(s * q for (_, _, s), q in zip(edges, quantities)))
+    return best
+
+
+def test_assign_greedy_is_within_half_of_optimum():
+    rng = random.Random(7)
+    for _ in range(30):
+        donations = {f"D{i}": rng.randint(1, 3) for i in range(3)}
+        requests = {f"R{i}": rng.randint(1, 3) for i in range(2)}
+        edges = sorted(
+            [(d, r, round(rng.uniform(0.7, 1.0), 3)) for d in donations for r in requests if rng.random() < 0.8],
+            key=lambda edge: edge[2],
+            reverse=True
+        )
+        greedy = sum(s * q for _, _, q, s in assign_greedy(edges, dict(donations), dict(requests)))
+        assert greedy >= _best_score(edges, donations, requests) / 2 - 1e-9
+
+
+@patch("services.assignment._save_assignments", return_value=1)
+@patch("services.assignment._describe")
+@patch("services.assignment._candidate_edges")
+@patch("services.assignment.available_quantities")
+@patch("services.assignment.engine")
+def test_run_batch_assignment(mock_engine, mock_capacities, mock_edges, mock_describe, mock_save):
+    mock_capacities.side_effect = [{"D1": 5}, {"R1": 3, "R2": 4}]
+    mock_edges.return_value = iter([("D1", "R1", 0.9), ("D1", "R2", 0.8)])
+    mock_describe.side_effect = lambda conn, assignments: [
+        {"donation_id": d, "request_id": r, "quantity": q, "similarity_score": s} for d, r, q, s in assignments
+    ]
+
+    result = run_batch_assignment(threshold=0.75, k=5, save=True)
+
+    assert result["candidate_edges"] == 2
+    assert [(m["request_id"], m["quantity"]) for m in result["matches"]] == [("R1", 3), ("R2", 2)]
+    assert result["assigned_quantity"] == 5
+    assert result["total_score"] == 4.3
+    assert result["saved"] == 1
+    mock_edges.assert_called_once_with(mock_engine.connect.return_value.__enter__.return_value, 0.75, 5)
+    mock_save.assert_called_once_with(result["matches"])
+    # The advisory lock was taken and released
+    statements = [str(c.args[0]) for c in mock_engine.connect.return_value.__enter__.return_value.execute.call_args_list]
+    assert "pg_try_advisory_lock" in statements[0] and "pg_advisory_unlock" in statements[-1]
+
+
+@patch("services.assignment.available_quantities")
+@patch("services.assignment.engine")
+def test_run_batch_assignment_skips_while_another_run_saves(mock_engine, mock_capacities):
+    mock_engine.connect.return_value.__enter__.return_value.execute.return_value.scalar.return_value = False
+
+    result = run_batch_assignment(save=True)
+
+    assert "error" in result
+    mock_capacities.assert_not_called()
+
+
+@patch("services.jobs.enqueue_job")
+@patch("services.assignment.add_match_ids")
+@patch("services.assignment.engine")
+def test_save_assignments_inserts_in_batches_and_queues_notifications(mock_engine, mock_add_ids, mock_enqueue):
+    from services.assignment import _save_assignments
+
+    matches = [
+        {"donation_id": f"D{i}", "request_id": "R1", "donor_id": "DONOR1", "donor_name": "Donor",
+         "shelter_id": "S1", "shelter_name": "Shelter", "item_name": "Rice", "category": "Food", "quantity": 1}
+        for i in range(3)
+    ]
+
+    with patch("services.assignment.ASSIGNMENT_SAVE_BATCH_SIZE", 2):
+        assert _save_assignments(matches) == 3
+
+    mock_conn = mock_engine.begin.return_value.__enter__.return_value
+    # One multi-row INSERT per batch
+    inserted = [c.args[1] for c in mock_conn.execute.call_args_list]
+    assert [len(rows) for rows in inserted] == [2, 1]
+    assert [row["donation_id"] for rows in inserted for row in rows] == ["D0", "D1", "D2"]
+    assert mock_enqueue.call_count == 3
+    assert all(c.args[0] == "notify" and c.kwargs == {"conn": mock_conn} for c in mock_enqueue.call_args_list)
+    # The first batch's two matches are added to the donor's match_ids in one call
+    assert list(mock_add_ids.call_args_list[0].args[2].values()) == [[rows["id"] for rows in inserted[0]]]
+
+
+@patch("routers.vector_match.run_batch_assignment")
+def test_assignments_endpoint(mock_assign):
+    mock_assign.return_value = {"candidate_edges": 0, "total_assignments": 0, "matches": []}
+
+    response = client.get("/vector-match/assignments?threshold=0.8&k=3")
+
+    assert response.status_code == 200
+    mock_assign.assert_called_once_with(threshold=0.8, k=3, save=False)
+    assert client.get("/vector-match/assignments?k=0").status_code == 422
+
+    mock_assign.return_value = {"error": "Another batch assignment is already saving matches"}
+    assert client.get("/vector-match/assignments?save=true").status_code == 409
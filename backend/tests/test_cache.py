@@ -0,0 +1,116 @@
+from unittest.mock import patch, MagicMock
+import pytest
+from services import cache
+
+
+@pytest.fixture(autouse=True)
+def enabled_cache():
+    cache.clear()
+    with patch("services.cache.READ_CACHE_TTL_SECONDS", 30), patch("services.cache.is_sqlite", True):
+        yield
+    cache.clear()
+
+
+def test_read_through_caches_until_invalidated():
+    """Test a hit skips the loader and invalidation forces a reload"""
+    loader = MagicMock(side_effect=[{"count": 1}, {"count": 2}])
+
+    assert cache.read_through("users", "U1", loader) == {"count": 1}
+    assert cache.read_through("users", "U1", loader) == {"count": 1}
+    assert loader.call_count == 1
+
+    cache.invalidate("users", "U1")
+    assert cache.read_through("users", "U1", loader) == {"count": 2}
+
+
+def test_read_through_expires_after_ttl():
+    loader = MagicMock(side_effect=[{"count": 1}, {"count": 2}])
+
+    with patch("services.cache.time.monotonic", return_value=100.0):
+        cache.read_through("shelters", "all", loader)
+    with patch("services.cache.time.monotonic", return_value=131.0):
+        assert cache.read_through("shelters", "all", loader) == {"count": 2}
+
+
+def test_read_through_does_not_cache_errors():
+    loader = MagicMock(return_value={"error": "User not found"})
+
+    cache.read_through("users", "U1", loader)
+    cache.read_through("users", "U1", loader)
+
+    assert loader.call_count == 2
+
+
+def test_invalidation_during_load_is_not_overwritten():
+    """Test a value loaded before a concurrent invalidation is not stored"""
+    def loader():
+        cache.invalidate("users", "U1")
+        return {"name": "old"}
+
+    cache.read_through("users", "U1", loader)
+    fresh = MagicMock(return_value={"name": "new"})
+
+    assert cache.read_through("users", "U1", fresh) == {"name": "new"}
+
+
+def test_notification_invalidates_namespace():
+    """Test a trigger payload with no key drops the whole namespace"""
+    cache.read_through("shelter_requests", "S1", lambda: {"count": 1})
+    cache.read_through("shelter_requests", "S2", lambda: {"count": 1})
+
+    cache.handle_notification("shelter_requests:")
+
+    loader = MagicMock(return_value={"count": 2})
+    cache.read_through("shelter_requests", "S2", loader)
+    loader.assert_called_once()
+
+
+def test_cache_bypassed_until_listener_connects():
+    """Test Postgres reads go to the database while invalidations could be missed"""
+    loader = MagicMock(return_value={"count": 1})
+
+    with patch("services.cache.is_sqlite", False), patch("services.cache.start_listener"):
+        cache.read_through("users", "U1", loader)
+        cache.read_through("users", "U1", loader)
+
+    assert loader.call_count == 2
+
+
+@patch("services.user.engine")
+def test_get_user_info_service_uses_cache(mock_engine):
+    from services.user import get_user_info_service
+
+    mock_conn = mock_engine.connect.return_value.__enter__.return_value
+    mock_conn.execute.return_value.mappings.return_value.first.return_value = {"uid": "U1", "name": "Donor"}
+
+    get_user_info_service("U1")
+    result = get_user_info_service("U1")
+
+    assert result["userType"] == "donor"
+    assert mock_engine.connect.call_count == 1
+
+
+@patch("services.cache.SIMILARITY_CACHE_TTL_SECONDS", 60)
+def test_versioned_cache_never_serves_older_versions():
+    """Test a newer version drops older entries and a stale writer cannot store"""
+    assert cache.versioned_get("k", 1) is None
+    cache.versioned_put("k", 1, ["v1"])
+    assert cache.versioned_get("k", 1) == ["v1"]
+
+    assert cache.versioned_get("k", 2) is None
+    cache.versioned_put("k", 1, ["stale"])
+    assert cache.versioned_get("k", 2) is None
+    assert cache.versioned_get("k", 1) is None
+
+
+@patch("services.cache.SIMILARITY_CACHE_MAX_ENTRIES", 2)
+@patch("services.cache.SIMILARITY_CACHE_TTL_SECONDS", 60)
+def test_versioned_cache_evicts_least_recently_used():
+    cache.versioned_get("a", 100)
+    cache.versioned_put("a", 100, 1)
+    cache.versioned_put("b", 100, 2)
+    cache.versioned_get("a", 100)
+    cache.versioned_put("c", 100, 3)
+
+    assert cache.versioned_get("a", 100) == 1
+    assert cache.versioned_get("b", 100) is None
@@ -0,0 +1,123 @@
+from unittest.mock import patch, MagicMock, call
+
+from services import candidates
+
+
+@patch("services.candidates.USE_MATCH_CANDIDATES", False)
+@patch("services.candidates.engine")
+def test_refresh_candidates_disabled(mock_engine):
+    """Test that nothing is written when the feature is off"""
+    assert candidates.refresh_candidates("donation", "D1") is False
+    mock_engine.begin.assert_not_called()
+
+
+@patch("services.candidates.USE_MATCH_CANDIDATES", True)
+@patch("services.candidates._insert_top_candidates")
+@patch("services.candidates._remove_candidates")
+@patch("services.candidates.engine")
+def test_refresh_candidates_updates_both_directions(mock_engine, mock_remove, mock_insert):
+    """Test that an edit recomputes the item and refills counterparts that lost it"""
+    mock_conn = MagicMock()
+    mock_engine.begin.return_value.__enter__.return_value = mock_conn
+    mock_remove.return_value = ["R1", "R2"]
+
+    assert candidates.refresh_candidates("donation", "D1") is True
+
+    mock_remove.assert_called_once_with(mock_conn, "donation", "D1")
+    assert mock_insert.call_args_list == [
+        call(mock_conn, "donation", "D1", include_reverse=True),
+        call(mock_conn, "request", "R1", include_reverse=False),
+        call(mock_conn, "request", "R2", include_reverse=False),
+    ]
+
+
+@patch("services.candidates.USE_MATCH_CANDIDATES", True)
+@patch("services.candidates._insert_top_candidates")
+@patch("services.candidates._remove_candidates")
+@patch("services.candidates.engine")
+def test_remove_candidates_refills_counterparts(mock_engine, mock_remove, mock_insert):
+    """Test that deleting a request refills the donations that listed it"""
+    mock_conn = MagicMock()
+    mock_engine.begin.return_value.__enter__.return_value = mock_conn
+    mock_remove.return_value = ["D1"]
+
+    assert candidates.remove_candidates("request", "R1") is True
+
+    mock_insert.assert_called_once_with(mock_conn, "donation", "D1", include_reverse=False)
+
+
+@patch("services.candidates.USE_MATCH_CANDIDATES", True)
+def test_can_serve_from_candidates():
+    """Test that only queries covered by the stored top-k are served from it"""
+    assert candidates.can_serve_from_candidates(10, 0.7) is True
+    assert candidates.can_serve_from_candidates(candidates.MATCH_CANDIDATES_K + 1, 0.7) is False
+    assert candidates.can_serve_from_candidates(10, candidates.CANDIDATE_MIN_SIMILARITY - 0.1) is False
+
+
+@patch("services.vector_match.can_serve_from_candidates", return_value=True)
+@patch("services.vector_match.get_candidate_matches_for_donor")
+@patch("services.vector_match.find_similar_requests")
+def test_get_matches_for_donor_reads_candidates(mock_find, mock_candidates, mock_can_serve):
+    """Test that donor matches come from the candidate table when possible"""
+    from services.vector_match import get_matches_for_donor
+
+    mock_candidates.return_value = [{"donation_id": "D1", "request_id": "R1", "similarity_score": 0.9}]
+
+    result = get_matches_for_donor("DONOR1", limit=5, threshold=0.8)
+
+    assert result == mock_candidates.return_value
+    mock_candidates.assert_called_once_with("DONOR1", limit=5, threshold=0.8)
+    mock_find.assert_not_called()
+
+
+def test_insert_top_candidates_binds_the_item_vector():
+    """Test that the neighbour scan orders by distance to a bound vector, so HNSW serves it"""
+    mock_conn = MagicMock()
+    mock_conn.execute.return_value.scalar.return_value = "[0.1,0.2]"
+    mock_conn.execute.return_value.fetchall.side_effect = [
+        [MagicMock(other_id="R1", similarity=0.9), MagicMock(other_id="R2", similarity=0.8)],
+        [MagicMock(**{"__getitem__.return_value": "R1"})],
+    ]
+
+    assert candidates._insert_top_candidates(mock_conn, "donation", "D1", include_reverse=False) == ["R1"]
+
+    scan_sql, scan_params = [c.args for c in mock_conn.execute.call_args_list if "LIMIT :scan_limit" in str(c.args[0])][0]
+    assert "CROSS JOIN" not in str(scan_sql)
+    assert "ORDER BY o.embedding <=> CAST(:embedding AS" in str(scan_sql)
+    assert scan_params["embedding"] == "[0.1,0.2]"
+    insert_params = mock_conn.execute.call_args_list[-1].args[1]
+    assert insert_params["other_ids"] == ["R1", "R2"]
+    assert insert_params["similarities"] == [0.9, 0.8]
+
+
+def test_reverse_scan_widens_while_still_above_the_floor():
+    """Test that a full first scan is followed by the wider one"""
+    mock_conn = MagicMock()
+    mock_conn.execute.return_value.scalar.return_value = "[0.1]"
+    full = [MagicMock(other_id=f"R{i}", similarity=0.9) for i in range(3)]
+    mock_conn.execute.return_value.fetchall.side_effect = [full, full[:2]]
+
+    result = candidates._nearest_counterparts(mock_conn, "donation", "D1", (3, 10))
+
+    assert result == [("R0", 0.9), ("R1", 0.9)]
+    scan_limits = [c.args[1]["scan_limit"] for c in mock_conn.execute.call_args_list if "LIMIT :scan_limit" in str(c.args[0])]
+    assert scan_limits == [3, 10]
+
+
+@patch("services.candidates.USE_MATCH_CANDIDATES", True)
+@patch("services.candidates._prune_candidates")
+@patch("services.candidates._insert_top_candidates")
+@patch("services.candidates._remove_candidates")
+@patch("services.candidates.engine")
+def test_refresh_candidates_prunes_counterparts(mock_engine, mock_remove, mock_insert, mock_prune):
+    """Test that counterparts that gained a pair are trimmed back to k"""
+    mock_conn = mock_engine.begin.return_value.__enter__.return_value
+    mock_remove.return_value = ["R1"]
+    mock_insert.side_effect = [["R2", "R3"], ["D7"]]
+
+    assert candidates.refresh_candidates("donation", "D1") is True
+
+    assert mock_prune.call_args_list == [
+        call(mock_conn, "donation", ["D7"]),
+        call(mock_conn, "request", ["R2", "R3"]),
+    ]
@@ -42,4 +42,43 @@ def test_create_request(mock_save):
     assert response.status_code == 200
     assert response.json() == {"success": True, "id": "R1"}
 
-    mock_save.assert_called_once()
\ No newline at end of file
+    mock_save.assert_called_once()
+@patch("routers.forms.process_pending_embeddings")
+@patch("routers.forms.save_donation")
+def test_create_donation_deferred(mock_save, mock_process):
+    mock_save.return_value = {"donation_id": "D1", "status": "pending"}
+
+    payload = {
+        "donor_id": "DONOR1",
+        "item_name": "Apples",
+        "quantity": 5,
+        "category": "Food"
+    }
+
+    response = client.post("/forms/donation?defer_embedding=true", json=payload)
+
+    assert response.status_code == 202
+    assert response.json() == {"donation_id": "D1", "status": "pending"}
+
+    # Saved without an embedding, then embedded in the background
+    assert mock_save.call_args.kwargs == {"defer_embedding": True}
+    mock_process.assert_called_once()
+
+@patch("routers.forms.process_pending_embeddings")
+@patch("routers.forms.save_request")
+def test_create_request_deferred(mock_save, mock_process):
+    mock_save.return_value = {"request_id": "R1", "status": "pending"}
+
+    payload = {
+        "shelter_id": "SHELTER1",
+        "item_name": "Pants",
+        "quantity": 10,
+        "category": "Clothing"
+    }
+
+    response = client.post("/forms/request?defer_embedding=true", json=payload)
+
+    assert response.status_code == 202
+    assert response.json() == {"request_id": "R1", "status": "pending"}
+    assert mock_save.call_args.kwargs == {"defer_embedding": True}
+    mock_process.assert_called_once()
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+from unittest.mock import patch, MagicMock
+
+import numpy as np
+
+from services import embeddings
+
+
+def make_fake_model(seen_threads=None):
+    model = MagicMock()
+
+    def encode(text):
+        if seen_threads is not None:
+            seen_threads.append(threading.current_thread().name)
+        return np.array([0.1, 0.2, 0.3])
+
+    model.encode.side_effect = encode
+    return model
+
+
+@patch("services.embeddings.get_model")
+def test_generate_embedding_returns_list(mock_get_model):
+    """Test that the blocking API returns a plain list of floats"""
+    mock_get_model.return_value = make_fake_model()
+
+    result = embeddings.generate_embedding("Food", "Rice", 10)
+
+    assert result == [0.1, 0.2, 0.3]
+    mock_get_model.return_value.encode.assert_called_once_with("Rice,Food")
+
+
+@patch("services.embeddings.get_model")
+def test_generate_embedding_runs_on_embedding_pool(mock_get_model):
+    """Test that inference never runs on the calling thread"""
+    seen_threads = []
+    mock_get_model.return_value = make_fake_model(seen_threads)
+
+    embeddings.generate_embedding("Food", "Rice", 10)
+
+    assert seen_threads[0].startswith("embedding")
+
+
+@patch("services.embeddings.get_model")
+def test_generate_embedding_async(mock_get_model):
+    """Test the awaitable API runs on the embedding pool"""
+    seen_threads = []
+    mock_get_model.return_value = make_fake_model(seen_threads)
+
+    result = asyncio.run(embeddings.generate_embedding_async("Bedding", "Blankets", 3))
+
+    assert result == [0.1, 0.2, 0.3]
+    assert seen_threads[0].startswith("embedding")
+    mock_get_model.return_value.encode.assert_called_once_with("Blankets,Bedding")
+
+
+def test_embedding_pool_is_bounded():
+    """Test that the pool size follows EMBEDDING_WORKERS"""
+    assert embeddings.embedding_executor._max_workers == embeddings.EMBEDDING_WORKERS
+    assert embeddings.EMBEDDING_INTRA_OP_THREADS >= 1
+
+
+def test_store_embedding_writes_side_table():
+    """Test that vectors go to the embeddings table with the model version"""
+    conn = MagicMock()
+
+    embeddings.store_embedding(conn, "request", "R1", [0.1, 0.2, 0.3], "Bedding")
+
+    delete_stmt, insert_stmt = [call.args[0] for call in conn.execute.call_args_list]
+    assert delete_stmt.table.name == "request_embeddings"
+    assert insert_stmt.table.name == "request_embeddings"
+    params = insert_stmt.compile().params
+    assert params["request_id"] == "R1"
+    assert params["model_version"] == embeddings.MODEL_VERSION
+    assert params["category"] == "Bedding"
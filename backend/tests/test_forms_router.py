@@ -1,6 +1,7 @@
 from fastapi.testclient import TestClient
 from unittest.mock import patch
 from main import app
+from services.pagination import encode_cursor, decode_cursor
 
 client = TestClient(app)
 
@@ -20,7 +21,7 @@ def test_list_donations_all(mock_get):
     assert response.status_code == 200
     data = response.json()
     assert len(data) == 2
-    mock_get.assert_called_once_with(user_id=None)
+    mock_get.assert_called_once_with(user_id=None, limit=50, cursor=None, category=None, created_after=None)
 
 
 @patch("routers.forms.get_donations")
@@ -36,7 +37,7 @@ def test_list_donations_by_user(mock_get):
     data = response.json()
     assert len(data) == 1
     assert data[0]["donor_id"] == "DONOR1"
-    mock_get.assert_called_once_with(user_id="DONOR1")
+    mock_get.assert_called_once_with(user_id="DONOR1", limit=50, cursor=None, category=None, created_after=None)
 
 
 @patch("routers.forms.get_requests")
@@ -51,7 +52,7 @@ def test_list_requests_all(mock_get):
     assert response.status_code == 200
     data = response.json()
     assert len(data) == 1
-    mock_get.assert_called_once_with(user_id=None)
+    mock_get.assert_called_once_with(user_id=None, limit=50, cursor=None, category=None, created_after=None)
 
 
 @patch("routers.forms.get_requests")
@@ -64,7 +65,88 @@ def test_list_requests_by_user(mock_get):
     response = client.get("/forms/requests?user_id=S1")
 
     assert response.status_code == 200
-    mock_get.assert_called_once_with(user_id="S1")
+    mock_get.assert_called_once_with(user_id="S1", limit=50, cursor=None, category=None, created_after=None)
+
+
+@patch("routers.forms.get_donations")
+def test_list_donations_sets_next_cursor(mock_get):
+    """Test a full page of donations returns a cursor for the next page"""
+    mock_get.return_value = [
+        {"donation_id": "D1", "donor_id": "DONOR1", "item_name": "Rice", "quantity": 10,
+         "category": "Food", "created_at": "2026-01-01T00:00:00+00:00"},
+        {"donation_id": "D2", "donor_id": "DONOR2", "item_name": "Beans", "quantity": 5,
+         "category": "Food", "created_at": "2026-01-02T00:00:00+00:00"}
+    ]
+
+    response = client.get("/forms/donations?limit=2&category=Food")
+
+    assert response.status_code == 200
+    cursor = response.headers["X-Next-Cursor"]
+    assert decode_cursor(cursor)[1] == "D2"
+    mock_get.assert_called_once_with(user_id=None, limit=2, cursor=None, category="Food", created_after=None)
+
+
+@patch("routers.forms.get_requests")
+def test_list_requests_last_page_has_no_cursor(mock_get):
+    """Test a short page of requests does not return a cursor"""
+    mock_get.return_value = [
+        {"request_id": "R1", "shelter_id": "S1", "item_name": "Blankets", "quantity": 20,
+         "category": "Bedding", "created_at": "2026-01-01T00:00:00+00:00"}
+    ]
+
+    response = client.get("/forms/requests?limit=2")
+
+    assert response.status_code == 200
+    assert "X-Next-Cursor" not in response.headers
+
+
+@patch("routers.forms.get_donations")
+def test_list_donations_invalid_cursor(mock_get):
+    """Test a malformed cursor returns 400"""
+    mock_get.side_effect = ValueError("Invalid cursor")
+
+    response = client.get("/forms/donations?cursor=garbage")
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_list_donations_limit_too_large():
+    """Test page size above the maximum is rejected"""
+    response = client.get("/forms/donations?limit=100000")
+
+    assert response.status_code == 422
+
+
+def test_cursor_roundtrip():
+    """Test encode_cursor/decode_cursor round trip"""
+    cursor = encode_cursor("2026-01-02T03:04:05+00:00", "12345678-1234-1234-1234-123456789abc")
+
+    created_at, item_id = decode_cursor(cursor)
+
+    assert created_at.isoformat() == "2026-01-02T03:04:05+00:00"
+    assert item_id == "12345678-1234-1234-1234-123456789abc"
+
+
+@patch("routers.forms.get_ingestion_status")
+def test_donation_status_pending(mock_status):
+    """Test polling a donation that is still being embedded"""
+    mock_status.return_value = {"donation_id": "12345678-1234-1234-1234-123456789abc", "status": "pending"}
+
+    response = client.get("/forms/donation/12345678-1234-1234-1234-123456789abc/status")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "pending"
+
+
+@patch("routers.forms.get_ingestion_status")
+def test_request_status_not_found(mock_status):
+    """Test polling a request that does not exist"""
+    mock_status.return_value = None
+
+    response = client.get("/forms/request/12345678-1234-1234-1234-123456789abc/status")
+
+    assert response.status_code == 404
 
 
 # ========== DELETE Endpoints ==========
@@ -159,6 +241,26 @@ def test_update_request_no_match(mock_match, mock_update):
     assert data["best_match"] is None
 
 
+@patch("routers.forms.update_donation_service")
+@patch("routers.forms.find_best_match_for_donation")
+def test_update_donation_quantity_only_skips_rematch(mock_match, mock_update):
+    """Test that matching is not re-run when the item text is unchanged"""
+    mock_update.return_value = {"donation_id": "D1", "item_name": "Rice", "quantity": 15, "embedding_updated": False}
+
+    payload = {
+        "donor_id": "DONOR1",
+        "item_name": "Rice",
+        "quantity": 15,
+        "category": "Food"
+    }
+
+    response = client.put("/forms/donation/12345678-1234-1234-1234-123456789abc", json=payload)
+
+    assert response.status_code == 200
+    assert response.json()["best_match"] is None
+    mock_match.assert_not_called()
+
+
 @patch("routers.forms.update_donor")
 def test_update_donor_success(mock_update):
     """Test successful donor profile update"""
@@ -194,6 +296,20 @@ def test_update_shelter_success(mock_update):
     assert response.status_code == 200
 
 
+@patch("routers.forms.update_shelter")
+def test_update_shelter_without_coordinates(mock_update):
+    """Test the profile page's empty and text coordinates are accepted"""
+    mock_update.return_value = {"success": True}
+
+    response = client.put("/forms/shelter/S001", json={"shelter_name": "Shelter", "latitude": "", "longitude": ""})
+    assert response.status_code == 200
+    assert mock_update.call_args.kwargs["latitude"] is None
+
+    response = client.put("/forms/shelter/S001", json={"latitude": "47.61", "longitude": "-122.33"})
+    assert response.status_code == 200
+    assert mock_update.call_args.kwargs["latitude"] == 47.61
+
+
 @patch("routers.forms.delete_donor")
 def test_delete_donor_success(mock_delete):
     """Test successful donor deletion"""
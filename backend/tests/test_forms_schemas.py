@@ -196,7 +196,17 @@ def test_shelter_update_all_fields():
     
     assert update.shelter_name == "New Hope Shelter"
     assert update.city == "Portland"
-    assert update.latitude == "45.5152"
+    assert update.latitude == 45.5152
+
+
+def test_shelter_update_blank_coordinates():
+    """Test the profile form's empty coordinate strings mean no location"""
+    update = ShelterUpdate(shelter_name="New Hope Shelter", latitude="", longitude=" ")
+
+    assert update.latitude is None
+    assert update.longitude is None
+    with pytest.raises(ValidationError):
+        ShelterUpdate(latitude="north")
 
 
 def test_shelter_update_partial():
@@ -0,0 +1,200 @@
+from unittest.mock import patch, MagicMock
+from types import SimpleNamespace
+
+from schemas.forms import DonationForm, RequestForm
+from services.embeddings import normalize_embedding_text
+
+
+def mock_connection(mock_engine, row, new_status="open"):
+    mock_conn = MagicMock()
+    mock_engine.connect.return_value.__enter__.return_value = mock_conn
+    mock_conn.execute.return_value.fetchone.return_value = row
+    # Status returned by the UPDATE
+    mock_conn.execute.return_value.scalar.return_value = new_status
+    return mock_conn
+
+
+def test_normalize_embedding_text():
+    """Test that case and spacing do not change the embedding text"""
+    assert normalize_embedding_text("Food", "Canned  Beans ") == normalize_embedding_text(" food", "canned beans")
+    assert normalize_embedding_text("Food", "Rice") != normalize_embedding_text("Food", "Beans")
+
+
+# ========== update_donation ==========
+
+@patch("services.forms.refresh_candidates")
+@patch("services.forms.delete_matches_for_item")
+@patch("services.forms.generate_embedding")
+@patch("services.forms.engine")
+def test_update_donation_quantity_only_keeps_embedding(mock_engine, mock_embed, mock_delete, mock_refresh):
+    """Test that a quantity-only edit skips inference and keeps matches"""
+    from services.forms import update_donation
+
+    mock_connection(mock_engine, SimpleNamespace(item_name="Rice", category="Food", status="open"))
+    donation = DonationForm(donor_id="DONOR1", item_name="rice ", quantity=20, category="Food")
+
+    result = update_donation("D1", donation)
+
+    assert result["embedding_updated"] is False
+    assert result["quantity"] == 20
+    mock_embed.assert_not_called()
+    mock_delete.assert_not_called()
+    mock_refresh.assert_not_called()
+
+
+@patch("services.forms.refresh_candidates")
+@patch("services.forms.delete_matches_for_item")
+@patch("services.forms.generate_embedding")
+@patch("services.forms.engine")
+def test_update_donation_new_item_reembeds(mock_engine, mock_embed, mock_delete, mock_refresh):
+    """Test that changing the item name re-embeds and drops every old match"""
+    from services.forms import update_donation
+
+    mock_connection(mock_engine, SimpleNamespace(item_name="Rice", category="Food", status="open"))
+    mock_embed.return_value = [0.1, 0.2]
+    mock_delete.return_value = ["M1", "M2"]
+    donation = DonationForm(donor_id="DONOR1", item_name="Beans", quantity=20, category="Food")
+
+    result = update_donation("D1", donation)
+
+    assert result["embedding_updated"] is True
+    mock_embed.assert_called_once_with("Food", "Beans", 20)
+    assert mock_delete.call_args.args[:2] == ("donation", "D1")
+    mock_refresh.assert_called_once_with("donation", "D1")
+
+
+@patch("services.forms.remove_candidates")
+@patch("services.forms.refresh_candidates")
+@patch("services.forms.engine")
+def test_update_donation_quantity_edit_syncs_candidates(mock_engine, mock_refresh, mock_remove):
+    """Test that a quantity edit that closes or reopens the donation updates its candidates"""
+    from services.forms import update_donation
+
+    donation = DonationForm(donor_id="DONOR1", item_name="Rice", quantity=5, category="Food")
+
+    mock_connection(mock_engine, SimpleNamespace(item_name="Rice", category="Food", status="partially_matched"), "fulfilled")
+    update_donation("D1", donation)
+    mock_remove.assert_called_once_with("donation", "D1")
+    mock_refresh.assert_not_called()
+
+    mock_connection(mock_engine, SimpleNamespace(item_name="Rice", category="Food", status="fulfilled"), "partially_matched")
+    update_donation("D1", donation)
+    mock_refresh.assert_called_once_with("donation", "D1")
+    mock_remove.assert_called_once()
+
+
+# ========== update_request ==========
+
+@patch("services.forms.invalidate")
+@patch("services.forms.refresh_candidates")
+@patch("services.forms.delete_matches_for_item")
+@patch("services.forms.generate_embedding")
+@patch("services.forms.engine")
+def test_update_request_quantity_only_keeps_embedding(mock_engine, mock_embed, mock_delete, mock_refresh, mock_invalidate):
+    """Test that a quantity-only request edit skips inference and keeps matches"""
+    from services.forms import update_request
+
+    mock_connection(mock_engine, SimpleNamespace(item_name="Blankets", category="Bedding", status="open", shelter_id="S1"))
+    request = RequestForm(shelter_id="S1", item_name="Blankets", quantity=50, category="Bedding")
+
+    result = update_request("R1", request)
+
+    assert result["embedding_updated"] is False
+    mock_embed.assert_not_called()
+    mock_delete.assert_not_called()
+    # Only the owning shelter's cached request list is dropped
+    mock_invalidate.assert_called_once_with("shelter_requests", "S1")
+
+
+# ========== Match lookups ==========
+
+@patch("services.forms.engine")
+def test_get_match_from_donation_id_single_query(mock_engine):
+    """Test that the lookup is one query instead of one per match"""
+    from services.forms import get_match_from_donation_id
+
+    mock_conn = MagicMock()
+    mock_engine.connect.return_value.__enter__.return_value = mock_conn
+    mock_conn.execute.return_value.scalar.return_value = "M1"
+
+    assert get_match_from_donation_id("DONOR1", "D1") == "M1"
+    mock_conn.execute.assert_called_once()
+
+
+@patch("services.forms.remove_candidates")
+@patch("services.forms.delete_matches_for_item")
+@patch("services.forms.engine")
+def test_delete_donation_removes_all_matches_in_one_transaction(mock_engine, mock_delete_matches, mock_remove):
+    """Test that the donation, its matches and the back-reference share one commit"""
+    from services.forms import delete_donation
+
+    mock_conn = MagicMock()
+    mock_engine.connect.return_value.__enter__.return_value = mock_conn
+    mock_conn.execute.return_value.rowcount = 1
+    mock_delete_matches.return_value = ["M1", "M2"]
+
+    assert delete_donation("D1", "DONOR1") is True
+    mock_delete_matches.assert_called_once_with("donation", "D1", mock_conn)
+    mock_conn.commit.assert_called_once()
+
+
+def test_delete_matches_for_item_updates_owners():
+    """Test that deleted match ids are removed from every owner in bulk"""
+    from types import SimpleNamespace
+    from services.match import delete_matches_for_item
+
+    mock_conn = MagicMock()
+    mock_conn.execute.return_value.fetchall.return_value = [
+        SimpleNamespace(id="M1", donor_id="DONOR1", shelter_id="S1"),
+        SimpleNamespace(id="M2", donor_id="DONOR1", shelter_id="S2"),
+    ]
+
+    result = delete_matches_for_item("donation", "D1", mock_conn)
+
+    assert result == ["M1", "M2"]
+    # One DELETE, one UPDATE for donors, one UPDATE for shelters
+    assert mock_conn.execute.call_count == 3
+    shelter_params = mock_conn.execute.call_args_list[2].args[1]
+    assert sorted(shelter_params["uids"]) == ["S1", "S2"]
+    assert shelter_params["match_ids"] == ["M1", "M2"]
+
+
+# ========== Account deletion ==========
+
+@patch("services.forms.remove_candidates_for_items")
+@patch("services.forms.remove_match_ids")
+@patch("services.forms.engine")
+def test_delete_donor_is_set_based(mock_engine, mock_remove_ids, mock_remove_candidates):
+    """Test that a donor and everything linked to it go in one transaction"""
+    from services.forms import delete_donor, shelters_table
+
+    mock_conn = MagicMock()
+    mock_engine.begin.return_value.__enter__.return_value = mock_conn
+    mock_conn.execute.return_value.fetchone.return_value = SimpleNamespace(uid="DONOR1")
+    mock_conn.execute.return_value.scalars.return_value.all.return_value = ["D1", "D2"]
+    mock_conn.execute.return_value.fetchall.return_value = [
+        SimpleNamespace(id="M1", shelter_id="S1"),
+        SimpleNamespace(id="M2", shelter_id="S2"),
+    ]
+
+    assert delete_donor("DONOR1") is True
+
+    mock_engine.begin.assert_called_once()
+    # Lookup, delete donations, delete matches, delete donor
+    assert mock_conn.execute.call_count == 4
+    mock_remove_ids.assert_called_once_with(mock_conn, shelters_table, {"S1", "S2"}, ["M1", "M2"])
+    mock_remove_candidates.assert_called_once_with("donation", ["D1", "D2"])
+
+
+@patch("services.forms.engine")
+def test_delete_shelter_not_found(mock_engine):
+    """Test that deleting an unknown shelter raises"""
+    import pytest
+    from services.forms import delete_shelter
+
+    mock_conn = MagicMock()
+    mock_engine.begin.return_value.__enter__.return_value = mock_conn
+    mock_conn.execute.return_value.fetchone.return_value = None
+
+    with pytest.raises(ValueError):
+        delete_shelter("S404")
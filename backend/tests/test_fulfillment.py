@@ -0,0 +1,106 @@
+import uuid
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from main import app
+from services.fulfillment import choose_donations, plan_fulfillment
+
+client = TestClient(app)
+
+
+def test_choose_donations_uses_fewest_donations():
+    # 60 + 40 covers 100 with two donations; the most similar ones would need four
+    candidates = [(30, 0.95), (30, 0.94), (25, 0.93), (20, 0.92), (60, 0.75), (40, 0.74)]
+
+    assert sorted(choose_donations(100, candidates)) == [4, 5]
+
+
+def test_choose_donations_prefers_similarity_among_smallest_sets():
+    candidates = [(50, 0.80), (50, 0.90), (100, 0.70), (100, 0.85)]
+
+    assert choose_donations(100, candidates) == [3]
+
+
+def test_choose_donations_respects_max_donations():
+    candidates = [(10, 0.9)] * 10
+
+    # Cannot reach 100 with five; take the largest to cover as much as possible
+    assert len(choose_donations(100, candidates, max_donations=5)) == 5
+    assert len(choose_donations(100, candidates, max_donations=10)) == 10
+
+
+def test_choose_donations_large_quantities_use_units():
+    candidates = [(600000, 0.9), (500000, 0.8), (400000, 0.95)]
+
+    assert sorted(choose_donations(1000000, candidates)) == [0, 2]
+
+
+def test_choose_donations_nothing_needed():
+    assert choose_donations(0, [(5, 0.9)]) == []
+    assert choose_donations(5, []) == []
+
+
+@patch("services.fulfillment.engine")
+@patch("services.fulfillment.available_quantities")
+@patch("services.fulfillment.find_similar_donations")
+def test_plan_fulfillment_allocates_most_similar_first(mock_find, mock_available, mock_engine):
+    mock_find.return_value = [
+        {"donation_id": "D1", "similarity_score": 0.95, "quantity": 30},
+        {"donation_id": "D2", "similarity_score": 0.9, "quantity": 80},
+        {"donation_id": "D3", "similarity_score": 0.85, "quantity": 50},
+    ]
+    # 20 of D2 are already promised in a pending match
+    request_id = str(uuid.uuid4())
+    mock_available.side_effect = [{request_id: 100}, {"D1": 30, "D2": 60, "D3": 50}]
+
+    plan = plan_fulfillment(request_id, k=5)
+
+    assert plan["needed"] == 100 and plan["covered"] == 100 and plan["shortfall"] == 0
+    assert [(d["donation_id"], d["quantity"]) for d in plan["donations"]] == [("D2", 60), ("D3", 40)]
+    mock_find.assert_called_once_with(request_id, limit=5, threshold=0.7)
+
+
+@patch("services.fulfillment.engine")
+@patch("services.fulfillment.available_quantities")
+@patch("services.fulfillment.find_similar_donations")
+def test_plan_fulfillment_reports_shortfall(mock_find, mock_available, mock_engine):
+    mock_find.return_value = [{"donation_id": "D1", "similarity_score": 0.9, "quantity": 10}]
+    request_id = str(uuid.uuid4())
+    mock_available.side_effect = [{request_id: 25}, {"D1": 10}]
+
+    plan = plan_fulfillment(request_id)
+
+    assert plan["covered"] == 10 and plan["shortfall"] == 15
+
+
+@patch("services.fulfillment.engine")
+@patch("services.fulfillment.find_similar_donations")
+def test_plan_fulfillment_unknown_request(mock_find, mock_engine):
+    mock_engine.connect.return_value.__enter__.return_value.execute.return_value.first.return_value = None
+
+    assert plan_fulfillment("not-a-uuid") is None
+    assert plan_fulfillment(str(uuid.uuid4())) is None
+    mock_find.assert_not_called()
+
+
+@patch("routers.vector_match.plan_fulfillment", return_value=None)
+def test_fulfillment_plan_endpoint_unknown_request(mock_plan):
+    response = client.get("/vector-match/request/not-a-uuid/fulfillment-plan")
+
+    assert response.status_code == 404
+
+
+@patch("routers.vector_match.save_vector_matches")
+@patch("routers.vector_match.plan_fulfillment")
+def test_fulfillment_plan_endpoint(mock_plan, mock_save):
+    mock_plan.return_value = {"request_id": "R1", "needed": 10, "covered": 10, "shortfall": 0,
+                              "candidates_considered": 1, "donations": [{"donation_id": "D1", "quantity": 10}]}
+    mock_save.return_value = {"saved": 1}
+
+    response = client.get("/vector-match/request/R1/fulfillment-plan?k=5&max_donations=3")
+    assert response.status_code == 200
+    assert response.json()["covered"] == 10
+    mock_plan.assert_called_once_with("R1", k=5, threshold=0.7, max_donations=3)
+    mock_save.assert_not_called()
+
+    response = client.get("/vector-match/request/R1/fulfillment-plan?save=true")
+    assert response.json()["saved"] == 1
@@ -0,0 +1,54 @@
+from services.geo import bounding_box, haversine_km, longitude_ranges, radius_params
+
+
+def test_haversine_known_distance():
+    """Test Seattle to Tacoma is about 40 km"""
+    assert 38 < haversine_km(47.6062, -122.3321, 47.2529, -122.4443) < 42
+
+
+def test_haversine_same_point():
+    assert haversine_km(47.6, -122.3, 47.6, -122.3) == 0
+
+
+def test_bounding_box_contains_radius():
+    """Test points at the radius in each direction fall inside the box"""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(47.6, -122.3, 10)
+
+    assert haversine_km(47.6, -122.3, max_lat, -122.3) >= 10
+    assert haversine_km(47.6, -122.3, 47.6, max_lon) >= 10
+    assert min_lat < 47.6 < max_lat
+    assert min_lon < -122.3 < max_lon
+
+
+def test_bounding_box_near_pole_covers_all_longitudes():
+    _, _, min_lon, max_lon = bounding_box(89.9, 0, 50)
+    assert max_lon - min_lon == 360
+
+
+def test_radius_params():
+    params = radius_params(47.6, -122.3, 5)
+    assert params["origin_lat"] == 47.6
+    assert params["origin_lon"] == -122.3
+    assert params["max_distance_km"] == 5
+
+
+def test_longitude_ranges_split_at_the_antimeridian():
+    """Test a box past ±180° keeps the points just across it"""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(-17.7, 179.95, 50)
+    ranges = longitude_ranges(min_lon, max_lon)
+
+    assert len(ranges) == 2
+    assert all(-180 <= low <= high <= 180 for low, high in ranges)
+    # Suva to a point 10 km east, across the antimeridian
+    assert any(low <= -179.95 <= high for low, high in ranges)
+    assert longitude_ranges(-10, 10) == [(-10, 10)]
+    assert longitude_ranges(-200, 200) == [(-180.0, 180.0)]
+
+
+def test_radius_params_second_longitude_range():
+    params = radius_params(-17.7, -179.95, 50)
+    assert params["min_lon"] > 179 and params["max_lon"] == 180
+    assert params["min_lon_2"] == -180 and params["max_lon_2"] < -179
+
+    params = radius_params(47.6, -122.3, 5)
+    assert (params["min_lon_2"], params["max_lon_2"]) == (params["min_lon"], params["max_lon"])
@@ -0,0 +1,115 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+import pytest
+from unittest.mock import patch
+from sqlalchemy import create_engine, select
+
+from database import donations_table, requests_table
+from services.ingestion import process_pending_embeddings, get_ingestion_status
+
+
+@pytest.fixture
+def ingestion_engine(tmp_path):
+    test_engine = create_engine(f"sqlite:///{tmp_path / 'ingestion.db'}")
+    donations_table.create(test_engine)
+    requests_table.create(test_engine)
+
+    with patch("services.ingestion.engine", test_engine), \
+            patch("services.ingestion.store_embedding") as mock_store, \
+            patch("services.ingestion.generate_embeddings", side_effect=lambda items: [[0.1]] * len(items)), \
+            patch("services.ingestion.refresh_candidates"), \
+            patch("services.ingestion.save_vector_matches", return_value={"saved": 1}) as mock_save:
+        yield test_engine, mock_store, mock_save
+    test_engine.dispose()
+
+
+def _add(conn, table, name, embedding_status="pending", claimed_at=None, **extra):
+    row_id = uuid.uuid4()
+    owner = {"donor_id": "D1"} if table is donations_table else {"shelter_id": "S1"}
+    conn.execute(table.insert().values(
+        id=row_id, item_name=name, quantity=1, category="Food",
+        embedding_status=embedding_status, claimed_at=claimed_at, **owner, **extra
+    ))
+    return row_id
+
+
+def _statuses(conn, table):
+    return {
+        row.item_name: (row.embedding_status, row.claimed_at)
+        for row in conn.execute(select(table.c.item_name, table.c.embedding_status, table.c.claimed_at))
+    }
+
+
+@patch("services.ingestion.find_best_match_for_request")
+@patch("services.ingestion.find_best_match_for_donation")
+def test_process_pending_embeddings_drains_and_matches(mock_best_donation, mock_best_request, ingestion_engine):
+    """Test that pending rows are embedded batch by batch, matched, and marked ready"""
+    test_engine, mock_store, mock_save = ingestion_engine
+    with test_engine.begin() as conn:
+        for name in ("Rice", "Beans", "Pasta"):
+            _add(conn, donations_table, name)
+        _add(conn, donations_table, "Already ready", embedding_status="ready")
+        request_id = _add(conn, requests_table, "Blankets")
+    mock_best_donation.side_effect = [{"request_id": "R9"}, None, None]
+    mock_best_request.return_value = {"donation_id": "D9"}
+
+    result = process_pending_embeddings(batch_size=2)
+
+    assert result == {"donations": 3, "requests": 1, "failed": 0}
+    assert mock_store.call_count == 4
+    mock_best_request.assert_called_once_with(str(request_id))
+    # Only items that found a match are saved, and a pair is never saved twice
+    assert mock_save.call_count == 2
+    assert all(call.kwargs == {"skip_existing": True} for call in mock_save.call_args_list)
+    with test_engine.connect() as conn:
+        assert set(_statuses(conn, donations_table).values()) == {("ready", None)}
+        assert _statuses(conn, requests_table) == {"Blankets": ("ready", None)}
+
+
+@patch("services.ingestion.find_best_match_for_donation", return_value=None)
+def test_skips_rows_claimed_by_another_drain(mock_best, ingestion_engine):
+    """Test that a live claim is left alone and an expired one is taken over"""
+    test_engine, mock_store, _ = ingestion_engine
+    now = datetime.now(timezone.utc)
+    with test_engine.begin() as conn:
+        _add(conn, donations_table, "Claimed", claimed_at=now)
+        # Embedded before its drain died: only the match step is left
+        _add(conn, donations_table, "Abandoned", embedding_status="embedded", claimed_at=now - timedelta(hours=1))
+
+    assert process_pending_embeddings() == {"donations": 1, "requests": 0, "failed": 0}
+
+    mock_store.assert_not_called()
+    mock_best.assert_called_once()
+    with test_engine.connect() as conn:
+        statuses = _statuses(conn, donations_table)
+    assert statuses["Abandoned"] == ("ready", None)
+    assert statuses["Claimed"][0] == "pending"
+
+
+@patch("services.ingestion.find_best_match_for_donation")
+def test_failed_row_is_released_without_blocking_the_rest(mock_best, ingestion_engine):
+    """Test that one row failing to match does not stop the drain"""
+    test_engine, _, _ = ingestion_engine
+    with test_engine.begin() as conn:
+        _add(conn, donations_table, "Rice")
+        _add(conn, donations_table, "Beans")
+    mock_best.side_effect = [RuntimeError("database went away"), None]
+
+    assert process_pending_embeddings(batch_size=1) == {"donations": 1, "requests": 0, "failed": 1}
+
+    with test_engine.connect() as conn:
+        statuses = _statuses(conn, donations_table)
+    # The failed row keeps its vector and is free for the next drain
+    assert sorted(statuses.values()) == [("embedded", None), ("ready", None)]
+
+
+def test_get_ingestion_status(ingestion_engine):
+    """Test that an item is only ready once it has been embedded and matched"""
+    test_engine, _, _ = ingestion_engine
+    with test_engine.begin() as conn:
+        pending_id = _add(conn, donations_table, "Rice", embedding_status="embedded")
+        ready_id = _add(conn, requests_table, "Blankets", embedding_status="ready")
+
+    assert get_ingestion_status(pending_id, "donation") == {"donation_id": str(pending_id), "status": "pending"}
+    assert get_ingestion_status(ready_id, "request") == {"request_id": str(ready_id), "status": "ready"}
+    assert get_ingestion_status(uuid.uuid4(), "donation") is None
@@ -0,0 +1,192 @@
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock
+from main import app
+import pytest
+
+from services.jobs import enqueue_job, fail_job, run_job, claim_jobs
+
+client = TestClient(app)
+
+
+# ========== Service Tests: queue operations ==========
+
+def test_enqueue_job_unknown_type():
+    """Test that only registered job types can be queued"""
+    with pytest.raises(ValueError):
+        enqueue_job("does_not_exist")
+
+
+def test_enqueue_job_uses_callers_connection():
+    """Test that a job can be queued inside an existing transaction"""
+    mock_conn = MagicMock()
+
+    job_id = enqueue_job("match", {"item_type": "donation", "item_id": "D1"}, conn=mock_conn)
+
+    assert job_id
+    mock_conn.execute.assert_called_once()
+
+
+@patch("services.jobs.engine")
+def test_fail_job_requeues_with_attempts_left(mock_engine):
+    """Test that a failed job goes back to the queue while attempts remain"""
+    job = {"id": "J1", "attempts": 1, "max_attempts": 3}
+
+    assert fail_job(job, "worker-1", "boom") == "queued"
+
+
+@patch("services.jobs.engine")
+def test_fail_job_gives_up_after_max_attempts(mock_engine):
+    """Test that a job is marked failed on its last attempt"""
+    job = {"id": "J1", "attempts": 3, "max_attempts": 3}
+
+    assert fail_job(job, "worker-1", "boom") == "failed"
+
+
+@patch("services.jobs.extend_lease", return_value=True)
+@patch("services.jobs.complete_job")
+@patch("services.jobs.fail_job")
+def test_run_job_success(mock_fail, mock_complete, mock_lease):
+    """Test that a successful handler completes the job"""
+    handler = MagicMock()
+    job = {"id": "J1", "job_type": "match", "payload": {"item_type": "donation", "item_id": "D1"}}
+
+    with patch.dict("services.jobs.JOB_HANDLERS", {"match": handler}):
+        assert run_job(job, "worker-1") is True
+
+    handler.assert_called_once_with({"item_type": "donation", "item_id": "D1"})
+    mock_complete.assert_called_once_with("J1", "worker-1")
+    mock_fail.assert_not_called()
+
+
+@patch("services.jobs.extend_lease", return_value=True)
+@patch("services.jobs.complete_job")
+@patch("services.jobs.fail_job")
+def test_run_job_failure(mock_fail, mock_complete, mock_lease):
+    """Test that a raising handler records a failed attempt"""
+    handler = MagicMock(side_effect=RuntimeError("db down"))
+    job = {"id": "J1", "job_type": "match", "payload": {}}
+
+    with patch.dict("services.jobs.JOB_HANDLERS", {"match": handler}):
+        assert run_job(job, "worker-1") is False
+
+    mock_fail.assert_called_once_with(job, "worker-1", "db down")
+    mock_complete.assert_not_called()
+
+
+@patch("services.jobs.save_vector_matches")
+@patch("services.jobs.find_best_match_for_request")
+def test_run_match_job_for_request(mock_find, mock_save):
+    """Test that a match job saves the best match it finds"""
+    from services.jobs import run_match_job
+
+    mock_find.return_value = {"donation_id": "D1", "request_id": "R1"}
+    mock_save.return_value = {"saved": 1}
+
+    run_match_job({"item_type": "request", "item_id": "R1"})
+
+    mock_find.assert_called_once_with("R1")
+    mock_save.assert_called_once_with([mock_find.return_value], skip_existing=True)
+
+
+@patch("services.jobs.extend_lease", return_value=False)
+@patch("services.jobs.complete_job")
+@patch("services.jobs.fail_job")
+def test_run_job_skips_job_taken_over(mock_fail, mock_complete, mock_lease):
+    """Test that a job whose lease lapsed while it waited in the batch is not run twice"""
+    handler = MagicMock()
+    job = {"id": "J1", "job_type": "match", "payload": {}}
+
+    with patch.dict("services.jobs.JOB_HANDLERS", {"match": handler}):
+        assert run_job(job, "worker-1") is None
+
+    handler.assert_not_called()
+    mock_complete.assert_not_called()
+    mock_fail.assert_not_called()
+
+
+@patch("services.jobs.engine")
+def test_claim_jobs_fails_exhausted_jobs(mock_engine):
+    """Test that expired jobs on their last attempt are failed, not reclaimed"""
+    mock_conn = mock_engine.begin.return_value.__enter__.return_value
+    mock_conn.execute.return_value.scalars.return_value.all.return_value = []
+
+    assert claim_jobs("worker-1") == []
+
+    fail_sql = str(mock_conn.execute.call_args_list[0].args[0])
+    claim_sql = str(mock_conn.execute.call_args_list[1].args[0])
+    assert "jobs.attempts >= jobs.max_attempts" in fail_sql
+    assert "jobs.attempts < jobs.max_attempts" in claim_sql
+
+
+@patch("services.jobs.process_pending_embeddings")
+def test_embed_job_raises_when_items_fail(mock_process):
+    """Test that failed items make the embed job retry instead of completing"""
+    from services.jobs import run_embed_job
+
+    mock_process.return_value = {"donations": 3, "requests": 0, "failed": 0}
+    run_embed_job({})
+
+    mock_process.return_value = {"donations": 2, "requests": 0, "failed": 1}
+    with pytest.raises(RuntimeError):
+        run_embed_job({})
+
+
+# ========== Router Tests ==========
+
+@patch("routers.jobs.get_queue_metrics")
+def test_queue_metrics(mock_metrics):
+    """Test the queue metrics endpoint"""
+    mock_metrics.return_value = {
+        "jobs": {"match": {"done": 10, "queued": 2}},
+        "completed_last_window": 10,
+        "window_seconds": 60,
+        "jobs_per_second": 0.167
+    }
+
+    response = client.get("/jobs/metrics")
+
+    assert response.status_code == 200
+    assert response.json()["jobs"]["match"]["queued"] == 2
+    mock_metrics.assert_called_once_with(60)
+
+
+@patch("routers.forms.USE_JOB_QUEUE", True)
+@patch("routers.forms.enqueue_job")
+@patch("routers.forms.update_donation_service")
+@patch("routers.forms.find_best_match_for_donation")
+def test_update_donation_queues_matching(mock_match, mock_update, mock_enqueue):
+    """Test that matching is queued instead of run inline when the queue is enabled"""
+    mock_update.return_value = {"donation_id": "D1", "item_name": "Rice", "quantity": 5}
+    mock_enqueue.return_value = "J1"
+
+    payload = {
+        "donor_id": "DONOR1",
+        "item_name": "Rice",
+        "quantity": 5,
+        "category": "Food"
+    }
+
+    response = client.put("/forms/donation/12345678-1234-1234-1234-123456789abc", json=payload)
+
+    assert response.status_code == 200
+    assert response.json()["match_job_id"] == "J1"
+    mock_enqueue.assert_called_once_with(
+        "match", {"item_type": "donation", "item_id": "12345678-1234-1234-1234-123456789abc"}
+    )
+    mock_match.assert_not_called()
+
+
+@patch("services.jobs.enqueue_job")
+@patch("services.jobs.expire_stale_items", return_value={"donations": 0, "requests": 2})
+@patch("services.jobs.archive_stale_matches", return_value={"expired": 3, "completed": 1})
+def test_archive_job_schedules_next_sweep(mock_archive, mock_expire, mock_enqueue):
+    from services.jobs import run_archive_job
+
+    run_archive_job({"every_seconds": 3600})
+    mock_archive.assert_called_once()
+    mock_expire.assert_called_once()
+    assert mock_enqueue.call_args.args == ("archive_matches", {"every_seconds": 3600})
+
+    mock_enqueue.reset_mock()
+    run_archive_job({})
+    mock_enqueue.assert_not_called()
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import threading
+from unittest.mock import patch
+from services.match_events import subscribe, unsubscribe, subscriber_count, handle_notification, format_sse
+
+
+def test_events_reach_both_parties_only():
+    """Test a notification is queued for the donor's and shelter's streams and nobody else's"""
+    async def scenario():
+        donor_queue = subscribe("D00001")
+        shelter_queue = subscribe("S00001")
+        other_queue = subscribe("S00002")
+
+        payload = json.dumps({
+            "type": "status_changed", "match_id": "M1",
+            "donor_id": "D00001", "shelter_id": "S00001", "status": "both"
+        })
+        # Notifications arrive on the listener thread
+        thread = threading.Thread(target=handle_notification, args=(payload,))
+        thread.start()
+        thread.join()
+
+        donor_event = await asyncio.wait_for(donor_queue.get(), 1)
+        shelter_event = await asyncio.wait_for(shelter_queue.get(), 1)
+        assert donor_event["status"] == shelter_event["status"] == "both"
+        assert other_queue.empty()
+
+        for user_id, queue in (("D00001", donor_queue), ("S00001", shelter_queue), ("S00002", other_queue)):
+            unsubscribe(user_id, queue)
+
+    asyncio.run(scenario())
+    assert subscriber_count() == 0
+
+
+def test_full_queue_is_replaced_by_a_resync():
+    """Test a client that fell behind is told to refetch instead of silently losing events"""
+    from services.match_events import _offer
+
+    queue = asyncio.Queue(maxsize=2)
+    _offer(queue, {"type": "match_created", "match_id": "M1"})
+    _offer(queue, {"type": "match_created", "match_id": "M2"})
+    _offer(queue, {"type": "status_changed", "match_id": "M1"})
+
+    assert queue.qsize() == 1
+    assert queue.get_nowait() == {"type": "resync"}
+
+
+def test_format_sse():
+    message = format_sse({"type": "match_created", "match_id": "M1"})
+    assert message.startswith("event: match_created\ndata: ")
+    assert message.endswith("\n\n")
+    assert json.loads(message.split("data: ")[1]) == {"type": "match_created", "match_id": "M1"}
+
+
+@patch("routers.match.STREAM_KEEPALIVE_SECONDS", 0.2)
+def test_stream_endpoint_pushes_events_and_keepalives():
+    """Test the SSE endpoint streams published events and unsubscribes on disconnect"""
+    from main import app
+    from services.match_events import publish
+
+    async def scenario():
+        disconnected = asyncio.Event()
+        sent = []
+
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/match/stream/D00001", "raw_path": b"/match/stream/D00001",
+            "query_string": b"", "headers": [], "server": ("test", 80), "client": ("test", 1), "root_path": "",
+        }
+        task = asyncio.create_task(app(scope, receive, send))
+        while subscriber_count() == 0:
+            await asyncio.sleep(0.01)
+        publish({"type": "match_created", "match_id": "M1", "donor_id": "D00001", "shelter_id": "S00001"})
+        await asyncio.sleep(0.5)
+        disconnected.set()
+        await asyncio.wait_for(task, 2)
+        return sent
+
+    sent = asyncio.run(scenario())
+
+    assert sent[0]["status"] == 200
+    assert (b"content-type", b"text/event-stream; charset=utf-8") in sent[0]["headers"]
+    bodies = b"".join(message.get("body", b"") for message in sent[1:])
+    assert b"event: match_created" in bodies
+    assert b": keepalive" in bodies
+    assert subscriber_count() == 0
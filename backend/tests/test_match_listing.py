@@ -0,0 +1,140 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, MetaData, Table, Column, String
+from main import app
+from database import matches_table
+from services.match import get_matches_service
+from services.pagination import encode_cursor
+
+client = TestClient(app)
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def match_engine(tmp_path):
+    """
+    SQLite engine with the matches table and the contact columns of donors/shelters.
+    """
+    test_engine = create_engine(f"sqlite:///{tmp_path / 'matches.db'}")
+    matches_table.create(test_engine)
+    contacts = MetaData()
+    donors = Table("donors", contacts, Column("uid", String, primary_key=True), Column("email", String), Column("phone_number", String))
+    shelters = Table(
+        "shelters", contacts,
+        *[Column(name, String) for name in ("email", "phone_number", "address", "city", "state", "zip_code")],
+        Column("uid", String, primary_key=True)
+    )
+    contacts.create_all(test_engine)
+
+    with test_engine.begin() as conn:
+        conn.execute(donors.insert(), [{"uid": "D1", "email": "d1@example.com", "phone_number": "111"}])
+        conn.execute(shelters.insert(), [{"uid": "S1", "email": "s1@example.com", "city": "Portland"}])
+        conn.execute(matches_table.insert(), [
+            {
+                "id": uuid.uuid4(),
+                "donor_id": "D1",
+                "donation_id": str(uuid.uuid4()),
+                "donor_username": "donor",
+                "shelter_id": "S1",
+                "request_id": str(uuid.uuid4()),
+                "shelter_name": "Shelter",
+                "item_name": f"item {i}",
+                "quantity": 1,
+                "category": "Food",
+                "matched_at": START + timedelta(days=i),
+                # Every third match has been confirmed by both sides
+                "status": "both" if i % 3 == 0 else "pending",
+            }
+            for i in range(9)
+        ])
+
+    with patch("services.match.engine", test_engine):
+        yield test_engine
+    test_engine.dispose()
+
+
+def test_default_view_is_active_matches_newest_first(match_engine):
+    result = get_matches_service("D1", "donor")
+
+    items = [m["item_name"] for m in result["matches"]]
+    assert items == ["item 8", "item 7", "item 5", "item 4", "item 2", "item 1"]
+    assert result["matches"][0]["donor_email"] == "d1@example.com"
+    assert result["matches"][0]["shelter_city"] == "Portland"
+
+
+def test_status_filter(match_engine):
+    both = get_matches_service("S1", "shelter", status="both")
+    every = get_matches_service("S1", "shelter", status="all")
+
+    assert [m["item_name"] for m in both["matches"]] == ["item 6", "item 3", "item 0"]
+    assert len(every["matches"]) == 9
+
+
+def test_since_filter(match_engine):
+    result = get_matches_service("D1", "donor", status="all", since=START + timedelta(days=7))
+
+    assert [m["item_name"] for m in result["matches"]] == ["item 8", "item 7"]
+
+
+def test_cursor_pages_do_not_overlap(match_engine):
+    seen = []
+    cursor = None
+    while True:
+        page = get_matches_service("D1", "donor", status="all", limit=4, cursor=cursor)["matches"]
+        seen.extend(m["item_name"] for m in page)
+        if len(page) < 4:
+            break
+        cursor = encode_cursor(page[-1]["matched_at"], page[-1]["id"])
+
+    assert seen == [f"item {i}" for i in range(8, -1, -1)]
+
+
+def test_unknown_user_and_type(match_engine):
+    assert get_matches_service("NOPE", "donor") == {"error": "Donor with uid NOPE not found"}
+    assert get_matches_service("D1", "admin") == {"error": "Invalid user type"}
+
+
+def test_invalid_status_raises():
+    with pytest.raises(ValueError):
+        get_matches_service("D1", "donor", status="archived")
+
+
+@patch("routers.match.get_matches_service")
+def test_router_sets_next_cursor_on_full_page(mock_service):
+    match_id = uuid.uuid4()
+    mock_service.return_value = {"matches": [{"id": match_id, "matched_at": START}]}
+
+    response = client.get("/match/matches/D1/donor?limit=1&status=all")
+
+    assert response.status_code == 200
+    assert response.headers["X-Next-Cursor"] == encode_cursor(START, match_id)
+    mock_service.assert_called_once_with("D1", "donor", status="all", since=None, limit=1, cursor=None)
+
+
+@patch("routers.match.get_matches_service")
+def test_next_cursor_is_readable_from_the_frontend(mock_service):
+    mock_service.return_value = {"matches": [{"id": uuid.uuid4(), "matched_at": START}]}
+
+    response = client.get("/match/matches/D1/donor?limit=1", headers={"Origin": "http://localhost:3000"})
+
+    assert "x-next-cursor" in response.headers["access-control-expose-headers"].lower()
+
+
+@patch("routers.match.get_matches_service")
+def test_router_no_cursor_on_last_page(mock_service):
+    mock_service.return_value = {"matches": []}
+
+    response = client.get("/match/matches/D1/donor")
+
+    assert response.status_code == 200
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_router_rejects_bad_cursor_and_status():
+    assert client.get("/match/matches/D1/donor?cursor=not-a-cursor").status_code == 400
+    assert client.get("/match/matches/D1/donor?status=archived").status_code == 400
+    assert client.get("/match/matches/D1/donor?limit=0").status_code == 422
@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from services import reembed
+from services.embeddings import MODEL_VERSION, embedding_text
+
+
+def mock_rows(mock_engine, *batches):
+    mock_conn = MagicMock()
+    mock_engine.connect.return_value.__enter__.return_value = mock_conn
+    mock_conn.execute.return_value.fetchall.side_effect = list(batches)
+    return mock_conn
+
+
+def test_embedding_text_uses_version_template():
+    """Test that the active version keeps the original text template"""
+    assert embedding_text("Food", "Rice") == "Rice,Food"
+    assert embedding_text("Food", "Rice", MODEL_VERSION) == "Rice,Food"
+
+
+def test_backfill_unknown_version():
+    """Test that only registered model versions can be backfilled"""
+    with pytest.raises(ValueError):
+        reembed.backfill_embeddings("no-such-model")
+
+
+@patch("services.reembed._store_backfilled")
+@patch("services.reembed.generate_embeddings")
+@patch("services.reembed.engine")
+def test_backfill_table_embeds_in_batches(mock_engine, mock_generate, mock_store):
+    """Test that missing vectors are embedded batch by batch with the target version"""
+    rows = [SimpleNamespace(id="D1", item_name="Rice", category="Food"),
+            SimpleNamespace(id="D2", item_name="Beans", category="Food")]
+    mock_rows(mock_engine, rows, [])
+    mock_generate.return_value = [[0.1], [0.2]]
+
+    processed = reembed._backfill_table("donation", MODEL_VERSION, batch_size=2, max_items_per_second=0, max_items=None)
+
+    assert processed == 2
+    mock_generate.assert_called_once_with([("Food", "Rice"), ("Food", "Beans")], model_version=MODEL_VERSION)
+    assert mock_store.call_count == 2
+
+
+@patch("services.reembed._store_backfilled")
+@patch("services.reembed.generate_embeddings")
+@patch("services.reembed.engine")
+def test_backfill_table_stops_at_max_items(mock_engine, mock_generate, mock_store):
+    """Test that a chunked run never embeds more than max_items"""
+    mock_conn = mock_rows(mock_engine, [SimpleNamespace(id="D1", item_name="Rice", category="Food")])
+    mock_generate.return_value = [[0.1]]
+
+    processed = reembed._backfill_table("donation", MODEL_VERSION, batch_size=64, max_items_per_second=0, max_items=1)
+
+    assert processed == 1
+    # One read only, and it asked for at most one row
+    assert mock_conn.execute.call_count == 1
+    assert mock_conn.execute.call_args.args[0]._limit == 1
+
+
+@patch("services.reembed.time.sleep")
+@patch("services.reembed._store_backfilled")
+@patch("services.reembed.generate_embeddings")
+@patch("services.reembed.engine")
+def test_backfill_table_throttles(mock_engine, mock_generate, mock_store, mock_sleep):
+    """Test that the rate cap sleeps between batches"""
+    rows = [SimpleNamespace(id=f"D{i}", item_name="Rice", category="Food") for i in range(10)]
+    mock_rows(mock_engine, rows, [])
+    mock_generate.return_value = [[0.1]] * 10
+
+    reembed._backfill_table("donation", MODEL_VERSION, batch_size=10, max_items_per_second=5, max_items=None)
+
+    # 10 items at 5/s should take about 2 seconds
+    assert mock_sleep.call_count == 1
+    assert 1.5 < mock_sleep.call_args.args[0] <= 2
+
+
+def test_prune_requires_active_version():
+    """Test that vectors still being served cannot be pruned"""
+    with pytest.raises(ValueError):
+        reembed.prune_embeddings("some-other-version")
+
+
+@patch("services.jobs.enqueue_job")
+@patch("services.jobs.backfill_embeddings")
+def test_reembed_job_queues_next_chunk(mock_backfill, mock_enqueue):
+    """Test that a full chunk queues a follow-up job and a partial one does not"""
+    from services.jobs import run_reembed_job
+
+    payload = {"model_version": MODEL_VERSION, "chunk_size": 100}
+    mock_backfill.return_value = {"donations": 100, "requests": 3}
+    run_reembed_job(payload)
+    mock_enqueue.assert_called_once_with("reembed", payload)
+
+    mock_enqueue.reset_mock()
+    mock_backfill.return_value = {"donations": 40, "requests": 3}
+    run_reembed_job(payload)
+    mock_enqueue.assert_not_called()
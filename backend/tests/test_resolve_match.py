@@ -1,40 +1,12 @@
+import threading
+import uuid
 import pytest
-from unittest.mock import MagicMock
-from services.match import resolve_match_db, resolve_match_status
-
-# Mock session fixture
-@pytest.fixture
-def mock_session():
-    mock = MagicMock()
-
-    # Mock a row returned by session.execute(...).first()
-    mock_row = MagicMock()
-    mock_row._asdict.return_value = {
-        "id": "1",
-        "donor_id": "D00001",
-        "shelter_id": "S00001",
-        "status": "pending"
-    }
-
-    # session.execute(...).first() returns mock_row
-    mock.execute.return_value.first.return_value = mock_row
-
-    return mock
-
-# patch SessionLocal for all tests
-@pytest.fixture(autouse=True)
-def patch_session_local(monkeypatch, mock_session):
-    class FakeSessionMaker:
-        def __call__(self, *args, **kwargs):
-            return mock_session
-
-        def __enter__(self):
-            return mock_session
-
-        def __exit__(self, exc_type, exc_val, exc_tb):
-            return False
-
-    monkeypatch.setattr("services.match.SessionLocal", FakeSessionMaker())
+from unittest.mock import MagicMock, patch
+from sqlalchemy import create_engine, select
+from services.match import (
+    resolve_match_db, resolve_match_status, item_status, quantity_update_values, available_quantities
+)
+from database import matches_table, donations_table, requests_table
 
 # basic logic tests
 def test_pending_to_donor():
@@ -59,10 +31,202 @@ def test_same_confirmation_does_not_change():
 
 
 # Database function tests (mock)
-def test_resolve_match_db_donor():
-    result = resolve_match_db("1", "D00001")
-    assert result == "donor"
+@pytest.fixture
+def mock_conn():
+    with patch("services.match.engine") as mock_engine:
+        yield mock_engine.begin.return_value.__enter__.return_value
+
 
-def test_resolve_match_db_shelter():
-    result = resolve_match_db("1", "S00001")
-    assert result == "shelter"
\ No newline at end of file
+def test_resolve_match_db_returns_updated_status(mock_conn):
+    mock_conn.execute.return_value.first.return_value = MagicMock(status="donor")
+
+    assert resolve_match_db("1", "D00001") == "donor"
+    # One round trip when the match is found
+    assert mock_conn.execute.call_count == 1
+    query = str(mock_conn.execute.call_args.args[0])
+    assert "CASE" in query and "RETURNING" in query
+
+
+def test_resolve_match_db_not_found(mock_conn):
+    mock_conn.execute.return_value.first.side_effect = [None, None]
+
+    with pytest.raises(ValueError):
+        resolve_match_db("1", "D00001")
+
+
+def test_resolve_match_db_not_a_party(mock_conn):
+    mock_conn.execute.return_value.first.side_effect = [None, MagicMock(id="1")]
+
+    with pytest.raises(PermissionError):
+        resolve_match_db("1", "X00001")
+
+
+# Concurrency stress test against a real database file
+@pytest.fixture
+def file_engine(tmp_path):
+    test_engine = create_engine(f"sqlite:///{tmp_path / 'matches.db'}", connect_args={"timeout": 30})
+    for table in (matches_table, donations_table, requests_table):
+        table.create(test_engine)
+    with patch("services.match.engine", test_engine):
+        yield test_engine
+    test_engine.dispose()
+
+
+def test_resolve_match_db_concurrent_confirmations(file_engine):
+    """Test donor and shelter confirming many matches at the same moment always end at both"""
+    match_ids = [uuid.uuid4() for _ in range(20)]
+    donation_id, request_id = uuid.uuid4(), uuid.uuid4()
+    with file_engine.begin() as conn:
+        conn.execute(donations_table.insert().values(
+            id=donation_id, donor_id="D00001", item_name="Rice", quantity=25, remaining_quantity=25, category="Food"
+        ))
+        conn.execute(requests_table.insert().values(
+            id=request_id, shelter_id="S00001", item_name="Rice", quantity=20, remaining_quantity=20, category="Food"
+        ))
+        conn.execute(matches_table.insert(), [
+            {
+                "id": match_id, "donor_id": "D00001", "donation_id": str(donation_id), "donor_username": "donor",
+                "shelter_id": "S00001", "request_id": str(request_id), "shelter_name": "shelter",
+                "item_name": "Rice", "quantity": 1, "category": "Food", "status": "pending",
+            }
+            for match_id in match_ids
+        ])
+
+    results = {}
+    errors = []
+    barrier = threading.Barrier(4)
+
+    def confirm(user_uid, worker):
+        barrier.wait()
+        try:
+            for match_id in match_ids:
+                results[(match_id, user_uid, worker)] = resolve_match_db(match_id, user_uid)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [
+        threading.Thread(target=confirm, args=(user_uid, worker))
+        for user_uid in ("D00001", "S00001") for worker in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with file_engine.connect() as conn:
+        statuses = conn.execute(select(matches_table.c.status)).scalars().all()
+    assert statuses == ["both"] * len(match_ids)
+    # Each match took its quantity exactly once
+    with file_engine.connect() as conn:
+        fulfilled = conn.execute(select(matches_table.c.fulfilled_quantity)).scalars().all()
+        confirmed = conn.execute(select(matches_table.c.confirmed_at)).scalars().all()
+        donation = conn.execute(select(donations_table.c.remaining_quantity, donations_table.c.status)).one()
+        request = conn.execute(select(requests_table.c.remaining_quantity, requests_table.c.status)).one()
+    assert fulfilled == [1] * len(match_ids)
+    assert None not in confirmed
+    assert tuple(donation) == (5, "partially_matched")
+    assert tuple(request) == (0, "fulfilled")
+    # Each confirmation saw either its own side or both, never the other side only
+    for (match_id, user_uid, worker), status in results.items():
+        assert status in (("donor", "both") if user_uid == "D00001" else ("shelter", "both"))
+
+
+def test_item_status():
+    assert item_status(10, 10) == "open"
+    assert item_status(10, 4) == "partially_matched"
+    assert item_status(10, 0) == "fulfilled"
+
+
+def test_quantity_edit_keeps_promised_quantity(file_engine):
+    """Test editing a partially matched donation's quantity keeps what was already promised"""
+    donation_id = uuid.uuid4()
+    with file_engine.begin() as conn:
+        conn.execute(donations_table.insert().values(
+            id=donation_id, donor_id="D00001", item_name="Rice", quantity=10, remaining_quantity=4,
+            status="partially_matched", category="Food"
+        ))
+
+    def edit(quantity, reopen=False):
+        with file_engine.begin() as conn:
+            conn.execute(
+                donations_table.update().where(donations_table.c.id == donation_id)
+                .values(quantity=quantity, **quantity_update_values(donations_table, quantity, reopen))
+            )
+            return tuple(conn.execute(select(donations_table.c.remaining_quantity, donations_table.c.status)).one())
+
+    # 6 of 10 were promised
+    assert edit(20) == (14, "partially_matched")
+    assert edit(6) == (0, "fulfilled")
+    assert edit(3) == (0, "fulfilled")
+    assert edit(8, reopen=True) == (8, "open")
+
+
+def test_available_quantities_subtracts_pending_matches(file_engine):
+    donation_id, closed_id, request_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    with file_engine.begin() as conn:
+        conn.execute(donations_table.insert(), [
+            {"id": donation_id, "donor_id": "D00001", "item_name": "Rice", "quantity": 10,
+             "remaining_quantity": 8, "status": "partially_matched", "category": "Food"},
+            {"id": closed_id, "donor_id": "D00001", "item_name": "Beans", "quantity": 5,
+             "remaining_quantity": 0, "status": "fulfilled", "category": "Food"},
+        ])
+        conn.execute(matches_table.insert(), [
+            {
+                "id": uuid.uuid4(), "donor_id": "D00001", "donation_id": str(donation_id), "donor_username": "donor",
+                "shelter_id": "S00001", "request_id": str(request_id), "shelter_name": "shelter",
+                "item_name": "Rice", "quantity": quantity, "category": "Food", "status": status,
+                "fulfilled_quantity": fulfilled,
+            }
+            for quantity, status, fulfilled in [(3, "pending", None), (2, "both", 2)]
+        ])
+
+    with file_engine.connect() as conn:
+        # 8 left, 3 promised to a pending match; the both-confirmed 2 are already off remaining
+        assert available_quantities(conn, "donation") == {str(donation_id): 5}
+        assert available_quantities(conn, "donation", [closed_id]) == {}
+
+
+def test_confirmed_at_is_set_by_the_second_confirmation(file_engine):
+    match_id = uuid.uuid4()
+    with file_engine.begin() as conn:
+        conn.execute(matches_table.insert().values(
+            id=match_id, donor_id="D00001", donation_id=str(uuid.uuid4()), donor_username="donor",
+            shelter_id="S00001", request_id=str(uuid.uuid4()), shelter_name="shelter",
+            item_name="Rice", quantity=1, category="Food", status="pending",
+        ))
+
+    def confirmed_at():
+        with file_engine.connect() as conn:
+            return conn.execute(select(matches_table.c.confirmed_at)).scalar()
+
+    assert resolve_match_db(match_id, "D00001") == "donor"
+    assert confirmed_at() is None
+    assert resolve_match_db(match_id, "S00001") == "both"
+    first = confirmed_at()
+    assert first is not None
+    # Confirming again does not restart the retention clock
+    resolve_match_db(match_id, "S00001")
+    assert confirmed_at() == first
+
+
+@patch("services.match.remove_candidates")
+def test_completed_match_drops_closed_items_from_candidates(mock_remove, file_engine):
+    """Test that only the item the match used up leaves match_candidates"""
+    match_id, donation_id, request_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    with file_engine.begin() as conn:
+        conn.execute(donations_table.insert().values(
+            id=donation_id, donor_id="D00001", item_name="Rice", quantity=10, remaining_quantity=10, category="Food"
+        ))
+        conn.execute(requests_table.insert().values(
+            id=request_id, shelter_id="S00001", item_name="Rice", quantity=4, remaining_quantity=4, category="Food"
+        ))
+        conn.execute(matches_table.insert().values(
+            id=match_id, donor_id="D00001", donation_id=str(donation_id), donor_username="donor",
+            shelter_id="S00001", request_id=str(request_id), shelter_name="shelter",
+            item_name="Rice", quantity=4, category="Food", status="donor",
+        ))
+
+    assert resolve_match_db(match_id, "S00001") == "both"
+
+    mock_remove.assert_called_once_with("request", str(request_id))
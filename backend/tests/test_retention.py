@@ -0,0 +1,123 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+import pytest
+from unittest.mock import patch
+from sqlalchemy import create_engine, select
+from database import matches_table, matches_archive_table, donations_table, requests_table
+from services.retention import archive_stale_matches, expire_stale_items
+
+NOW = datetime.now(timezone.utc)
+
+
+@pytest.fixture
+def retention_engine(tmp_path):
+    test_engine = create_engine(f"sqlite:///{tmp_path / 'retention.db'}")
+    matches_table.create(test_engine)
+    matches_archive_table.create(test_engine)
+
+    def match(name, status, age_days, confirmed_days=None):
+        return {
+            "id": uuid.uuid4(),
+            "donor_id": "D1",
+            "donation_id": str(uuid.uuid4()),
+            "donor_username": "donor",
+            "shelter_id": "S1",
+            "request_id": str(uuid.uuid4()),
+            "shelter_name": "Shelter",
+            "item_name": name,
+            "quantity": 1,
+            "category": "Food",
+            "matched_at": NOW - timedelta(days=age_days),
+            "confirmed_at": None if confirmed_days is None else NOW - timedelta(days=confirmed_days),
+            "status": status,
+        }
+
+    with test_engine.begin() as conn:
+        conn.execute(matches_table.insert(), [
+            match("old pending", "pending", 40),
+            match("old half confirmed", "donor", 35),
+            match("new pending", "pending", 2),
+            match("old both", "both", 200, confirmed_days=190),
+            match("recent both", "both", 40, confirmed_days=39),
+            match("old but just confirmed", "both", 200, confirmed_days=1),
+        ])
+
+    with patch("services.retention.engine", test_engine), \
+            patch("services.retention.remove_match_ids") as mock_remove:
+        yield test_engine, mock_remove
+    test_engine.dispose()
+
+
+def _names(conn, table):
+    return sorted(conn.execute(select(table.c.item_name)).scalars().all())
+
+
+def test_archives_expired_and_completed_matches(retention_engine):
+    test_engine, mock_remove = retention_engine
+
+    result = archive_stale_matches(expiry_days=30, archive_after_days=180)
+
+    assert result == {"expired": 2, "completed": 1}
+    with test_engine.connect() as conn:
+        assert _names(conn, matches_table) == ["new pending", "old but just confirmed", "recent both"]
+        assert _names(conn, matches_archive_table) == ["old both", "old half confirmed", "old pending"]
+        reasons = dict(conn.execute(select(matches_archive_table.c.item_name, matches_archive_table.c.archive_reason)).fetchall())
+    assert reasons["old pending"] == "expired"
+    assert reasons["old both"] == "completed"
+    # match_ids arrays are cleaned for donors and shelters in each batch
+    assert mock_remove.call_count == 4
+
+
+def test_zero_days_keeps_matches(retention_engine):
+    test_engine, mock_remove = retention_engine
+
+    assert archive_stale_matches(expiry_days=0, archive_after_days=0) == {"expired": 0, "completed": 0}
+    with test_engine.connect() as conn:
+        assert len(_names(conn, matches_table)) == 6
+    mock_remove.assert_not_called()
+
+
+def test_sweeps_in_batches(retention_engine):
+    test_engine, _ = retention_engine
+
+    assert archive_stale_matches(expiry_days=30, archive_after_days=0, batch_size=1, max_batches=1) == {"expired": 1, "completed": 0}
+    # Oldest first
+    with test_engine.connect() as conn:
+        assert _names(conn, matches_archive_table) == ["old pending"]
+
+    assert archive_stale_matches(expiry_days=30, archive_after_days=0, batch_size=1) == {"expired": 1, "completed": 0}
+
+
+def test_expires_old_open_items(tmp_path):
+    test_engine = create_engine(f"sqlite:///{tmp_path / 'items.db'}")
+    donations_table.create(test_engine)
+    requests_table.create(test_engine)
+    with test_engine.begin() as conn:
+        conn.execute(donations_table.insert(), [
+            {"id": uuid.uuid4(), "donor_id": "D1", "item_name": name, "quantity": 5, "category": "Food",
+             "status": status, "created_at": NOW - timedelta(days=age_days)}
+            for name, status, age_days in [
+                ("old open", "open", 100),
+                ("old partial", "partially_matched", 100),
+                ("old fulfilled", "fulfilled", 100),
+                ("new open", "open", 1),
+            ]
+        ])
+
+    with patch("services.retention.engine", test_engine), \
+            patch("services.retention.remove_candidates_for_items") as mock_remove:
+        assert expire_stale_items(expiry_days=0) == {"donations": 0, "requests": 0}
+        assert expire_stale_items(expiry_days=60, batch_size=1) == {"donations": 2, "requests": 0}
+    # Each expired batch leaves match_candidates
+    assert [c.args[0] for c in mock_remove.call_args_list] == ["donation", "donation"]
+    assert sum(len(c.args[1]) for c in mock_remove.call_args_list) == 2
+
+    with test_engine.connect() as conn:
+        statuses = dict(conn.execute(select(donations_table.c.item_name, donations_table.c.status)).fetchall())
+    assert statuses == {
+        "old open": "expired",
+        "old partial": "expired",
+        "old fulfilled": "fulfilled",
+        "new open": "open",
+    }
+    test_engine.dispose()
@@ -105,3 +105,46 @@ def test_get_shelter_requests_error(mock_service):
     assert response.status_code == 500
     assert "Shelter not found" in response.json()["detail"]
 
+
+
+@patch("routers.shelters.get_nearby_shelters_service")
+def test_get_nearby_shelters_success(mock_service):
+    """Test nearby shelters are returned with their distance"""
+    mock_service.return_value = {
+        "shelters": [{"uid": "S001", "shelter_name": "Hope Shelter", "distance_km": 1.2}],
+        "count": 1
+    }
+
+    response = client.get("/shelters/nearby?lat=47.6&lon=-122.3&radius=5&limit=10")
+
+    assert response.status_code == 200
+    assert response.json()["shelters"][0]["distance_km"] == 1.2
+    mock_service.assert_called_once_with(47.6, -122.3, 5.0, 10)
+
+
+def test_get_nearby_shelters_invalid_params():
+    """Test latitude, radius and limit are validated"""
+    assert client.get("/shelters/nearby?lat=95&lon=0").status_code == 422
+    assert client.get("/shelters/nearby?lat=47.6&lon=-122.3&radius=0").status_code == 422
+    assert client.get("/shelters/nearby?lat=47.6&lon=-122.3&limit=500").status_code == 422
+    assert client.get("/shelters/nearby?lon=-122.3").status_code == 422
+
+
+@patch("services.shelters.is_sqlite", True)
+@patch("services.shelters.engine")
+def test_get_nearby_shelters_service_sorts_and_limits(mock_engine):
+    """Test shelters outside the radius are dropped and the rest sorted by distance"""
+    from services.shelters import get_nearby_shelters_service
+
+    mock_conn = mock_engine.connect.return_value.__enter__.return_value
+    mock_conn.execute.return_value.mappings.return_value.all.return_value = [
+        {"uid": "TACOMA", "latitude": 47.2529, "longitude": -122.4443},
+        {"uid": "SEATTLE", "latitude": 47.6097, "longitude": -122.3331},
+        {"uid": "BELLEVUE", "latitude": 47.6149, "longitude": -122.1938},
+    ]
+
+    result = get_nearby_shelters_service(47.6062, -122.3321, 20, 1)
+
+    assert result["count"] == 1
+    assert result["shelters"][0]["uid"] == "SEATTLE"
+    assert "match_ids" not in str(mock_conn.execute.call_args.args[0])
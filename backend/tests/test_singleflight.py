@@ -0,0 +1,72 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from services.singleflight import single_flight, get_single_flight_metrics, reset_single_flight_metrics
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    reset_single_flight_metrics()
+    yield
+    reset_single_flight_metrics()
+
+
+def test_concurrent_calls_share_one_execution():
+    """Test callers arriving while a call runs wait for it and get copies of its result"""
+    started = threading.Event()
+    release = threading.Event()
+    executions = []
+
+    def compute():
+        executions.append(1)
+        started.set()
+        release.wait(5)
+        return [{"request_id": "R1"}]
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(single_flight, "similar", "D1", compute)
+        started.wait(5)
+        followers = [pool.submit(single_flight, "similar", "D1", compute) for _ in range(3)]
+        while get_single_flight_metrics()["operations"]["similar"]["coalesced"] < 3:
+            time.sleep(0.001)
+        release.set()
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert len(executions) == 1
+    assert all(result == [{"request_id": "R1"}] for result in results)
+    results[1][0]["request_id"] = "changed"
+    assert results[2][0]["request_id"] == "R1"
+
+    stats = get_single_flight_metrics()["operations"]["similar"]
+    assert stats == {"calls": 4, "executions": 1, "coalesced": 3, "coalesced_ratio": 0.75}
+
+
+def test_sequential_calls_are_not_coalesced():
+    assert single_flight("similar", "D1", lambda: 1) == 1
+    assert single_flight("similar", "D1", lambda: 2) == 2
+    assert get_single_flight_metrics()["operations"]["similar"]["executions"] == 2
+
+
+def test_error_reaches_waiting_callers():
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("database down")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(single_flight, "matches", "U1", fail)
+        started.wait(5)
+        follower = pool.submit(single_flight, "matches", "U1", fail)
+        while get_single_flight_metrics()["operations"]["matches"]["coalesced"] < 1:
+            time.sleep(0.001)
+        release.set()
+        with pytest.raises(RuntimeError):
+            leader.result()
+        with pytest.raises(RuntimeError):
+            follower.result()
+
+    assert get_single_flight_metrics()["in_flight"] == 0
@@ -60,7 +60,7 @@ def test_get_matches_for_donation_with_params(mock_save, mock_find):
     response = client.get("/vector-match/donation/D001/matches?limit=5&threshold=0.9&save=false")
 
     assert response.status_code == 200
-    mock_find.assert_called_once_with("D001", limit=5, threshold=0.9)
+    mock_find.assert_called_once_with("D001", limit=5, threshold=0.9, max_distance_km=None)
 
 
 def test_get_matches_for_donation_invalid_limit():
@@ -307,7 +307,7 @@ def test_get_donor_matches_with_params(mock_save, mock_get):
     response = client.get("/vector-match/donor/DONOR1/matches?limit=5&threshold=0.8")
 
     assert response.status_code == 200
-    mock_get.assert_called_once_with("DONOR1", limit=5, threshold=0.8)
+    mock_get.assert_called_once_with("DONOR1", limit=5, threshold=0.8, max_distance_km=None)
 
 
 # ========== Router Tests: /vector-match/shelter/{shelter_id}/matches ==========
@@ -523,3 +523,233 @@ def test_user_save_match_id_invalid_user_type():
     # No database update should happen for invalid type
     mock_conn.execute.assert_not_called()
 
+
+
+# ========== Service Tests: find_all_matches ==========
+
+@patch("services.vector_match.engine")
+def test_find_all_matches_exact_by_default(mock_engine):
+    """Test the exact all-pairs scan is used unless the prefilter is enabled"""
+    from services.vector_match import find_all_matches
+
+    mock_conn = mock_engine.connect.return_value.__enter__.return_value
+    mock_conn.execute.return_value.fetchall.return_value = []
+
+    find_all_matches(threshold=0.8, use_prefilter=False)
+
+    query, params = mock_conn.execute.call_args.args
+    assert "binary_quantize" not in str(query)
+    assert params["threshold"] == 0.8
+
+
+@patch("services.vector_match.engine")
+def test_find_all_matches_prefilter_reranks_candidates(mock_engine):
+    """Test the two-stage search sizes its candidate set with the multiplier"""
+    from services.vector_match import find_all_matches, PREFILTER_MATCHES_PER_REQUEST
+
+    mock_conn = mock_engine.connect.return_value.__enter__.return_value
+    row = MagicMock(
+        donation_id="D1", donor_id="DONOR1", donor_name="Donor", donation_item="Rice",
+        donation_quantity=5, donation_category="Food", request_id="R1", shelter_id="S1",
+        shelter_name="Shelter", request_item="Rice", request_quantity=10,
+        request_category="Food", similarity=0.91234
+    )
+    mock_conn.execute.return_value.fetchall.return_value = [row]
+
+    matches = find_all_matches(threshold=0.7, use_prefilter=True, candidate_multiplier=4)
+
+    query, params = mock_conn.execute.call_args.args
+    assert "binary_quantize" in str(query)
+    assert params["candidates"] == PREFILTER_MATCHES_PER_REQUEST * 4
+    assert params["per_request"] == PREFILTER_MATCHES_PER_REQUEST
+    assert matches[0]["similarity_score"] == 0.9123
+    assert matches[0]["can_fulfill"] == "partial"
+
+
+@patch("services.vector_match.engine")
+def test_find_all_matches_compares_remaining_quantities(mock_engine):
+    """Test quantities reported and compared are what is left, not what was first offered"""
+    from services.vector_match import find_all_matches
+
+    mock_conn = mock_engine.connect.return_value.__enter__.return_value
+    mock_conn.execute.return_value.fetchall.return_value = []
+
+    find_all_matches(min_quantity_match=True, use_prefilter=False)
+
+    query = str(mock_conn.execute.call_args.args[0])
+    assert "coalesce(d.remaining_quantity, d.quantity) as donation_quantity" in query
+    assert "coalesce(d.remaining_quantity, d.quantity) >= coalesce(r.remaining_quantity, r.quantity)" in query
+
+
+@patch("services.vector_match.find_similar_requests")
+@patch("services.vector_match.engine")
+def test_get_matches_for_donor_reports_remaining_quantity(mock_engine, mock_find):
+    """Test a partially matched donation reports the quantity it has left"""
+    from services.vector_match import get_matches_for_donor
+
+    mock_conn = mock_engine.connect.return_value.__enter__.return_value
+    mock_conn.execute.return_value.fetchall.return_value = [
+        make_item_row(id="D1", item_name="Rice", quantity=50, remaining_quantity=2, category="Food")
+    ]
+    mock_find.return_value = [{"request_id": "R1", "similarity_score": 0.9}]
+
+    matches = get_matches_for_donor("DONOR1", max_distance_km=10)
+
+    assert matches[0]["donation_quantity"] == 2
+
+
+def make_item_row(**fields):
+    row = MagicMock()
+    for name, value in fields.items():
+        setattr(row, name, value)
+    return row
+
+
+@patch("services.vector_match.engine")
+def test_find_similar_requests_category_scoped(mock_engine):
+    """Test a scoped search that fills the limit never widens to other categories"""
+    from services.vector_match import find_similar_requests
+
+    mock_conn = mock_engine.connect.return_value.__enter__.return_value
+    donation = make_item_row(id="D1", donor_id="DONOR1", quantity=5, category="Food", embedding="[0.1,0.2]")
+    request = make_item_row(id="R1", shelter_id="S1", item_name="Rice", quantity=5, category="Food",
+                            created_at=None, shelter_name="Shelter", shelter_email=None,
+                            shelter_phone=None, similarity=0.9)
+    mock_conn.execute.return_value.fetchone.side_effect = [donation, None]
+    mock_conn.execute.return_value.fetchall.return_value = [request]
+
+    matches = find_similar_requests("D1", limit=1, category_scoped=True)
+
+    assert [m["request_id"] for m in matches] == ["R1"]
+    query, params = mock_conn.execute.call_args.args
+    assert "re.category = :category" in str(query)
+    assert params["category"] == "Food"
+
+
+@patch("services.vector_match.engine")
+def test_find_similar_donations_category_top_up(mock_engine):
+    """Test too few same-category matches are topped up from the other categories only"""
+    from services.vector_match import find_similar_donations
+
+    mock_conn = mock_engine.connect.return_value.__enter__.return_value
+    request = make_item_row(id="R1", shelter_id="S1", quantity=5, category="Bedding", embedding="[0.1,0.2]")
+
+    def donation(donation_id, category, similarity):
+        return make_item_row(id=donation_id, donor_id="DONOR1", item_name="Blankets", quantity=5, category=category,
+                             created_at=None, donor_name="Donor", donor_email=None,
+                             donor_phone=None, similarity=similarity)
+
+    mock_conn.execute.return_value.fetchone.side_effect = [request, None]
+    mock_conn.execute.return_value.fetchall.side_effect = [
+        [donation("D1", "Bedding", 0.8)],
+        [donation("D2", "Other", 0.85)],
+    ]
+
+    matches = find_similar_donations("R1", limit=5, category_scoped=True)
+
+    # The scoped rows are kept and the two result sets are merged by similarity
+    assert [m["donation_id"] for m in matches] == ["D2", "D1"]
+    assert matches[0]["request_id"] == "R1"
+    query, params = mock_conn.execute.call_args.args
+    assert "de.category IS DISTINCT FROM :category" in str(query)
+    assert params["category"] == "Bedding"
+    assert params["limit"] == 4
+
+
+@patch("services.vector_match.engine")
+def test_find_all_matches_category_scoped(mock_engine):
+    """Test the scoped all-pairs scan only widens for requests without a same-category match"""
+    from services.vector_match import find_all_matches
+
+    mock_conn = mock_engine.connect.return_value.__enter__.return_value
+    mock_conn.execute.return_value.fetchall.return_value = []
+
+    find_all_matches(use_prefilter=False, category_scoped=True)
+
+    query = str(mock_conn.execute.call_args.args[0])
+    assert "de.category = re.category" in query
+    assert "NOT EXISTS (SELECT 1 FROM scoped" in query
+
+
+@patch("services.vector_match.engine")
+def test_find_similar_requests_within_distance(mock_engine):
+    """Test max_distance_km scores only requests from shelters near the donor"""
+    from services.vector_match import find_similar_requests
+
+    mock_conn = mock_engine.connect.return_value.__enter__.return_value
+    donation = make_item_row(id="D1", donor_id="DONOR1", quantity=5, category="Food", embedding="[0.1,0.2]")
+    donor = make_item_row(name="Donor", latitude=47.61, longitude=-122.33)
+    request = make_item_row(id="R1", shelter_id="S1", item_name="Rice", quantity=5, category="Food",
+                            created_at=None, shelter_name="Shelter", shelter_email=None,
+                            shelter_phone=None, distance_km=3.456, similarity=0.9)
+    mock_conn.execute.return_value.fetchone.side_effect = [donation, donor]
+    mock_conn.execute.return_value.fetchall.return_value = [request]
+
+    matches = find_similar_requests("D1", limit=5, category_scoped=False, max_distance_km=10)
+
+    assert matches[0]["distance_km"] == 3.46
+    query, params = mock_conn.execute.call_args.args
+    assert "WITH nearby AS MATERIALIZED" in str(query)
+    assert params["max_distance_km"] == 10
+    assert params["min_lat"] < 47.61 < params["max_lat"]
+
+
+@patch("services.vector_match.engine")
+def test_find_similar_donations_distance_without_location(mock_engine):
+    """Test a shelter without coordinates gets no matches within a distance, not unfiltered ones"""
+    from services.vector_match import find_similar_donations
+
+    mock_conn = mock_engine.connect.return_value.__enter__.return_value
+    request = make_item_row(id="R1", shelter_id="S1", quantity=5, category="Food", embedding="[0.1,0.2]")
+    shelter = make_item_row(shelter_name="Shelter", latitude=None, longitude=None)
+    mock_conn.execute.return_value.fetchone.side_effect = [request, shelter]
+
+    assert find_similar_donations("R1", limit=5, category_scoped=False, max_distance_km=10) == []
+    mock_conn.execute.return_value.fetchall.assert_not_called()
+
+
+@patch("routers.vector_match.get_matches_for_shelter")
+@patch("routers.vector_match.save_vector_matches")
+def test_get_shelter_matches_with_distance(mock_save, mock_get):
+    """Test max_distance_km is passed through and must be positive"""
+    mock_get.return_value = []
+    mock_save.return_value = {"saved": 0}
+
+    response = client.get("/vector-match/shelter/SHELTER1/matches?max_distance_km=25")
+    assert response.status_code == 200
+    mock_get.assert_called_once_with("SHELTER1", limit=10, threshold=0.7, max_distance_km=25.0)
+
+    response = client.get("/vector-match/shelter/SHELTER1/matches?max_distance_km=0")
+    assert response.status_code == 422
+
+
+@patch("services.cache.SIMILARITY_CACHE_TTL_SECONDS", 60)
+@patch("services.vector_match.SIMILARITY_CACHE_TTL_SECONDS", 60)
+@patch("services.vector_match._corpus_version")
+@patch("services.vector_match.engine")
+def test_find_similar_requests_cached_per_corpus_version(mock_engine, mock_version):
+    """Test repeat calls reuse the result until the corpus version changes"""
+    from services.vector_match import find_similar_requests
+    from services.cache import clear
+    clear()
+
+    mock_conn = mock_engine.connect.return_value.__enter__.return_value
+    donation = make_item_row(id="D-CACHE", donor_id="DONOR1", quantity=5, category="Food", embedding="[0.1,0.2]")
+    request = make_item_row(id="R1", shelter_id="S1", item_name="Rice", quantity=5, category="Food",
+                            created_at=None, shelter_name="Shelter", shelter_email=None,
+                            shelter_phone=None, distance_km=None, similarity=0.9)
+    mock_conn.execute.return_value.fetchone.side_effect = [donation, None, donation, None]
+    mock_conn.execute.return_value.fetchall.return_value = [request]
+
+    mock_version.return_value = 7
+    first = find_similar_requests("D-CACHE", category_scoped=False)
+    first[0]["donation_item"] = "changed by caller"
+    second = find_similar_requests("D-CACHE", category_scoped=False)
+
+    assert mock_conn.execute.return_value.fetchall.call_count == 1
+    assert second[0]["request_id"] == "R1"
+    assert "donation_item" not in second[0]
+
+    mock_version.return_value = 8
+    find_similar_requests("D-CACHE", category_scoped=False)
+    assert mock_conn.execute.return_value.fetchall.call_count == 2
@@ -0,0 +1,87 @@
+"""
+Job queue worker
+
+Runs embedding, matching, notification, cleanup and match archival jobs from the jobs table.
+Start as many copies as needed, on as many machines as needed; they all share
+the queue through the database.
+
+    python worker.py --processes 4 --batch-size 10
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import time
+from datetime import timedelta
+
+from services.jobs import claim_jobs, run_job, DEFAULT_VISIBILITY_TIMEOUT
+
+
+def work(worker_id: str, batch_size: int, poll_interval: float, visibility_timeout: timedelta, stats_interval: float) -> None:
+    """
+    Claim and run jobs until interrupted.
+
+    - Sleeps for poll_interval when the queue is empty
+    - Prints throughput every stats_interval seconds
+    """
+    print(f"Worker {worker_id} started")
+    succeeded = failed = 0
+    window_start = time.monotonic()
+
+    while True:
+        try:
+            jobs = claim_jobs(worker_id, batch_size=batch_size, visibility_timeout=visibility_timeout)
+        except Exception as e:
+            print(f"Worker {worker_id} could not claim jobs: {e}")
+            jobs = []
+
+        for job in jobs:
+            outcome = run_job(job, worker_id, visibility_timeout)
+            if outcome:
+                succeeded += 1
+            elif outcome is False:
+                failed += 1
+
+        elapsed = time.monotonic() - window_start
+        if elapsed >= stats_interval:
+            rate = (succeeded + failed) / elapsed
+            print(f"Worker {worker_id}: {succeeded} succeeded, {failed} failed, {rate:.2f} jobs/s")
+            succeeded = failed = 0
+            window_start = time.monotonic()
+
+        if not jobs:
+            time.sleep(poll_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run ShelterLink background jobs")
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes to start on this machine")
+    parser.add_argument("--batch-size", type=int, default=10, help="Jobs claimed per round trip")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to wait when the queue is empty")
+    parser.add_argument("--visibility-timeout", type=float, default=DEFAULT_VISIBILITY_TIMEOUT.total_seconds(),
+                        help="Seconds before a claimed job can be picked up by another worker")
+    parser.add_argument("--stats-interval", type=float, default=60.0, help="Seconds between throughput reports")
+    args = parser.parse_args()
+
+    visibility_timeout = timedelta(seconds=args.visibility_timeout)
+    host = socket.gethostname()
+
+    if args.processes == 1:
+        work(f"{host}:{os.getpid()}", args.batch_size, args.poll_interval, visibility_timeout, args.stats_interval)
+        return
+
+    processes = []
+    for index in range(args.processes):
+        process = multiprocessing.Process(
+            target=work,
+            args=(f"{host}:{os.getpid()}:{index}", args.batch_size, args.poll_interval, visibility_timeout, args.stats_interval),
+        )
+        process.start()
+        processes.append(process)
+
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()